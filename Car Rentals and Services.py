@@ -1,274 +1,136 @@
 # -*- coding: utf-8 -*-
+import functools
+import os
 import sys
-import datetime
-import mysql.connector
-import hashlib
+import threading
+from decimal import Decimal
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QStackedWidget,
     QGridLayout, QMessageBox, QGroupBox, QCheckBox,
     QTableWidget, QTableWidgetItem, QHeaderView, QSizePolicy,
-    QScrollArea, QTextEdit, QSpacerItem, QComboBox,
+    QScrollArea, QTextEdit, QSpacerItem, QComboBox, QFileDialog, QDateEdit,
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QFont, QIntValidator, QPixmap, QIcon
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QDate, QObject, QThreadPool
+from PyQt6.QtGui import QFont, QIntValidator, QPixmap, QIcon, QColor
 import pandas as pd
 import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
 
+# The domain and data layers live in rental.py and rental_db.py, which do not import Qt.
+from rental_db import DBManager, DatabaseUnavailable, open_database, db_log
+from rental import format_peso, BookingUncertain, Car, OfflineError, RentalManager
+from catalog_snapshot import CatalogSnapshot
+from ui_trace import tracer, traced
+from catalog_import import has_changes, plan_summary
+from transaction_batch import TransactionRow
+from events import CarChanged, BookingCreated, MessageReceived
+from charts import CHARTS, PERIODS, ChartService, SalesData, render_chart
+from utilization import fetch_utilization_report
+from demand import fetch_demand_cube, MEASURES, SEASONS, WEEKDAYS
 
-# --- Utility Functions ---
 
-def hash_password(password):
-    """Hashes the password using SHA256 for secure storage."""
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
-
-
-def format_peso(amount):
-    return f"₱{amount:,.2f}"
-
-
-# --- Database Manager ---
-
-class DBManager:
-    def __init__(self, host="localhost", user="root", password="", database="car_rental_db_final"):
-        self.host, self.user, self.password, self.database = host, user, password, database
-        self.conn, self.cursor = None, None
-        self.connect()
+# --- GUI Widgets ---
 
-    def connect(self):
-        try:
-            self.conn = mysql.connector.connect(host=self.host, user=self.user, password=self.password)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
-            self.conn.close()
-            self.conn = mysql.connector.connect(host=self.host, user=self.user, password=self.password,
-                                                database=self.database)
-            self.cursor = self.conn.cursor(dictionary=True)
-            self._create_tables()
-            self._insert_initial_data()
-        except mysql.connector.Error as err:
-            QMessageBox.critical(None, "Database Error",
-                                 f"Failed to connect to MySQL: {err}.\nPlease ensure your database server (like XAMPP) is running.")
-            sys.exit(1)
-
-    def _create_tables(self):
-        self.cursor.execute(
-            "CREATE TABLE IF NOT EXISTS categories (id VARCHAR(10) PRIMARY KEY, name VARCHAR(100) NOT NULL)")
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cars (
-                id INT AUTO_INCREMENT PRIMARY KEY, category_id VARCHAR(10), 
-                name VARCHAR(100) NOT NULL UNIQUE, price_per_day DECIMAL(10, 2) NOT NULL,
-                is_available BOOLEAN DEFAULT TRUE, FOREIGN KEY (category_id) REFERENCES categories(id)
-            )
-        """)
+class BackgroundLoader(QObject):
+    """Runs database reads on a small pool of worker threads and delivers the results on the GUI thread.
 
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL,
-                email VARCHAR(100) NOT NULL UNIQUE, password_hash VARCHAR(256) NOT NULL
-            )
-        """)
+    Each worker thread gets its own connection (DBManager.clone) the first time it runs a job and keeps it, so jobs
+    run concurrently without sharing the GUI's connection.
+    """
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
 
-        self.cursor.execute(
-            "CREATE TABLE IF NOT EXISTS services (id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, price DECIMAL(10, 2) NOT NULL, is_daily BOOLEAN NOT NULL)")
-        self.cursor.execute(
-            "CREATE TABLE IF NOT EXISTS transactions (id INT AUTO_INCREMENT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100), user_email VARCHAR(100), car_model VARCHAR(100), duration INT, services_used TEXT, final_total DECIMAL(10, 2))")
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INT AUTO_INCREMENT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100),
-                user_email VARCHAR(100), message_text TEXT
-            )
-        """)
-        self.conn.commit()
-
-    def _insert_initial_data(self):
-        categories = [('1', '6 Seaters (SUVs, MPVs, Vans)'), ('2', '4 Seaters (Sedans & Specialty)')]
-        self.cursor.executemany("INSERT IGNORE INTO categories (id, name) VALUES (%s, %s)", categories)
-
-        cars = [('1', 'Toyota Innova (MPV)', 3200.00), ('1', 'Mitsubishi Xpander (MPV)', 2800.00),
-                ('1', 'Nissan Terra (SUV)', 4500.00), ('1', 'Ford Everest (SUV)', 4300.00),
-                ('1', 'Hyundai Staria (Van)', 6000.00), ('2', 'Toyota Vios / Honda City', 1750.00),
-                ('2', 'Mazda 3', 2200.00), ('2', 'Honda Civic Turbo', 2600.00),
-                ('2', 'Toyota Camry', 3500.00), ('2', 'BMW 3-Series (Luxury)', 5000.00)]
-        car_names = [c[1] for c in cars]
-        self.cursor.execute(f"SELECT name FROM cars WHERE name IN ({', '.join(['%s'] * len(car_names))})", car_names)
-        existing_cars = {row['name'] for row in self.cursor.fetchall()}
-        new_cars = [c for c in cars if c[1] not in existing_cars]
-        if new_cars:
-            self.cursor.executemany("INSERT INTO cars (category_id, name, price_per_day) VALUES (%s, %s, %s)", new_cars)
-
-        self.cursor.execute("SELECT COUNT(*) FROM users WHERE email = 'test@user.com'")
-        if self.cursor.fetchone()['COUNT(*)'] == 0:
-            self.cursor.execute("INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
-                                ("Test User", "test@user.com", hash_password("password")))
-
-        services = [('Insurance and Waivers', 1500.00, False), ('RFID Pass (Toll Fees)', 750.00, False)]
-        service_names = [s[0] for s in services]
-        self.cursor.execute(f"SELECT name FROM services WHERE name IN ({', '.join(['%s'] * len(service_names))})",
-                            service_names)
-        existing_services = {row['name'] for row in self.cursor.fetchall()}
-        new_services = [s for s in services if s[0] not in existing_services]
-        if new_services:
-            self.cursor.executemany("INSERT INTO services (name, price, is_daily) VALUES (%s, %s, %s)", new_services)
-
-        self.conn.commit()
-
-    def register_user(self, name, email, password_hash):
-        try:
-            self.cursor.execute("INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
-                                (name, email, password_hash))
-            self.conn.commit()
-            return True
-        except mysql.connector.Error as err:
-            if err.errno == 1062: return "Email already registered."
-            return str(err)
-
-    def login_user(self, email, password_hash):
-        self.cursor.execute("SELECT name, email FROM users WHERE email = %s AND password_hash = %s",
-                            (email, password_hash))
-        return self.cursor.fetchone()
-
-    def get_all_cars_data(self, only_available=False):
-        query = "SELECT id, name, price_per_day, is_available FROM cars"
-        if only_available: query += " WHERE is_available = TRUE"
-        self.cursor.execute(query + " ORDER BY category_id, name")
-        return self.cursor.fetchall()
-
-    def get_cars_by_category(self, category_id, only_available=False):
-        query = "SELECT name, price_per_day, is_available FROM cars WHERE category_id = %s"
-        if only_available: query += " AND is_available = TRUE"
-        self.cursor.execute(query, (category_id,))
-        return [Car(c['name'], c['price_per_day'], c['is_available']) for c in self.cursor.fetchall()]
-
-    def update_car_availability(self, car_id, is_available):
-        self.cursor.execute("UPDATE cars SET is_available = %s WHERE id = %s", (is_available, car_id))
-        self.conn.commit()
-
-    def get_all_categories(self):
-        self.cursor.execute("SELECT id, name FROM categories ORDER BY id")
-        return self.cursor.fetchall()
-
-    def get_all_services(self):
-        self.cursor.execute("SELECT name, price, is_daily FROM services")
-        return self.cursor.fetchall()
-
-    def save_transaction(self, txn):
-        services = ", ".join([f"{s['name']} (₱{s['cost']:,.2f})" for s in txn.services])
-        data = (txn.timestamp, txn.user.get('name'), txn.user.get('email'), txn.car.name, txn.duration, services,
-                txn.final_total)
-        self.cursor.execute(
-            "INSERT INTO transactions (timestamp, user_name, user_email, car_model, duration, services_used, final_total) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            data)
-        self.conn.commit()
-
-    def save_message(self, name, email, message):
-        self.cursor.execute(
-            "INSERT INTO messages (timestamp, user_name, user_email, message_text) VALUES (%s, %s, %s, %s)",
-            (datetime.datetime.now(), name, email, message))
-        self.conn.commit()
-
-    def get_all_transactions(self):
-        self.cursor.execute("SELECT * FROM transactions ORDER BY timestamp DESC")
-        transactions = []
-        for raw in self.cursor.fetchall():
-            dummy_car = Car(raw['car_model'], 0)
-            user_data = {"name": raw['user_name'], "email": raw['user_email']}
-            services_text = raw.get('services_used', '')
-            services = [{"name": services_text, "cost": 0}] if services_text else []
-            txn = Transaction(user=user_data, car=dummy_car, duration=raw.get('duration', 0), services=services,
-                              final_total=raw.get('final_total', 0.0))
-            txn.timestamp = raw.get('timestamp')
-            transactions.append(txn)
-        return transactions
-
-    def get_all_messages(self):
-        self.cursor.execute("SELECT * FROM messages ORDER BY timestamp DESC")
-        return self.cursor.fetchall()
+    def __init__(self, db, workers=3):
+        super().__init__()
+        self.db, self.pool = db, QThreadPool()
+        self.pool.setMaxThreadCount(workers)
+        self.pool.setExpiryTimeout(-1)  # keep the threads, and with them their connections
+        self._local, self._lock, self._clones = threading.local(), threading.Lock(), []
+        self._callbacks, self._next_job = {}, 0
+        self.finished.connect(self._on_finished)
+        self.failed.connect(self._on_failed)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self.db.clone()
+            with self._lock:
+                self._clones.append(db)
+        return db
+
+    def submit(self, fetch, on_done, on_error=None):
+        """Runs ``fetch(db)`` on a worker; ``on_done(result)`` or ``on_error(exception)`` is then called here."""
+        job, self._next_job = self._next_job, self._next_job + 1
+        self._callbacks[job] = (on_done, on_error)
+
+        def run():
+            try:
+                db = self._connection()
+                db.end_read()  # the previous job on this thread left its snapshot open; read the latest data
+                result = fetch(db)
+            except Exception as err:
+                self.failed.emit(job, err)
+            else:
+                self.finished.emit(job, result)
+
+        self.pool.start(run)
+        return job
+
+    def _on_finished(self, job, result):
+        on_done, _ = self._callbacks.pop(job)
+        on_done(result)
+
+    def _on_failed(self, job, err):
+        _, on_error = self._callbacks.pop(job)
+        if on_error: on_error(err)
+        else: db_log.warning("background load failed: %s", err)
 
     def close(self):
-        if self.conn and self.conn.is_connected():
-            self.cursor.close()
-            self.conn.close()
-
-
-# --- Data Classes & System ---
-
-class Car:
-    def __init__(self, name, price_per_day, is_available=True):
-        self._name, self._price, self._is_available = name, price_per_day, is_available
-
-    @property
-    def name(self): return self._name
-
-    @property
-    def price_per_day(self): return self._price
+        self.pool.waitForDone()
+        for db in self._clones: db.close()
+        self._clones = []
 
-    @property
-    def is_available(self): return self._is_available
 
-    def to_string(self):
-        status = " (Available)" if self._is_available else " (UNAVAILABLE)"
-        return f"{self._name} - {format_peso(self._price)} / day{status}"
+def database_unreachable(err):
+    """True for errors that mean the database cannot be reached, rather than that the request itself was wrong."""
+    return isinstance(err, DatabaseUnavailable) or getattr(err, "errno", None) in DBManager.CONNECTION_LOST
 
 
-class Transaction:
-    def __init__(self, user, car, duration, services, final_total):
-        self.timestamp = datetime.datetime.now()
-        self.user, self.car, self.duration, self.services, self.final_total = user, car, duration, services, final_total
+def db_guarded(quiet=False):
+    """Keeps an unreachable database from escaping a Qt slot or change event handler, where it would abort the app.
 
+    The main window goes offline (see RentalApp.go_offline) and the handler runs once more, now from the snapshot; if
+    that is not possible, or the change needs the database, the desk is told. ``quiet`` handlers (change events) are
+    not run again and only log the error. Extra signal arguments are dropped as in ``traced``.
+    """
 
-class RentalSystem:
-    def __init__(self, db_manager):
-        self.db = db_manager
+    def decorate(func):
+        code = func.__code__
+        max_args = None if code.co_flags & 0x04 else code.co_argcount
 
-    def get_categories(self): return self.db.get_all_categories()
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            if max_args is not None: args = args[:max_args - 1]
+            for _ in range(1 if quiet else 2):
+                try:
+                    return func(self, *args)
+                except OfflineError as err:
+                    error = err
+                    break
+                except Exception as err:
+                    if not database_unreachable(err): raise
+                    error = err
+                    window = self.window()
+                    if not (hasattr(window, "go_offline") and window.go_offline(err)): break
+            if quiet: db_log.warning("%s failed: %s", func.__qualname__, error)
+            elif isinstance(error, OfflineError): QMessageBox.warning(self, "Offline", str(error))
+            else: QMessageBox.warning(self, "Database Unavailable", f"The database cannot be reached: {error}")
 
-    def get_cars(self, cat_id): return self.db.get_cars_by_category(cat_id, only_available=True)
+        return wrapper
 
-    def get_services(self): return [{"name": s['name'], "price": s['price'], "is_daily": bool(s['is_daily'])} for s in
-                                    self.db.get_all_services()]
+    return decorate
 
 
-class RentalManager:
-    def __init__(self, db_manager):
-        self.db = db_manager
-        self.r_sys = RentalSystem(self.db)
-        self.current_user = {"name": "", "email": ""}
-
-    def register(self, name, email, password):
-        return self.db.register_user(name, email, hash_password(password))
-
-    def login(self, email, password):
-        user_data = self.db.login_user(email, hash_password(password))
-        if user_data:
-            self.current_user = {"name": user_data['name'], "email": user_data['email']}
-            return True
-        return False
-
-    def logout(self): self.current_user = {"name": "", "email": ""}
-
-    def record_transaction(self, data):
-        txn = Transaction(user=self.current_user, car=data["car"], duration=data["duration"], services=data["services"],
-                          final_total=data["final_total"])
-        self.db.save_transaction(txn)
-
-    def save_message(self, name, email, message):
-        self.db.save_message(name, email, message)
-
-    def get_all_cars_for_admin(self): return self.db.get_all_cars_data(only_available=False)
-
-    def update_car_unit_availability(self, car_id, is_available):
-        self.db.update_car_availability(car_id, is_available)
-
-    def get_all_transactions(self): return self.db.get_all_transactions()
-
-    def get_all_messages(self): return self.db.get_all_messages()
-
-
-# --- GUI Widgets ---
-
 class BaseWidget(QWidget):
     def __init__(self): super().__init__()
 
@@ -334,13 +196,24 @@ class LoginWidget(BaseWidget):
         layout.addWidget(login_btn, alignment=Qt.AlignmentFlag.AlignCenter)
         layout.addLayout(links_layout)
 
+    @db_guarded()
+    @traced()
     def handle_login(self):
         email, password = self.email_in.text().strip(), self.password_in.text()
         if not (email and password):
             QMessageBox.warning(self, "Error", "Please enter both email and password.")
             return
 
-        if self.manager.login(email, password):
+        try:
+            signed_in = self.manager.login(email, password)
+        except (OfflineError, DatabaseUnavailable):
+            answer = QMessageBox.question(self, "Offline", "Signing in needs the database, which cannot be reached "
+                                                           "right now.\nBrowse the vehicles as a guest meanwhile?")
+            if answer == QMessageBox.StandardButton.Yes:
+                self.manager.browse_as_guest()
+                self.login_successful.emit(self.manager.current_user['name'], "")
+            return
+        if signed_in:
             self.login_successful.emit(self.manager.current_user['name'], email)
         else:
             QMessageBox.critical(self, "Login Failed", "Invalid email or password.")
@@ -402,6 +275,8 @@ class SignupWidget(BaseWidget):
             widget.setStyleSheet("padding: 8px;");
             widget.setMinimumWidth(200)
 
+    @db_guarded()
+    @traced()
     def handle_signup(self):
         name = self.name_in.text().strip();
         email = self.email_in.text().strip()
@@ -514,6 +389,7 @@ class AdminLoginWidget(BaseWidget):
         back_btn.clicked.connect(self.back_to_main.emit)
         layout.addWidget(back_btn, alignment=Qt.AlignmentFlag.AlignCenter)
 
+    @traced()
     def submit_credentials(self):
         self.login_attempted.emit(self.email_in.text().strip(), self.password_in.text())
         self.email_in.clear();
@@ -522,13 +398,19 @@ class AdminLoginWidget(BaseWidget):
 
 class VehicleListWidget(BaseWidget):
     proceed_requested = pyqtSignal(object)
+    PAGE_SIZE = 20
+    SORT_OPTIONS = [("Name (A-Z)", "name"), ("Price: Low to High", "price_asc"), ("Price: High to Low", "price_desc"),
+                    ("Most Units Free", "units")]
 
     def __init__(self, rental_manager):
         super().__init__()
-        self.car_checkboxes = [];
+        self.car_checkboxes = [];  # the rows showing the current page
+        self._rows = []  # every car row made so far; pages reuse them instead of creating new ones
         self.manager = rental_manager
+        self.page, self.total_results = 0, 0
         self.setup_ui();
         self.update_car_list()
+        self.manager.events.subscribe(CarChanged, self.on_cars_changed)
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -545,60 +427,181 @@ class VehicleListWidget(BaseWidget):
         self.welcome_lbl.setStyleSheet("margin-bottom: 5px;")
         main_layout.addWidget(self.welcome_lbl)
 
+        filters_box = QGroupBox("Find a Vehicle");
+        filters_layout = QGridLayout(filters_box)
+        self.search_in = QLineEdit();
+        self.search_in.setPlaceholderText("Search by model name...")
+        self.category_combo = QComboBox()
+        self.min_price_in = QLineEdit();
+        self.min_price_in.setPlaceholderText("Min ₱/day");
+        self.min_price_in.setValidator(QIntValidator(0, 1000000))
+        self.max_price_in = QLineEdit();
+        self.max_price_in.setPlaceholderText("Max ₱/day");
+        self.max_price_in.setValidator(QIntValidator(0, 1000000))
+        self.sort_combo = QComboBox()
+        for label, key in self.SORT_OPTIONS: self.sort_combo.addItem(label, key)
+
+        filters_layout.addWidget(self.search_in, 0, 0, 1, 2);
+        filters_layout.addWidget(self.category_combo, 0, 2, 1, 2)
+        filters_layout.addWidget(self.min_price_in, 1, 0);
+        filters_layout.addWidget(self.max_price_in, 1, 1)
+        filters_layout.addWidget(QLabel("Sort by:"), 1, 2, alignment=Qt.AlignmentFlag.AlignRight);
+        filters_layout.addWidget(self.sort_combo, 1, 3)
+        main_layout.addWidget(filters_box)
+
+        # Typing restarts the timer, so the search only runs once the customer pauses.
+        self.filter_timer = QTimer(self);
+        self.filter_timer.setSingleShot(True);
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filters)
+        for line_edit in [self.search_in, self.min_price_in, self.max_price_in]:
+            line_edit.textChanged.connect(lambda _: self.filter_timer.start())
+        self.category_combo.currentIndexChanged.connect(lambda _: self.apply_filters())
+        self.sort_combo.currentIndexChanged.connect(lambda _: self.apply_filters())
+
         self.scroll_area = QScrollArea();
         self.scroll_area.setWidgetResizable(True)
         self.cars_content_widget = QWidget();
         self.cars_layout = QVBoxLayout(self.cars_content_widget)
         self.cars_layout.setAlignment(Qt.AlignmentFlag.AlignTop);
+        self.empty_lbl = self.create_label("", True)
+        self.empty_lbl.hide()
+        self.cars_layout.addWidget(self.empty_lbl, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.cars_layout.addStretch(1);
         self.scroll_area.setWidget(self.cars_content_widget)
         main_layout.addWidget(self.scroll_area)
 
+        pager_layout = QHBoxLayout()
+        self.prev_btn = QPushButton("◀ Prev");
+        self.prev_btn.clicked.connect(lambda: self.change_page(-1))
+        self.page_lbl = QLabel();
+        self.page_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.next_btn = QPushButton("Next ▶");
+        self.next_btn.clicked.connect(lambda: self.change_page(1))
+        pager_layout.addWidget(self.prev_btn);
+        pager_layout.addWidget(self.page_lbl, 1);
+        pager_layout.addWidget(self.next_btn)
+        main_layout.addLayout(pager_layout)
+
         proceed_btn = QPushButton("Proceed to Options");
         proceed_btn.clicked.connect(self.proceed_to_options)
         main_layout.addWidget(proceed_btn)
 
+    def _row(self, index):
+        """Returns the car row at ``index``, creating it the first time; at most PAGE_SIZE rows are ever made."""
+        while len(self._rows) <= index:
+            checkbox = QCheckBox()
+            checkbox.clicked.connect(lambda checked, btn=checkbox: self.enforce_single_selection(btn))
+            self.cars_layout.insertWidget(len(self._rows), checkbox)
+            self._rows.append(checkbox)
+        return self._rows[index]
+
     def enforce_single_selection(self, clicked_checkbox):
         if clicked_checkbox.isChecked():
             for cb in self.car_checkboxes:
                 if cb is not clicked_checkbox and cb.isChecked(): cb.setChecked(False)
 
-    def update_car_list(self):
-        while self.cars_layout.count():
-            item = self.cars_layout.takeAt(0)
-            if widget := item.widget(): widget.deleteLater()
-
-        self.car_checkboxes.clear();
-        categories = self.manager.r_sys.get_categories()
-        all_cars = self.manager.db.get_all_cars_data(only_available=True)
-
-        if not all_cars:
-            self.cars_layout.addWidget(self.create_label("No vehicles currently available for rent.", True),
-                                       alignment=Qt.AlignmentFlag.AlignCenter)
-            self.cars_layout.addStretch(1);
-            return
+    def current_filters(self):
+        min_price, max_price = self.min_price_in.text(), self.max_price_in.text()
+        return {"category_id": self.category_combo.currentData(), "text": self.search_in.text().strip(),
+                "min_price": int(min_price) if min_price else None, "max_price": int(max_price) if max_price else None,
+                "sort": self.sort_combo.currentData()}
 
-        for cat in categories:
-            group = QGroupBox(cat['name']);
-            group.setFont(QFont("Arial", 10, QFont.Weight.Bold))
-            group_layout = QVBoxLayout(group)
-            cars = self.manager.r_sys.get_cars(cat['id'])
+    def apply_filters(self):
+        self.filter_timer.stop()
+        self.page = 0;
+        self.refresh_results()
 
-            if cars:
-                for car in cars:
-                    checkbox = QCheckBox(f"{car.name} - {format_peso(car.price_per_day)} / day")
-                    checkbox.setProperty("car_object", car);
-                    group_layout.addWidget(checkbox)
-                    self.car_checkboxes.append(checkbox)
-                    checkbox.clicked.connect(lambda checked, btn=checkbox: self.enforce_single_selection(btn))
-                self.cars_layout.addWidget(group)
+    def change_page(self, step):
+        self.page += step;
+        self.refresh_results()
 
-        self.cars_layout.addStretch(1)
+    @db_guarded()
+    def update_car_list(self):
+        with tracer.fetch("categories"):
+            self.manager.r_sys.release_expired_units()
+            categories = self.manager.r_sys.get_categories()
+
+        selected = self.category_combo.currentData()
+        self.category_combo.blockSignals(True)
+        self.category_combo.clear();
+        self.category_combo.addItem("All Categories", None)
+        for cat in categories: self.category_combo.addItem(cat['name'], cat['id'])
+        self.category_combo.setCurrentIndex(max(self.category_combo.findData(selected), 0))
+        self.category_combo.blockSignals(False)
+        self.refresh_results()
+
+    @db_guarded()
+    def refresh_results(self):
+        """Shows one page of matches; filtering, sorting and paging all happen in the database."""
+        filters = self.current_filters()
+        with tracer.fetch():
+            cars, self.total_results = self.manager.r_sys.search_cars(**filters, limit=self.PAGE_SIZE,
+                                                                      offset=self.page * self.PAGE_SIZE)
+            page_count = max(1, -(-self.total_results // self.PAGE_SIZE))
+            if self.page >= page_count:
+                self.page = page_count - 1
+                cars, self.total_results = self.manager.r_sys.search_cars(**filters, limit=self.PAGE_SIZE,
+                                                                          offset=self.page * self.PAGE_SIZE)
+
+        with tracer.build():
+            self.prev_btn.setEnabled(self.page > 0);
+            self.next_btn.setEnabled(self.page < page_count - 1)
+            self.page_lbl.setText(f"Page {self.page + 1} of {page_count} ({self.total_results} vehicles)")
+
+            if not cars:
+                filtered = filters['category_id'] or filters['text'] or filters['min_price'] or filters['max_price']
+                self.empty_lbl.setText("No vehicles match your search." if filtered
+                                       else "No vehicles currently available for rent.")
+            self.empty_lbl.setVisible(not cars)
+
+            # The rows are updated in place; those the page does not need are hidden until a longer page comes.
+            for index, car in enumerate(cars):
+                checkbox = self._row(index)
+                checkbox.setChecked(False);
+                checkbox.setEnabled(True)
+                checkbox.setProperty("car_object", car);
+                checkbox.setText(self.car_label(car))
+                checkbox.setVisible(True)
+            for checkbox in self._rows[len(cars):]:
+                checkbox.setChecked(False);
+                checkbox.setProperty("car_object", None)
+                checkbox.setVisible(False)
+            self.car_checkboxes = self._rows[:len(cars)]
+
+    @staticmethod
+    def car_label(car):
+        label = f"{car.name} - {format_peso(car.price_per_day)} / day ({car.available_units} available)"
+        return label if car.is_available else f"{label} - not for rent"
+
+    @db_guarded(quiet=True)
+    def on_cars_changed(self, event):
+        """Updates the checkboxes of the changed models on this page; a catalog-wide change reloads the list."""
+        if event.car_ids is None:
+            self.update_car_list();
+            return
+        changed = set(event.car_ids)
+        for checkbox in self.car_checkboxes:
+            car_id = checkbox.property("car_object").car_id
+            if car_id not in changed: continue
+            row = self.manager.get_car_data(car_id)
+            if row is None: continue
+            car = Car(row['name'], row['price_per_day'], bool(row['is_available']), car_id, int(row['available_units']))
+            checkbox.setProperty("car_object", car);
+            checkbox.setText(self.car_label(car))
+            bookable = car.is_available and car.available_units > 0
+            if not bookable: checkbox.setChecked(False)
+            checkbox.setEnabled(bookable)
 
     def update_welcome_message(self, name):
         # We now set the welcome message as the user name for confirmation after login
         self.welcome_lbl.setText(f"Welcome, {name}!")
 
+    @traced()
     def proceed_to_options(self):
+        if self.manager.is_guest:
+            QMessageBox.information(self, "Guest", "Please sign in to book; signing in needs the database.")
+            return
         selected_checkbox = next((cb for cb in self.car_checkboxes if cb.isChecked()), None)
         if not selected_checkbox:
             QMessageBox.warning(self, "Error", "Please select a car to continue.");
@@ -642,6 +645,19 @@ class OptionsWidget(BaseWidget):
         dur_layout.addStretch();
         options_layout.addLayout(dur_layout)
 
+        date_layout = QHBoxLayout();
+        self.date_in = QDateEdit(QDate.currentDate());
+        self.date_in.setCalendarPopup(True);
+        self.date_in.setMinimumDate(QDate.currentDate())
+        date_layout.addWidget(QLabel("Pick-up date:"));
+        date_layout.addWidget(self.date_in)
+        date_layout.addStretch();
+        options_layout.addLayout(date_layout)
+        self.quote_lbl = self.create_label("", True, 11);
+        options_layout.addWidget(self.quote_lbl)
+        self.dur_in.textChanged.connect(self.update_quote);
+        self.date_in.dateChanged.connect(self.update_quote)
+
         addons_group = QGroupBox("Add-ons");
         addons_layout = QVBoxLayout();
         addons_group.setLayout(addons_layout)
@@ -649,6 +665,7 @@ class OptionsWidget(BaseWidget):
             price_text = f"{format_peso(svc['price'])} / day" if svc['is_daily'] else format_peso(svc['price'])
             box = QCheckBox(f"{svc['name']} ({price_text})");
             box.setProperty("svc_data", svc)
+            box.toggled.connect(self.update_quote)
             addons_layout.addWidget(box);
             self.svc_boxes.append(box)
 
@@ -669,16 +686,17 @@ class OptionsWidget(BaseWidget):
         self.selected_car = car;
         self.car_selection_label.setText(f"Options for: {self.selected_car.name}")
         self.dur_in.setText("1");
+        self.date_in.setMinimumDate(QDate.currentDate());
+        self.date_in.setDate(QDate.currentDate())
         for box in self.svc_boxes: box.setChecked(False)
+        self.update_quote()
 
-    def confirm_and_book(self):
-        if not self.selected_car: return
+    def booking_data(self):
+        """Prices the current selection with the price calendar; returns None if the duration is invalid."""
         days_str = self.dur_in.text()
-        if not days_str.isdigit() or int(days_str) <= 0:
-            QMessageBox.warning(self, "Error", "Please enter a valid number of days.");
-            return
-        days = int(days_str);
-        base_total = self.selected_car.price_per_day * days
+        if not self.selected_car or not days_str.isdigit() or int(days_str) <= 0: return None
+        days, start_date = int(days_str), self.date_in.date().toPyDate()
+        base_total = self.manager.r_sys.quote(self.selected_car, start_date, days)
         services = [];
         services_total = 0
         for box in self.svc_boxes:
@@ -687,9 +705,21 @@ class OptionsWidget(BaseWidget):
                 cost = svc['price'] * days if svc['is_daily'] else svc['price']
                 services_total += cost
                 services.append({"name": svc['name'], "cost": cost})
-        final_total = base_total + services_total
-        booking_data = {"car": self.selected_car, "duration": days, "base_total": base_total,
-                        "services": services, "final_total": final_total}
+        return {"car": self.selected_car, "duration": days, "start_date": start_date, "base_total": base_total,
+                "services": services, "final_total": base_total + services_total}
+
+    @db_guarded()
+    def update_quote(self):
+        data = self.booking_data()
+        self.quote_lbl.setText(f"Estimated total: {format_peso(data['final_total'])}" if data else "")
+
+    @traced()
+    def confirm_and_book(self):
+        if not self.selected_car: return
+        booking_data = self.booking_data()
+        if booking_data is None:
+            QMessageBox.warning(self, "Error", "Please enter a valid number of days.");
+            return
         self.booking_confirmed.emit(booking_data)
 
 
@@ -741,6 +771,7 @@ class MessageWidget(BaseWidget):
         self.email_in.setText(email);
         self.message_in.clear()
 
+    @traced()
     def send_message(self):
         name = self.name_in.text();
         email = self.email_in.text()
@@ -801,12 +832,19 @@ class ReceiptWidget(BaseWidget):
         grid.addWidget(QLabel("Base Cost:"), 3, 0);
         self.base_lbl = QLabel();
         grid.addWidget(self.base_lbl, 3, 1, Qt.AlignmentFlag.AlignRight)
+        grid.addWidget(QLabel("Unit Plate:"), 4, 0);
+        self.unit_lbl = QLabel();
+        grid.addWidget(self.unit_lbl, 4, 1, Qt.AlignmentFlag.AlignRight)
 
         content_layout.addLayout(grid)
         self.svc_title = self.create_label("--- ADD-ONS ---", True, 10);
         content_layout.addWidget(self.svc_title, alignment=Qt.AlignmentFlag.AlignCenter)
         self.svc_layout = QVBoxLayout();
         self.svc_layout.setContentsMargins(0, 0, 0, 0);
+        self.no_svc_lbl = QLabel("(No extra services selected)");
+        self.no_svc_lbl.setStyleSheet("font-style: italic;")
+        self.svc_layout.addWidget(self.no_svc_lbl, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.svc_rows = []  # (row, name label, cost label) for each add-on line made so far, reused by every receipt
         content_layout.addLayout(self.svc_layout)
 
         content_layout.addStretch(1);
@@ -824,79 +862,99 @@ class ReceiptWidget(BaseWidget):
         button.clicked.connect(self.start_new_rental.emit);
         layout.addWidget(button)
 
+    def _svc_row(self, index):
+        """Returns the add-on line at ``index``, creating it the first time."""
+        while len(self.svc_rows) <= index:
+            row = QWidget();
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            name_lbl, cost_lbl = QLabel(), QLabel()
+            row_layout.addWidget(name_lbl);
+            row_layout.addWidget(cost_lbl, alignment=Qt.AlignmentFlag.AlignRight)
+            self.svc_layout.insertWidget(len(self.svc_rows), row)
+            self.svc_rows.append((row, name_lbl, cost_lbl))
+        return self.svc_rows[index]
+
     def update_receipt(self, name, data):
         self.name_lbl.setText(f"Client: {name}");
         self.car_lbl.setText(data["car"].name)
-        self.dur_lbl.setText(f"{data['duration']} Day{'s' if data['duration'] > 1 else ''}");
+        pickup = f" from {data['start_date']:%b %d, %Y}" if data.get("start_date") else ""
+        self.dur_lbl.setText(f"{data['duration']} Day{'s' if data['duration'] > 1 else ''}{pickup}");
         self.base_lbl.setText(format_peso(data["base_total"]))
+        unit = data.get("unit")
+        self.unit_lbl.setText(f"{unit['plate']} ({unit['branch']})" if unit else "N/A")
         self.total_lbl.setText(format_peso(data["final_total"]))
 
-        while self.svc_layout.count():
-            item = self.svc_layout.takeAt(0)
-            if widget := item.widget():
-                widget.deleteLater()
-            elif layout := item.layout():
-                while layout.count():
-                    child = layout.takeAt(0)
-                    if child_widget := child.widget(): child_widget.deleteLater()
-
-        if data["services"]:
-            self.svc_title.show()
-            for svc in data["services"]:
-                item = QHBoxLayout();
-                item.addWidget(QLabel(f"- {svc['name']}"));
-                item.addWidget(QLabel(format_peso(svc['cost'])), alignment=Qt.AlignmentFlag.AlignRight)
-                self.svc_layout.addLayout(item)
-        else:
-            self.svc_title.hide()
-            no_svc_label = QLabel("(No extra services selected)");
-            no_svc_label.setStyleSheet("font-style: italic;")
-            self.svc_layout.addWidget(no_svc_label, alignment=Qt.AlignmentFlag.AlignCenter)
+        services = data["services"]
+        self.svc_title.setVisible(bool(services))
+        self.no_svc_lbl.setVisible(not services)
+        for index, svc in enumerate(services):
+            row, name_lbl, cost_lbl = self._svc_row(index)
+            name_lbl.setText(f"- {svc['name']}");
+            cost_lbl.setText(format_peso(svc['cost']))
+            row.setVisible(True)
+        for row, _, _ in self.svc_rows[len(services):]: row.setVisible(False)
+
+
+def fetch_sales_report(db, include_archive=False):
+    """Reads the sales section's data. The change_log position is read first, so the data is at least that new."""
+    version = db.change_position()
+    if isinstance(version, dict): version = tuple(sorted(version.items()))  # one position per branch
+    if include_archive: version = (version, "archive")  # charts of the two views are cached apart
+    names = {row['id']: row['name'] for row in db.get_all_categories()}
+    categories = {car['name']: names.get(car['category_id'], "Other") for car in db.get_pricing()["cars"]}
+    return SalesData(db.get_all_transactions(include_archive), categories, version)
 
 
 class AdminDashboardWidget(BaseWidget):
     back_to_main = pyqtSignal()
-    availability_updated = pyqtSignal()
     signout_requested = pyqtSignal()
-
-    def __init__(self, rental_manager):
+    chart_ready = pyqtSignal(object, object, object)  # chart key, PNG bytes, error; emitted by the chart service
+    import_progress = pyqtSignal(object)  # the user import's report so far; emitted from the loader's worker thread
+    CHART_REFRESH_MS = 2000  # after bookings, redraw the chart once they stop coming in for this long
+
+    # What each section loads; these run on a worker thread with a connection of its own (see BackgroundLoader).
+    FETCHES = {
+        "sales": fetch_sales_report,
+        "availability": lambda db: db.get_all_cars_data(only_available=False),
+        "messages": lambda db, include_archive=False: db.get_all_messages(include_archive),
+        "demand": fetch_demand_cube,
+    }
+
+    def __init__(self, rental_manager, loader=None, charts=None):
+        """``loader`` (a BackgroundLoader) fetches the sections and ``charts`` (a ChartService) draws the charts in the
+        background; without them both happen here, on the GUI thread."""
         super().__init__();
-        self.manager = rental_manager
-        self.txns, self.chart = [], None;
+        self.manager, self.loader, self.charts = rental_manager, loader, charts
+        self.sales, self.chart, self._chart_key = None, None, None;
         self.car_data = []
+        self.revenue, self.sales_rows, self._car_rows = Decimal(0), 0, {}
+        self._loaded, self._loading, self._shown = {}, set(), set()
+        self._generation = dict.fromkeys(self.FETCHES, 0)
         self.setup_ui()
+        self.archive_boxes = {"sales": self.sales_archive_chk, "messages": self.messages_archive_chk}
+        self.sections = {"sales": self.sales_report_w, "availability": self.availability_w, "messages": self.messages_w,
+                         "demand": self.demand_w}
+        self.stacked_sections.currentChanged.connect(self._show_loaded)
+        self.manager.events.subscribe(CarChanged, self.on_cars_changed)
+        self.manager.events.subscribe(BookingCreated, self.on_booking_created)
+        self.manager.events.subscribe(MessageReceived, self.on_message_received)
+        self.chart_ready.connect(self._chart_arrived)
+        self.import_progress.connect(self._user_import_progress)
+        self._chart_timer = QTimer(self)
+        self._chart_timer.setSingleShot(True)
+        self._chart_timer.setInterval(self.CHART_REFRESH_MS)
+        self._chart_timer.timeout.connect(self._refresh_chart)
+
+    def chart_request(self):
+        """Returns the chart picked in the sales section and its parameters."""
+        name = self.chart_combo.currentData()
+        return name, {"period": self.period_combo.currentData()} if name == "revenue_over_time" else {}
 
     def generate_chart(self):
-        try:
-            df = pd.DataFrame([{'car_model': t.car.name, 'final_total': t.final_total} for t in self.txns])
-            if df.empty: return None
-
-            rental_counts = df.groupby('car_model').size().sort_values(ascending=False)
-
-            colors = plt.cm.viridis(rental_counts.index.factorize()[0] / len(rental_counts))
-
-            plt.figure(figsize=(10, 6))
-            rental_counts.plot(kind='bar', color=colors)
-
-            def count_formatter(x, pos):
-                return f'{int(x)}'
-
-            plt.gca().yaxis.set_major_formatter(FuncFormatter(count_formatter))
-
-            plt.title('Most Rented Units (Total Rental Count)', fontsize=16, weight='bold')
-            plt.xlabel('Car Model', fontsize=12)
-            plt.ylabel('Total Number of Rentals', fontsize=12)
-            plt.xticks(rotation=45, ha='right', fontsize=10)
-            plt.grid(axis='y', linestyle='--', alpha=0.7)
-            plt.tight_layout()
-
-            filename = 'sales_by_car_chart.png'
-            plt.savefig(filename);
-            plt.close()
-            return filename
-        except Exception as e:
-            print(f"Chart Error: {e}");
-            return None
+        """Draws the picked chart of the shown sales data here, on this thread, as PNG bytes (None without data)."""
+        name, params = self.chart_request()
+        return render_chart(name, self.sales, **params) if self.sales else None
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self);
@@ -910,23 +968,38 @@ class AdminDashboardWidget(BaseWidget):
         self.sales_report_w = self._create_sales_report_tab();
         self.availability_w = self._create_availability_management_tab()
         self.messages_w = self._create_message_viewer_tab()
+        self.import_w = self._create_user_import_tab()
+        self.utilization_w = self._create_utilization_tab()
+        self.demand_w = self._create_demand_tab()
 
         self.stacked_sections.addWidget(self.sales_report_w);
         self.stacked_sections.addWidget(self.availability_w)
         self.stacked_sections.addWidget(self.messages_w)
+        self.stacked_sections.addWidget(self.import_w)
+        self.stacked_sections.addWidget(self.utilization_w)
+        self.stacked_sections.addWidget(self.demand_w)
 
         nav_layout = QHBoxLayout()
         self.sales_btn = QPushButton("📈 Sales Report");
         self.availability_btn = QPushButton("🛠️ Inventory Availability")
         self.messages_btn = QPushButton("💬 Customer Messages")
+        self.import_btn = QPushButton("👥 Import Users")
+        self.utilization_btn = QPushButton("📊 Utilization")
+        self.demand_btn = QPushButton("🔥 Demand")
 
         self.sales_btn.clicked.connect(lambda: self.stacked_sections.setCurrentWidget(self.sales_report_w))
         self.availability_btn.clicked.connect(self._go_to_inventory)
         self.messages_btn.clicked.connect(lambda: self.stacked_sections.setCurrentWidget(self.messages_w))
+        self.import_btn.clicked.connect(lambda: self.stacked_sections.setCurrentWidget(self.import_w))
+        self.utilization_btn.clicked.connect(lambda: self.stacked_sections.setCurrentWidget(self.utilization_w))
+        self.demand_btn.clicked.connect(lambda: self.stacked_sections.setCurrentWidget(self.demand_w))
 
         nav_layout.addWidget(self.sales_btn);
         nav_layout.addWidget(self.availability_btn);
-        nav_layout.addWidget(self.messages_btn)
+        nav_layout.addWidget(self.messages_btn);
+        nav_layout.addWidget(self.import_btn)
+        nav_layout.addWidget(self.utilization_btn)
+        nav_layout.addWidget(self.demand_btn)
         main_layout.addLayout(nav_layout);
         main_layout.addWidget(self.stacked_sections)
 
@@ -955,6 +1028,24 @@ class AdminDashboardWidget(BaseWidget):
         total_revenue_layout.addWidget(self.total_revenue_lbl, alignment=Qt.AlignmentFlag.AlignRight)
         layout.addLayout(total_revenue_layout)
 
+        chart_picker_layout = QHBoxLayout()
+        chart_picker_layout.addWidget(QLabel("Chart:"))
+        self.chart_combo = QComboBox()
+        for name, (title, _) in CHARTS.items(): self.chart_combo.addItem(title, name)
+        self.period_combo = QComboBox()
+        for period, label in PERIODS.items(): self.period_combo.addItem(f"per {label}", period)
+        self.period_combo.setCurrentIndex(list(PERIODS).index("M"))
+        self.period_combo.hide()
+        self.chart_combo.currentIndexChanged.connect(self.show_chart)
+        self.period_combo.currentIndexChanged.connect(self.show_chart)
+        chart_picker_layout.addWidget(self.chart_combo);
+        chart_picker_layout.addWidget(self.period_combo);
+        chart_picker_layout.addStretch()
+        self.sales_archive_chk = QCheckBox("Include archived")
+        self.sales_archive_chk.toggled.connect(lambda: self.load("sales"))
+        chart_picker_layout.addWidget(self.sales_archive_chk)
+        layout.addLayout(chart_picker_layout)
+
         self.chart_lbl = QLabel("Chart will be displayed here.");
         self.chart_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.chart_lbl.setMinimumSize(400, 300);
@@ -965,8 +1056,8 @@ class AdminDashboardWidget(BaseWidget):
                          alignment=Qt.AlignmentFlag.AlignCenter)
 
         self.table = QTableWidget();
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["Date", "Client", "Car", "Add-ons", "Days", "Total"])
+        self.table.setColumnCount(7)
+        self.table.setHorizontalHeaderLabels(["Date", "Client", "Car", "Unit", "Add-ons", "Days", "Total"])
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers);
         layout.addWidget(self.table)
@@ -992,20 +1083,55 @@ class AdminDashboardWidget(BaseWidget):
         layout.addWidget(action_group)
 
         self.availability_table = QTableWidget();
-        self.availability_table.setColumnCount(4)
-        self.availability_table.setHorizontalHeaderLabels(["Car Model", "Price", "Current Status", "Select"])
+        self.availability_table.setColumnCount(5)
+        self.availability_table.setHorizontalHeaderLabels(["Car Model", "Price", "Current Status", "Free Units",
+                                                           "Select"])
         self.availability_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         self.availability_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers);
         layout.addWidget(self.availability_table)
 
+        buttons_layout = QHBoxLayout()
         refresh_btn = QPushButton("Refresh List");
-        refresh_btn.clicked.connect(self.populate_availability_table);
-        layout.addWidget(refresh_btn)
+        refresh_btn.clicked.connect(lambda: self.load("availability"));
+        buttons_layout.addWidget(refresh_btn)
+        self.import_catalog_btn = QPushButton("Import Catalog (CSV/JSON)");
+        self.import_catalog_btn.clicked.connect(self.choose_catalog_files);
+        buttons_layout.addWidget(self.import_catalog_btn)
+        layout.addLayout(buttons_layout)
         return widget
 
     def _go_to_inventory(self):
-        self.populate_availability_table();
+        # Opening the inventory refreshes it, unless fresh data is already on its way.
+        stale = "availability" not in self._loading and "availability" not in self._loaded
         self.stacked_sections.setCurrentWidget(self.availability_w)
+        if stale: self.load("availability")
+
+    @traced()
+    def choose_catalog_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Import Catalog", "",
+                                                "Catalog files (*.csv *.json);;All files (*)")
+        if paths: self.run_catalog_import(paths)
+
+    @db_guarded()
+    def run_catalog_import(self, paths, confirm=True):
+        try:
+            plans = self.manager.import_catalog(paths, dry_run=True)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            QMessageBox.warning(self, "Import Failed", f"Could not read the catalog: {e}")
+            return
+        summary = "\n".join(f"{branch + ': ' if branch else ''}{plan_summary(plan)}" for branch, plan in plans.items())
+        if not any(has_changes(plan) for plan in plans.values()):
+            QMessageBox.information(self, "Import Catalog", f"The catalog is already up to date.\n\n{summary}")
+            return
+        if confirm and QMessageBox.question(self, "Import Catalog", f"Apply these changes?\n\n{summary}") \
+                != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            self.manager.import_catalog(paths)
+        except Exception as e:
+            QMessageBox.critical(self, "Database Error", f"The catalog was not changed: {e}")
+            return
+        QMessageBox.information(self, "Import Complete", f"Catalog updated.\n\n{summary}")
 
     # --- Section 3: Message Viewer ---
     def _create_message_viewer_tab(self):
@@ -1021,63 +1147,445 @@ class AdminDashboardWidget(BaseWidget):
         self.message_table.itemDoubleClicked.connect(self.show_full_message);
         layout.addWidget(self.message_table)
 
+        buttons_layout = QHBoxLayout()
         refresh_btn = QPushButton("Refresh Messages");
-        refresh_btn.clicked.connect(self.populate_message_table);
-        layout.addWidget(refresh_btn)
+        refresh_btn.clicked.connect(lambda: self.load("messages"));
+        buttons_layout.addWidget(refresh_btn)
+        self.messages_archive_chk = QCheckBox("Include archived")
+        self.messages_archive_chk.toggled.connect(lambda: self.load("messages"))
+        buttons_layout.addWidget(self.messages_archive_chk)
+        layout.addLayout(buttons_layout)
         return widget
 
-    # --- Data Population Methods ---
+    # --- Section 4: Bulk User Import ---
+    def _create_user_import_tab(self):
+        widget = QWidget();
+        layout = QVBoxLayout(widget)
+        layout.addWidget(self.create_label("Bulk User Import", True, 14), alignment=Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(QLabel("Choose a CSV file with name, email and password columns."))
+
+        action_group = QGroupBox("Import Accounts");
+        action_layout = QHBoxLayout(action_group)
+        self.import_mode_combo = QComboBox();
+        self.import_mode_combo.addItem("Skip already registered emails", False)
+        self.import_mode_combo.addItem("Update already registered emails", True)
+        self.import_file_btn = QPushButton("Choose CSV and Import");
+        self.import_file_btn.clicked.connect(self.choose_import_file)
+        action_layout.addWidget(self.import_mode_combo);
+        action_layout.addWidget(self.import_file_btn);
+        layout.addWidget(action_group)
+
+        self.import_status_lbl = self.create_label("No import run yet.", True, 11);
+        layout.addWidget(self.import_status_lbl)
+        self.import_log = QTextEdit();
+        self.import_log.setReadOnly(True);
+        layout.addWidget(self.import_log)
+        return widget
+
+    @traced()
+    def choose_import_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Users", "", "CSV files (*.csv);;All files (*)")
+        if path: self.run_user_import(path)
+
+    def run_user_import(self, path):
+        update_existing = self.import_mode_combo.currentData()
+
+        def progress(report): self.import_progress.emit(dict(report))  # a copy, as the import goes on changing it
+
+        def fetch(db): return self.manager.import_users(path, update_existing, progress, db=db)
+
+        self.import_file_btn.setEnabled(False);
+        self.import_log.clear()
+        self.import_status_lbl.setText("Importing...")
+        if self.loader is None:
+            try:
+                report = fetch(self.manager.db)
+            except Exception as e:
+                return self._user_import_failed(e)
+            return self._user_import_done(report)
+        self.loader.submit(fetch, self._user_import_done, self._user_import_failed)
+
+    def _user_import_progress(self, report):
+        self.import_status_lbl.setText(f"Imported {report['read']:,} rows ({report['rows_per_s']:,.0f} rows/s)...")
+
+    def _user_import_failed(self, err):
+        self.import_file_btn.setEnabled(True)
+        self.import_status_lbl.setText("Import stopped.")
+        if isinstance(err, (OSError, ValueError, UnicodeDecodeError)):
+            QMessageBox.warning(self, "Import Failed", f"Could not read the file: {err}")
+        else:
+            QMessageBox.critical(self, "Database Error", f"Import stopped: {err}")
+
+    def _user_import_done(self, report):
+        self.import_file_btn.setEnabled(True)
+        self.import_status_lbl.setText(
+            f"{report['inserted']:,} added, {report['updated']:,} updated, {len(report['duplicates']):,} duplicates, "
+            f"{len(report['invalid']):,} invalid in {report['seconds']:.1f}s ({report['rows_per_s']:,.0f} rows/s)")
+        problems = sorted(report['duplicates'] + report['invalid'])
+        lines = [f"Line {line}: {email or '(no email)'} - {reason}" for line, email, reason in problems[:500]]
+        if len(problems) > 500: lines.append(f"... and {len(problems) - 500:,} more.")
+        self.import_log.setPlainText("\n".join(lines) or "All rows imported.")
+
+    # --- Section 5: Fleet Utilization ---
+    def _create_utilization_tab(self):
+        widget = QWidget();
+        layout = QVBoxLayout(widget)
+        layout.addWidget(self.create_label("Fleet Utilization", True, 14), alignment=Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(QLabel("Share of each model's unit-days spent rented, from the booking date for the "
+                                "booked number of days."))
+
+        action_group = QGroupBox("Report");
+        action_layout = QHBoxLayout(action_group)
+        today = QDate.currentDate()
+        self.util_from_in = QDateEdit(today.addDays(-89));
+        self.util_from_in.setCalendarPopup(True)
+        self.util_to_in = QDateEdit(today);
+        self.util_to_in.setCalendarPopup(True)
+        self.util_period_combo = QComboBox()
+        for period, label in PERIODS.items(): self.util_period_combo.addItem(f"per {label}", period)
+        self.util_period_combo.setCurrentIndex(list(PERIODS).index("M"))
+        self.util_group_combo = QComboBox()
+        self.util_group_combo.addItem("By Car", "car");
+        self.util_group_combo.addItem("By Category", "category")
+        self.util_group_combo.addItem("By Period", "period")
+        self.util_group_combo.currentIndexChanged.connect(self.populate_utilization_table)
+        self.util_run_btn = QPushButton("Run Report");
+        self.util_run_btn.clicked.connect(self.run_utilization_report)
+        for label, field in (("From:", self.util_from_in), ("To:", self.util_to_in)):
+            action_layout.addWidget(QLabel(label));
+            action_layout.addWidget(field)
+        action_layout.addWidget(self.util_period_combo);
+        action_layout.addWidget(self.util_group_combo);
+        self.util_archive_chk = QCheckBox("Include archived")
+        action_layout.addWidget(self.util_archive_chk);
+        action_layout.addWidget(self.util_run_btn);
+        layout.addWidget(action_group)
+
+        self.util_summary_lbl = self.create_label("Pick a date range and run the report.", True, 11);
+        layout.addWidget(self.util_summary_lbl)
+        self.util_table = QTableWidget();
+        self.util_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers);
+        layout.addWidget(self.util_table)
+        self.utilization = None
+        return widget
+
+    @traced()
+    def run_utilization_report(self):
+        start, end = self.util_from_in.date().toPyDate(), self.util_to_in.date().toPyDate()
+        if end < start:
+            QMessageBox.warning(self, "Utilization", "The end date is before the start date.");
+            return
+        period, include_archive = self.util_period_combo.currentData(), self.util_archive_chk.isChecked()
+
+        def fetch(db): return fetch_utilization_report(db, start, end, period, include_archive)
+
+        self.util_run_btn.setEnabled(False);
+        self.util_summary_lbl.setText("Working out utilization...")
+        if self.loader is None:
+            with tracer.fetch("utilization"):
+                self._utilization_arrived(fetch(self.manager.db))
+            return
+        self.loader.submit(fetch, self._utilization_arrived, self._utilization_failed)
+
+    def _utilization_arrived(self, report):
+        self.util_run_btn.setEnabled(True)
+        self.utilization = report
+        self.populate_utilization_table()
+
+    def _utilization_failed(self, err):
+        self.util_run_btn.setEnabled(True)
+        self.util_summary_lbl.setText(f"Could not build the report: {err}")
+
+    def populate_utilization_table(self):
+        report = self.utilization
+        if report is None: return
+        total = report.by_car[["rented_days", "capacity_days"]].sum()
+        share = f"{total.rented_days / total.capacity_days:.1%}" if total.capacity_days else "n/a"
+        summary = (f"{report.start:%Y-%m-%d} to {report.end:%Y-%m-%d}: {share} of {total.capacity_days:,} unit-days "
+                   f"rented ({total.rented_days:,}).")
+        if report.unmatched: summary += f" {report.unmatched:,} bookings of models no longer listed are left out."
+        self.util_summary_lbl.setText(summary)
+
+        group = self.util_group_combo.currentData()
+        frame = {"car": report.by_car, "category": report.by_category, "period": report.by_period}[group]
+        frame = frame.sort_index() if group == "period" else frame.sort_values("utilization", ascending=False)
+        headers = {"car": ["Car Model", "Category", "Units"], "category": ["Category", "Units"], "period": ["Period"]}[group]
+        self.util_table.clear()
+        self.util_table.setColumnCount(len(headers) + 3)
+        self.util_table.setHorizontalHeaderLabels(headers + ["Rented Days", "Capacity (unit-days)", "Utilization"])
+        self.util_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.util_table.setRowCount(len(frame))
+        for row, (name, values) in enumerate(zip(frame.index, frame.itertuples(index=False))):
+            cells = [str(name)] + ([values.category] if group == "car" else []) \
+                + ([f"{values.units:,}"] if group != "period" else []) \
+                + [f"{values.rented_days:,}", f"{values.capacity_days:,}",
+                   "n/a" if pd.isna(values.utilization) else f"{values.utilization:.1%}"]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column >= (2 if group == "car" else 1):  # the numbers
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.util_table.setItem(row, column, item)
+        self.util_table.resizeColumnsToContents()
+
+    # --- Section 6: Booking Demand ---
+    def _create_demand_tab(self):
+        widget = QWidget();
+        layout = QVBoxLayout(widget)
+        layout.addWidget(self.create_label("Booking Demand", True, 14), alignment=Qt.AlignmentFlag.AlignCenter)
+
+        filter_layout = QHBoxLayout()
+        self.demand_category_combo = QComboBox();
+        self.demand_category_combo.addItem("All Categories", None)
+        self.demand_season_combo = QComboBox();
+        self.demand_season_combo.addItems(list(SEASONS))
+        self.demand_measure_combo = QComboBox()
+        for measure, label in MEASURES.items(): self.demand_measure_combo.addItem(label, measure)
+        for combo in (self.demand_category_combo, self.demand_season_combo, self.demand_measure_combo):
+            combo.currentIndexChanged.connect(self.draw_demand_heatmap)
+            filter_layout.addWidget(combo)
+        refresh_btn = QPushButton("Refresh");
+        refresh_btn.clicked.connect(lambda: self.load("demand"));
+        filter_layout.addWidget(refresh_btn)
+        layout.addLayout(filter_layout)
+
+        self.demand_summary_lbl = QLabel("");
+        self.demand_summary_lbl.setWordWrap(True)
+        layout.addWidget(self.demand_summary_lbl)
+        self.demand_table = QTableWidget();
+        self.demand_table.setColumnCount(24)
+        self.demand_table.setHorizontalHeaderLabels([f"{hour:02d}" for hour in range(24)])
+        self.demand_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.demand_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers);
+        layout.addWidget(self.demand_table)
+        layout.addWidget(QLabel("Rows are the weekday and columns the hour a booking was made."))
+        self.demand = None
+        return widget
 
-    def populate_sales_report(self, txns):
-        self.txns = txns
+    def populate_demand_heatmap(self, cube=None):
+        if cube is None:
+            with tracer.fetch():
+                cube = fetch_demand_cube(self.manager.db)
+        self.demand, self._shown = cube, self._shown | {"demand"}
+        combo, current = self.demand_category_combo, self.demand_category_combo.currentData()
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItem("All Categories", None)
+        for category_id in cube.category_ids: combo.addItem(cube.names[category_id], category_id)
+        combo.setCurrentIndex(max(0, combo.findData(current)))
+        combo.blockSignals(False)
+        self.draw_demand_heatmap()
+
+    def draw_demand_heatmap(self):
+        """Colours the weekday x hour grid for the chosen category, season and measure; no database access."""
+        if self.demand is None: return
+        measure, months = self.demand_measure_combo.currentData(), SEASONS[self.demand_season_combo.currentText()]
+        grid = self.demand.heatmap(measure, self.demand_category_combo.currentData(), months)
+        peak, colors = grid.max(), plt.colormaps["YlOrRd"]
+
+        def show(value):
+            return format_peso(value) if measure == "revenue" else f"{value:,.0f}"
+
+        self.demand_table.clearSpans()
+        self.demand_table.setRowCount(7)
+        self.demand_table.setVerticalHeaderLabels(list(WEEKDAYS))
+        for day in range(7):
+            for hour in range(24):
+                value = grid[day, hour]
+                text = (f"{value / 1000:,.0f}k" if measure == "revenue" else f"{value:,.0f}") if value else ""
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                share = value / peak if peak else 0.0
+                item.setBackground(QColor.fromRgbF(*colors(share)))
+                if share > 0.6: item.setForeground(QColor("white"))
+                item.setToolTip(f"{WEEKDAYS[day]} {hour:02d}:00-{hour + 1:02d}:00: {show(value)}")
+                self.demand_table.setItem(day, hour, item)
+
+        label = MEASURES[measure].lower()
+        if not peak:
+            self.demand_summary_lbl.setText(f"No {label} recorded for this selection yet.")
+            return
+        day, hour = divmod(int(grid.argmax()), 24)
+        totals = self.demand.totals(measure, months)
+        by_category = ", ".join(f"{self.demand.names[c]}: {show(v)}" for c, v in totals.items() if v)
+        self.demand_summary_lbl.setText(f"{show(grid.sum())} {label}; busiest: {WEEKDAYS[day]} {hour:02d}:00. "
+                                        f"By category: {by_category}.")
+
+    # --- Background Loading ---
+
+    def load(self, *sections):
+        """Fetches the given sections (all by default) in the background.
+
+        The dashboard stays usable meanwhile: a section is filled in when its data has arrived and it is on screen,
+        so sections the admin never opens cost a query but no widget work. Without a loader the fetch runs here.
+        """
+        for key in sections or self.FETCHES:
+            self._generation[key] += 1
+            generation = self._generation[key]
+            self._loaded.pop(key, None)
+            self._shown.discard(key)
+            self._show_status(key, "Loading...")
+            if self.loader is None:
+                with tracer.fetch(key):
+                    self._arrived(key, generation, self._fetch(key)(self.manager.db))
+                continue
+            self._loading.add(key)
+            self.loader.submit(self._fetch(key),
+                               lambda result, key=key, gen=generation: self._arrived(key, gen, result),
+                               lambda err, key=key, gen=generation: self._load_failed(key, gen, err))
+
+    def _fetch(self, key):
+        """Returns the fetch of a section, reading the archive tables too if its "Include archived" box is ticked."""
+        if key in self.archive_boxes and self.archive_boxes[key].isChecked():
+            return functools.partial(self.FETCHES[key], include_archive=True)
+        return self.FETCHES[key]
+
+    def _arrived(self, key, generation, result):
+        if generation != self._generation[key]: return  # superseded by a newer load
+        self._loading.discard(key)
+        self._loaded[key] = result
+        if self.stacked_sections.currentWidget() is self.sections[key]: self._show(key)
+
+    def _load_failed(self, key, generation, err):
+        if generation != self._generation[key]: return
+        self._loading.discard(key)
+        self._show_status(key, f"Could not load this section: {err}")
+
+    def _show_loaded(self, index):
+        for key, widget in self.sections.items():
+            if widget is self.stacked_sections.widget(index) and key in self._loaded: self._show(key)
+
+    def _show(self, key):
+        result = self._loaded.pop(key)
+        with tracer.build(f"{key} section"):
+            if key == "sales": self.populate_sales_report(result)
+            elif key == "availability": self.populate_availability_table(result)
+            elif key == "demand": self.populate_demand_heatmap(result)
+            else: self.populate_message_table(result)
+        tracer.paint(self)
+
+    def _patchable(self, key):
+        """True if the section shows data that a change can be patched into.
+
+        Data that is still loading or waiting to be shown may predate the change, so such a section is reloaded.
+        """
+        if key in self._loading or key in self._loaded:
+            self.load(key)
+            return False
+        return key in self._shown
+
+    # --- Change Events ---
+
+    @db_guarded(quiet=True)
+    def on_cars_changed(self, event):
+        if not self._patchable("availability"): return
+        rows = [self._car_rows.get(car_id) for car_id in event.car_ids or ()]
+        if event.car_ids is None or None in rows:
+            self.load("availability");  # new models, or the whole catalog changed
+            return
+        for car_id, row in zip(event.car_ids, rows):
+            car = self.manager.get_car_data(car_id)
+            if car is None: continue
+            self.car_data[row] = car
+            self._fill_availability_row(row, car)
+            wrapper = self.availability_table.cellWidget(row, 4)
+            if wrapper and (checkbox := wrapper.findChild(QCheckBox)): checkbox.setChecked(False)
+
+    @db_guarded(quiet=True)
+    def on_booking_created(self, event):
+        if not self._patchable("sales"): return
+        row = self.manager.get_transaction(event.transaction_id)
+        if row is None: return
+        tx = TransactionRow(**{field: row.get(field) for field in TransactionRow._fields})
+        if not self.sales_rows:
+            self.table.clearSpans();  # drop the "No transactions" line
+            self.table.setRowCount(0)
+        self.table.insertRow(0)
+        self._fill_sales_row(0, tx)
+        self.sales_rows += 1
+        self.revenue += tx.final_total or 0
+        self.total_revenue_lbl.setText(format_peso(self.revenue))
+        self._chart_timer.start()
+
+    @db_guarded(quiet=True)
+    def on_message_received(self, event):
+        if not self._patchable("messages"): return
+        msg = self.manager.get_message(event.message_id)
+        if msg is None: return
+        self.message_table.insertRow(0)
+        self._fill_message_row(0, msg)
+
+    def _show_status(self, key, text):
+        table = {"sales": self.table, "availability": self.availability_table, "messages": self.message_table,
+                 "demand": self.demand_table}[key]
+        if key == "sales":
+            self.chart, self._chart_key = None, None
+            self._chart_timer.stop()
+            self.total_revenue_lbl.setText("...")
+            self.chart_lbl.setText(text)
+        table.clearSpans();
+        table.setRowCount(1)
+        item = QTableWidgetItem(text);
+        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+        table.setSpan(0, 0, 1, table.columnCount());
+        table.setItem(0, 0, item)
+        for column in range(1, table.columnCount()): table.removeCellWidget(0, column)
 
-        grand_total = sum(tx.final_total for tx in txns)
-        self.total_revenue_lbl.setText(format_peso(grand_total))
+    # --- Data Population Methods ---
 
-        chart_file = self.generate_chart();
-        self.chart = QPixmap(chart_file) if chart_file else None
+    def populate_sales_report(self, sales=None):
+        """Fills the sales section from ``sales`` (see fetch_sales_report) and asks for its chart."""
+        if sales is None:
+            with tracer.fetch():
+                sales = fetch_sales_report(self.manager.db)
+        txns, self.sales, self._shown = sales.txns, sales, self._shown | {"sales"}
 
-        self.table.setRowCount(0)
+        self.revenue, self.sales_rows = txns.total(), len(txns)
+        self.total_revenue_lbl.setText(format_peso(self.revenue))
+
+        self.table.setRowCount(0);
+        self.table.clearSpans()
         if not txns:
             self.table.setRowCount(1);
             item = QTableWidgetItem("No transactions recorded yet.");
             item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setSpan(0, 0, 1, 6);
+            self.table.setSpan(0, 0, 1, 7);
             self.table.setItem(0, 0, item)
         else:
             self.table.setRowCount(len(txns))
-            for row, tx in enumerate(txns):
-                date = tx.timestamp.strftime("%Y-%m-%d %H:%M") if tx.timestamp else "N/A"
-                total = QTableWidgetItem(format_peso(tx.final_total));
-                total.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-
-                svcs = tx.services[0]['name'] if tx.services and tx.services[0]['name'] else "None"
-                display_svcs = (svcs[:30] + '...') if len(svcs) > 33 else svcs
-
-                self.table.setItem(row, 0, QTableWidgetItem(date));
-                self.table.setItem(row, 1, QTableWidgetItem(tx.user.get('name', 'N/A')))
-                self.table.setItem(row, 2, QTableWidgetItem(tx.car.name));
-                self.table.setItem(row, 3, QTableWidgetItem(display_svcs))
-                self.table.setItem(row, 4, QTableWidgetItem(str(tx.duration)));
-                self.table.setItem(row, 5, total)
+            for row, tx in enumerate(txns): self._fill_sales_row(row, tx)
 
         self.table.resizeRowsToContents();
         self.table.resizeColumnsToContents();
-        self.refresh_scaled_chart()
-
-    def populate_availability_table(self):
-        self.car_data = self.manager.get_all_cars_for_admin();
+        self.show_chart()
+
+    def _fill_sales_row(self, row, tx):
+        date = tx.timestamp.strftime("%Y-%m-%d %H:%M") if tx.timestamp else "N/A"
+        total = QTableWidgetItem(format_peso(tx.final_total));
+        total.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+        svcs = tx.services_used or "None"
+        display_svcs = (svcs[:30] + '...') if len(svcs) > 33 else svcs
+
+        self.table.setItem(row, 0, QTableWidgetItem(date));
+        self.table.setItem(row, 1, QTableWidgetItem(tx.user_name or 'N/A'))
+        model = f"{tx.car_model} ({tx.branch})" if tx.branch else tx.car_model
+        self.table.setItem(row, 2, QTableWidgetItem(model));
+        self.table.setItem(row, 3, QTableWidgetItem(tx.plate or "N/A"))
+        self.table.setItem(row, 4, QTableWidgetItem(display_svcs))
+        self.table.setItem(row, 5, QTableWidgetItem(str(tx.duration)));
+        self.table.setItem(row, 6, total)
+
+    def populate_availability_table(self, car_data=None):
+        if car_data is None:
+            with tracer.fetch():
+                car_data = self.manager.get_all_cars_for_admin();
+        self.car_data, self._shown = car_data, self._shown | {"availability"}
+        self._car_rows = {car['id']: row for row, car in enumerate(self.car_data)}
+        self.availability_table.clearSpans()
         self.availability_table.setRowCount(len(self.car_data))
 
         for row, car in enumerate(self.car_data):
-            self.availability_table.setItem(row, 0, QTableWidgetItem(car['name']))
-            price_item = QTableWidgetItem(format_peso(car['price_per_day']));
-            price_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.availability_table.setItem(row, 1, price_item)
-
-            status_text = "✅ Available" if car['is_available'] else "❌ Unavailable";
-            status_item = QTableWidgetItem(status_text)
-            self.availability_table.setItem(row, 2, status_item)
+            self._fill_availability_row(row, car)
 
             checkbox = QCheckBox();
             checkbox.setCheckState(Qt.CheckState.Unchecked)
@@ -1088,16 +1596,32 @@ class AdminDashboardWidget(BaseWidget):
             cb_layout.addWidget(checkbox);
             cb_layout.setAlignment(Qt.AlignmentFlag.AlignCenter);
             cb_layout.setContentsMargins(0, 0, 0, 0)
-            self.availability_table.setCellWidget(row, 3, widget_wrapper)
+            self.availability_table.setCellWidget(row, 4, widget_wrapper)
 
         self.availability_table.resizeColumnsToContents();
         self.availability_table.resizeRowsToContents()
 
+    def _fill_availability_row(self, row, car):
+        name = f"{car['name']} ({car['branch']})" if car.get('branch') else car['name']
+        self.availability_table.setItem(row, 0, QTableWidgetItem(name))
+        price_item = QTableWidgetItem(format_peso(car['price_per_day']));
+        price_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.availability_table.setItem(row, 1, price_item)
+
+        status_text = "✅ Available" if car['is_available'] else "❌ Unavailable";
+        status_item = QTableWidgetItem(status_text)
+        self.availability_table.setItem(row, 2, status_item)
+
+        units_item = QTableWidgetItem(f"{int(car['available_units'])} / {car['total_units']}")
+        units_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.availability_table.setItem(row, 3, units_item)
+
+    @traced()
     def apply_bulk_availability(self):
         new_status = self.status_combo.currentData();
         selected_car_ids = []
         for row in range(self.availability_table.rowCount()):
-            widget_wrapper = self.availability_table.cellWidget(row, 3)
+            widget_wrapper = self.availability_table.cellWidget(row, 4)
             if widget_wrapper:
                 checkbox = widget_wrapper.findChild(QCheckBox)
                 if checkbox and checkbox.isChecked(): selected_car_ids.append(checkbox.property("car_id"))
@@ -1106,41 +1630,42 @@ class AdminDashboardWidget(BaseWidget):
             QMessageBox.warning(self, "No Selection", "Please select at least one car to update.");
             return
 
-        success_count = 0
         try:
-            for car_id in selected_car_ids:
-                self.manager.update_car_unit_availability(car_id, new_status);
-                success_count += 1
+            # The CarChanged event updates just these rows here and in the vehicle list.
+            self.manager.update_cars_availability(selected_car_ids, new_status);
 
             QMessageBox.information(self, "Update Complete",
-                                    f"Successfully set {success_count} car(s) to {'Available' if new_status else 'Unavailable'}.")
-
-            self.populate_availability_table();
-            self.availability_updated.emit()
+                                    f"Successfully set {len(selected_car_ids)} car(s) to {'Available' if new_status else 'Unavailable'}.")
 
         except Exception as e:
             QMessageBox.critical(self, "Database Error", f"Failed to update availability: {e}")
 
-    def populate_message_table(self):
-        messages = self.manager.get_all_messages();
+    def populate_message_table(self, messages=None):
+        if messages is None:
+            with tracer.fetch():
+                messages = self.manager.get_all_messages();
+        self._shown.add("messages")
+        self.message_table.clearSpans()
         self.message_table.setRowCount(len(messages))
 
-        for row, msg in enumerate(messages):
-            date = msg['timestamp'].strftime("%Y-%m-%d %H:%M") if msg['timestamp'] else "N/A"
-            snippet = msg['message_text'][:50].replace('\n', ' ') + '...' if len(msg['message_text']) > 50 else msg[
-                'message_text']
-
-            self.message_table.setItem(row, 0, QTableWidgetItem(date));
-            self.message_table.setItem(row, 1, QTableWidgetItem(msg['user_name']))
-            self.message_table.setItem(row, 2, QTableWidgetItem(msg['user_email']))
-
-            snippet_item = QTableWidgetItem(snippet);
-            snippet_item.setData(Qt.ItemDataRole.UserRole, msg['message_text'])
-            self.message_table.setItem(row, 3, snippet_item)
+        for row, msg in enumerate(messages): self._fill_message_row(row, msg)
 
         self.message_table.resizeRowsToContents();
         self.message_table.resizeColumnsToContents()
 
+    def _fill_message_row(self, row, msg):
+        date = msg['timestamp'].strftime("%Y-%m-%d %H:%M") if msg['timestamp'] else "N/A"
+        snippet = msg['message_text'][:50].replace('\n', ' ') + '...' if len(msg['message_text']) > 50 else msg[
+            'message_text']
+
+        self.message_table.setItem(row, 0, QTableWidgetItem(date));
+        self.message_table.setItem(row, 1, QTableWidgetItem(msg['user_name']))
+        self.message_table.setItem(row, 2, QTableWidgetItem(msg['user_email']))
+
+        snippet_item = QTableWidgetItem(snippet);
+        snippet_item.setData(Qt.ItemDataRole.UserRole, msg['message_text'])
+        self.message_table.setItem(row, 3, snippet_item)
+
     def show_full_message(self, item):
         if item.column() == 3:
             full_message = item.data(Qt.ItemDataRole.UserRole)
@@ -1149,6 +1674,49 @@ class AdminDashboardWidget(BaseWidget):
             email = self.message_table.item(user_row, 2).text()
             QMessageBox.information(self, f"Message from {name}", f"From: {email}\n\n{full_message}")
 
+    # --- Charts ---
+
+    def show_chart(self):
+        """Shows the picked chart of the sales data; the chart service draws it unless it is cached."""
+        name, params = self.chart_request()
+        self.period_combo.setVisible(name == "revenue_over_time")
+        if self.sales is None: return
+        # Set the key first: a cached chart is delivered before request() returns.
+        self._chart_key = ChartService.key(name, self.sales, **params)
+        if self.charts is None:
+            with tracer.build("chart"):
+                self._chart_arrived(self._chart_key, self.generate_chart(), None)
+            return
+        self.chart = None
+        self.chart_lbl.setText("Drawing chart...")
+        self.charts.request(name, self.sales, self.chart_ready.emit, **params)
+
+    def _chart_arrived(self, key, png, error):
+        if key != self._chart_key: return  # another chart was picked, or the data changed, since it was asked for
+        self.chart = None
+        if png:
+            self.chart = QPixmap()
+            self.chart.loadFromData(png)
+        if error is not None:
+            self.chart_lbl.setText(f"Could not draw the chart: {error}")
+            return
+        self.refresh_scaled_chart()
+
+    def _refresh_chart(self):
+        """Redraws the chart from fresh data, after new bookings were added to the table row by row."""
+        if self.loader is None: return self._chart_data_arrived(fetch_sales_report(self.manager.db))
+        self.loader.submit(fetch_sales_report, self._chart_data_arrived, self._chart_data_failed)
+
+    def _chart_data_arrived(self, sales):
+        if "sales" in self._loading or "sales" in self._loaded: return  # a full reload is on its way
+        self.sales = sales
+        self.show_chart()
+
+    def _chart_data_failed(self, err):
+        if "sales" in self._loading or "sales" in self._loaded: return
+        self.chart, self._chart_key = None, None
+        self.chart_lbl.setText(f"Could not refresh the chart: {err}")
+
     def refresh_scaled_chart(self):
         if self.chart and not self.chart.isNull() and self.width() > 10:
             scaled = self.chart.scaled(self.chart_lbl.size(), Qt.AspectRatioMode.KeepAspectRatio,
@@ -1199,9 +1767,12 @@ class SidebarWidget(QWidget):
 
 # --- Main Application ---
 class RentalApp(QMainWindow):
+    CHANGE_POLL_MS = 3000
+    RECONNECT_MS = 15000  # while offline, how often a worker checks whether the database answers again
+    TITLE = "Ragadio's Car Rentals"
     def __init__(self):
         super().__init__();
-        self.setWindowTitle("Ragadio's Car Rentals")
+        self.setWindowTitle(self.TITLE)
         try:
             self.setWindowIcon(QIcon("car-removebg-preview.png"))
         except:
@@ -1212,8 +1783,26 @@ class RentalApp(QMainWindow):
         self.message_size = (650, 500);
         self.admin_size = (950, 700);
         self.setMinimumSize(500, 400)
-        self.db = DBManager();
-        self.manager = RentalManager(self.db)
+        # The catalog snapshot serves startup and browsing; with one the database is connected in the background.
+        self.snapshot = CatalogSnapshot()
+        self.db, offline = self.open_database();
+        self.db.fail_fast()  # never back off on the GUI thread; try_reconnect waits for the server on a worker
+        self.manager = RentalManager(self.db, self.snapshot, offline)
+        self.loader = BackgroundLoader(self.db)
+        self.charts = ChartService()
+        self.setup_metrics_export()
+        self.keepalive_timer = QTimer(self)
+        self.keepalive_timer.timeout.connect(self.keep_connection_alive)
+        self.keepalive_timer.start(60000)
+        # Other desks' bookings and availability changes arrive through the change log.
+        self.changes_timer = QTimer(self)
+        self.changes_timer.timeout.connect(self.poll_changes)
+        self.changes_timer.start(self.CHANGE_POLL_MS)
+        self._reconnecting = False
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.timeout.connect(self.try_reconnect)
+        self.reconnect_timer.start(self.RECONNECT_MS)
+        if self.manager.offline: self.try_reconnect()
 
         container = QWidget();
         layout = QHBoxLayout(container);
@@ -1229,12 +1818,87 @@ class RentalApp(QMainWindow):
         self.init_widgets();
         self.setup_connections()
 
+    def open_database(self):
+        """Returns the database and whether to start offline, i.e. from the snapshot while it connects.
+
+        Without a snapshot the connection is opened here, retried with backoff, and then the user may retry or close.
+        """
+        if self.snapshot.loaded: return open_database(connect=False), True
+        while True:
+            db = open_database(connect=False)
+            try:
+                db.ping()  # connects and creates the schema
+                return db, False
+            except DatabaseUnavailable as err:
+                db.close()  # a BranchDBManager would keep its thread pool
+                answer = QMessageBox.critical(None, "Database Error",
+                                              f"{err}.\nPlease ensure your database server (like XAMPP) is running.",
+                                              QMessageBox.StandardButton.Retry | QMessageBox.StandardButton.Close)
+                if answer != QMessageBox.StandardButton.Retry: sys.exit(1)
+
+    def poll_changes(self):
+        try:
+            self.manager.poll_changes()
+        except DatabaseUnavailable as err:
+            self.go_offline(err)
+        except self.db.connector.Error as err:
+            db_log.warning("polling the change log failed: %s", err)
+
+    def keep_connection_alive(self):
+        if self.manager.offline: return
+        try:
+            self.db.keepalive()
+        except DatabaseUnavailable as err:
+            self.go_offline(err)
+
+    def go_offline(self, err):
+        """Switches to the snapshot after the database could not be reached; False if there is no snapshot."""
+        db_log.warning("database unreachable, working offline: %s", err)
+        if not self.manager.go_offline(): return False
+        self.setWindowTitle(f"{self.TITLE} (offline)")
+        return True
+
+    def try_reconnect(self):
+        # A worker opens its own connection, so the GUI never waits for the connection attempts.
+        if not self.manager.offline or self._reconnecting: return
+        self._reconnecting = True
+        self.loader.submit(lambda db: db.ping(), self._reconnected, self._still_offline)
+
+    def _still_offline(self, err):
+        self._reconnecting = False
+        self.setWindowTitle(f"{self.TITLE} (offline)")
+
+    def _reconnected(self, _):
+        self._reconnecting = False
+        try:
+            saved, failed = self.manager.go_online()
+        except (DatabaseUnavailable, self.db.connector.Error) as err:
+            db_log.warning("going back online failed: %s", err)
+            return
+        self.setWindowTitle(self.TITLE)
+        if not (saved or failed): return
+        lines = [f"{len(saved)} booking(s) taken offline were saved."]
+        if failed:
+            lines.append("These could not be placed; please contact the customers:")
+            lines += [f"- {b.user['name']} <{b.user['email']}>: {b.error}" for b in failed]
+        QMessageBox.information(self, "Back Online", "\n".join(lines))
+
+    def setup_metrics_export(self):
+        # RENTAL_METRICS_PORT serves /metrics locally, RENTAL_METRICS_FILE is rewritten every 15 seconds.
+        if port := os.environ.get("RENTAL_METRICS_PORT"):
+            self.db.metrics.serve(int(port))
+        self.metrics_file = os.environ.get("RENTAL_METRICS_FILE")
+        if self.metrics_file:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(lambda: self.db.metrics.write_prometheus(self.metrics_file))
+            self.metrics_timer.start(15000)
+
     def init_widgets(self):
         self.auth_w = AuthWidget(self.manager);
         self.vehicle_list_w = VehicleListWidget(self.manager)
         self.options_w = OptionsWidget(self.manager);
         self.receipt_w = ReceiptWidget()
-        self.admin_dashboard_w = AdminDashboardWidget(self.manager);
+        self.admin_dashboard_w = AdminDashboardWidget(self.manager, self.loader, self.charts);
         self.admin_login_w = AdminLoginWidget()
         self.message_w = MessageWidget(self.manager)
 
@@ -1260,66 +1924,105 @@ class RentalApp(QMainWindow):
 
         self.admin_dashboard_w.back_to_main.connect(self.go_to_vehicle_list)
         self.admin_dashboard_w.signout_requested.connect(self.on_logout)
-        self.admin_dashboard_w.availability_updated.connect(self.go_to_vehicle_list)
 
         self.message_w.message_sent.connect(self.on_message_sent);
         self.message_w.back_to_main.connect(self.go_to_vehicle_list)
 
+    @traced(cat="navigation")
     def on_login(self, name, email):
         self.vehicle_list_w.update_welcome_message(name);
         self.go_to_vehicle_list();
         self.sidebar.show()
 
+    @traced(cat="navigation")
     def on_logout(self):
         self.manager.logout();
         self.auth_w.reset_view()
         self.stack.setCurrentWidget(self.auth_w);
         self.resize(600, 400);
         self.sidebar.hide()
+        tracer.paint(self)
 
+    @traced(cat="navigation")
     def go_to_vehicle_list(self):
-        self.manager.r_sys = RentalSystem(self.db);
         self.vehicle_list_w.update_car_list()
         self.stack.setCurrentWidget(self.vehicle_list_w);
         self.resize(*self.vehicle_list_size)
+        tracer.paint(self)
 
+    @traced(cat="navigation")
     def go_to_options(self, car):
-        self.options_w.update_view(car);
+        with tracer.build():
+            self.options_w.update_view(car);
         self.stack.setCurrentWidget(self.options_w);
         self.resize(*self.options_size)
+        tracer.paint(self)
 
+    @traced(cat="navigation")
     def go_to_message_center(self):
         user = self.manager.current_user
-        self.message_w.set_user_details(user.get('name'), user.get('email'));
+        with tracer.build():
+            self.message_w.set_user_details(user.get('name'), user.get('email'));
         self.stack.setCurrentWidget(self.message_w)
         self.resize(*self.message_size)
+        tracer.paint(self)
 
+    @traced(cat="navigation")
     def on_booking_confirmed(self, data):
-        self.manager.record_transaction(data);
-        self.receipt_w.update_receipt(self.manager.current_user['name'], data)
+        try:
+            with tracer.fetch("save booking"):
+                try:
+                    unit = self.manager.record_transaction(data);
+                except DatabaseUnavailable as err:
+                    # Nothing was claimed (see RentalManager._book), so the booking can be queued offline.
+                    if not self.go_offline(err): raise
+                    unit = self.manager.record_transaction(data)  # queued, saved once the database is back
+        except BookingUncertain as err:
+            QMessageBox.warning(self, "Booking Not Confirmed",
+                                f"{err}.\nIt may have been saved: please check the sales report before booking again.")
+            return
+        except (DatabaseUnavailable, self.db.connector.Error) as err:
+            QMessageBox.critical(self, "Booking Failed", f"The booking could not be saved: {err}\nPlease try again.")
+            return
+        if unit is None:
+            QMessageBox.warning(self, "Fully Booked",
+                                f"All units of {data['car'].name} were just booked. Please choose another vehicle.")
+            self.go_to_vehicle_list()
+            return
+        data["unit"] = unit
+        with tracer.build():
+            self.receipt_w.update_receipt(self.manager.current_user['name'], data)
         self.stack.setCurrentWidget(self.receipt_w);
         self.resize(500, 600)
+        tracer.paint(self)
 
+    @traced(cat="navigation")
     def on_message_sent(self):
         QMessageBox.information(self, "Message Sent",
                                 "Thank you for your message! Our team will get back to you shortly.")
         self.go_to_vehicle_list()
 
+    @traced(cat="navigation")
     def check_admin_login(self, email, password):
         if email.lower() == "admin@gmail.com" and password == "admin123":
             self.resize(*self.admin_size)
             self.manager.current_user = {"name": "Administrator", "email": "admin@gmail.com"}
 
-            self.admin_dashboard_w.populate_sales_report(self.manager.get_all_transactions())
-            self.admin_dashboard_w.populate_availability_table()
-            self.admin_dashboard_w.populate_message_table()
+            # The dashboard shows up at once; its sections fill in as their data arrives.
+            self.admin_dashboard_w.load()
             self.stack.setCurrentWidget(self.admin_dashboard_w)
+            tracer.paint(self)
         else:
             QMessageBox.critical(self, "Access Denied", "Incorrect email or password.")
             self.stack.setCurrentWidget(self.admin_login_w)
 
     def closeEvent(self, e):
+        if self.metrics_file: self.db.metrics.write_prometheus(self.metrics_file)
+        self.db.metrics.stop()
+        self.loader.close()
+        self.charts.close()
         self.db.close();
+        self.snapshot.close()
         super().closeEvent(e)
 
 
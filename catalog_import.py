@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Fleet and price catalog import from CSV or JSON files.
+
+A JSON file holds any of the lists ``categories``, ``cars``, ``services`` and ``price_rules``:
+
+    {"categories": [{"id": "3", "name": "Pickups"}],
+     "cars": [{"name": "Ford Ranger", "category_id": "3", "price_per_day": 3900, "units": 2}],
+     "services": [{"name": "Child Seat", "price": 250, "is_daily": true}],
+     "price_rules": [{"name": "Weekends", "weekdays": "56", "multiplier": 1.2},
+                     {"name": "Holy Week", "start_date": "2027-03-21", "end_date": "2027-03-28",
+                      "car": "Ford Ranger", "fixed_price": 5000, "priority": 10}]}
+
+A CSV file holds one of them, recognised by its header: ``id,name`` for categories,
+``name,price_per_day`` (plus optional ``category_id``, ``is_available``, ``units``) for cars,
+``name,price,is_daily`` for services and ``name`` with ``multiplier`` or ``fixed_price`` for price
+rules (see price_calendar.py). A file with only ``name,price_per_day`` is a price update.
+
+The file is compared with the current tables and only the differences are written, in one
+transaction (see DBManager.apply_catalog). Rows that are not in the file are left untouched.
+"""
+import os
+import csv
+import json
+import datetime
+from decimal import Decimal, InvalidOperation
+
+TABLES = ("categories", "cars", "services", "price_rules")
+RULE_FIELDS = ("car", "category_id", "start_date", "end_date", "weekdays", "multiplier", "fixed_price", "priority")
+_TRUE = {"1", "true", "yes", "y", "t"}
+
+
+def _price(value, where):
+    try:
+        price = Decimal(str(value).replace(",", "").replace("₱", "").strip()).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"{where}: '{value}' is not a price.")
+    if price < 0: raise ValueError(f"{where}: the price cannot be negative.")
+    return price
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else str(value).strip().lower() in _TRUE
+
+
+def _date(value, where):
+    try:
+        return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{where}: '{value}' is not a YYYY-MM-DD date.")
+
+
+def _kind(columns):
+    if "multiplier" in columns or "fixed_price" in columns: return "price_rules"
+    if "price_per_day" in columns: return "cars"
+    if "is_daily" in columns or "price" in columns: return "services"
+    if "id" in columns: return "categories"
+    raise ValueError(f"Cannot tell what the columns {', '.join(sorted(columns))} describe.")
+
+
+def _normalize(kind, rows, source):
+    """Cleans the rows of one table; optional fields that are absent stay absent."""
+    clean = {}
+    for number, row in enumerate(rows, 1):
+        row = {str(k).strip().lower(): v for k, v in row.items() if k is not None and v not in (None, "")}
+        where = f"{source} {kind} row {number}"
+        key = "id" if kind == "categories" else "name"
+        if not str(row.get(key, "")).strip(): raise ValueError(f"{where}: '{key}' is required.")
+        item = {key: str(row[key]).strip()}
+        if kind == "categories":
+            if not str(row.get("name", "")).strip(): raise ValueError(f"{where}: 'name' is required.")
+            item["name"] = str(row["name"]).strip()
+        elif kind == "cars":
+            if "price_per_day" in row: item["price_per_day"] = _price(row["price_per_day"], where)
+            if "category_id" in row: item["category_id"] = str(row["category_id"]).strip()
+            if "is_available" in row: item["is_available"] = _flag(row["is_available"])
+            if "units" in row: item["units"] = int(row["units"])
+        elif kind == "services":
+            if "price" not in row: raise ValueError(f"{where}: 'price' is required.")
+            item["price"], item["is_daily"] = _price(row["price"], where), _flag(row.get("is_daily", False))
+        else:
+            item.update({field: None for field in RULE_FIELDS}, priority=0)
+            if ("multiplier" in row) == ("fixed_price" in row):
+                raise ValueError(f"{where}: give either a 'multiplier' or a 'fixed_price'.")
+            if "fixed_price" in row: item["fixed_price"] = _price(row["fixed_price"], where)
+            if "multiplier" in row: item["multiplier"] = _price(row["multiplier"], where).quantize(Decimal("0.001"))
+            for field in ("start_date", "end_date"):
+                if field in row: item[field] = _date(row[field], where)
+            weekdays = str(row.get("weekdays", "")).strip()
+            if weekdays and not set(weekdays) <= set("0123456"):
+                raise ValueError(f"{where}: weekdays must be day numbers 0 (Monday) to 6 (Sunday), e.g. '56'.")
+            item["weekdays"] = "".join(sorted(set(weekdays))) or None
+            for field in ("car", "category_id"):
+                if field in row: item[field] = str(row[field]).strip()
+            if "priority" in row: item["priority"] = int(row["priority"])
+        clean[item[key]] = item  # a later row for the same key wins
+    return list(clean.values())
+
+
+def load_catalog(paths):
+    """Reads the given CSV/JSON files into {"categories": [...], "cars": [...], "services": [...]}."""
+    catalog = {table: [] for table in TABLES}
+    for path in paths:
+        name = os.path.basename(path)
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            if path.lower().endswith(".json"):
+                data = json.load(fh)
+                unknown = set(data) - set(TABLES)
+                if unknown: raise ValueError(f"{name}: unknown section(s) {', '.join(sorted(unknown))}.")
+                for table in TABLES: catalog[table] += _normalize(table, data.get(table, []), name)
+            else:
+                reader = csv.DictReader(fh)
+                kind = _kind({(f or "").strip().lower() for f in reader.fieldnames or []})
+                catalog[kind] += _normalize(kind, reader, name)
+    return catalog
+
+
+def diff_catalog(current, incoming):
+    """Compares ``incoming`` with the ``current`` catalog (DBManager.get_catalog) and returns the changes.
+
+    The plan lists rows to insert and to update per table, plus the number of unchanged rows.
+    """
+    plan = {table: {"insert": [], "update": [], "unchanged": 0} for table in TABLES}
+    categories = {c['id']: c for c in current["categories"]}
+    for item in incoming["categories"]:
+        old = categories.get(item['id'])
+        if old is None: plan["categories"]["insert"].append(item)
+        elif old['name'] != item['name']: plan["categories"]["update"].append(item)
+        else: plan["categories"]["unchanged"] += 1
+    known_categories = set(categories) | {c['id'] for c in incoming["categories"]}
+
+    cars = {c['name']: c for c in current["cars"]}
+    for item in incoming["cars"]:
+        old = cars.get(item['name'])
+        if old is None:
+            if "price_per_day" not in item or "category_id" not in item:
+                raise ValueError(f"New car '{item['name']}' needs a category_id and a price_per_day.")
+            if item['category_id'] not in known_categories:
+                raise ValueError(f"Car '{item['name']}' refers to the unknown category '{item['category_id']}'.")
+            plan["cars"]["insert"].append(dict({"is_available": True, "units": 0}, **item))
+            continue
+        merged = {"name": old['name'], "category_id": item.get("category_id", old['category_id']),
+                  "price_per_day": item.get("price_per_day", old['price_per_day']),
+                  "is_available": item.get("is_available", bool(old['is_available']))}
+        if merged['category_id'] not in known_categories:
+            raise ValueError(f"Car '{item['name']}' refers to the unknown category '{merged['category_id']}'.")
+        changed = (merged['category_id'] != old['category_id'] or merged['price_per_day'] != old['price_per_day']
+                   or merged['is_available'] != bool(old['is_available']))
+        if changed: plan["cars"]["update"].append(merged)
+        else: plan["cars"]["unchanged"] += 1
+
+    services = {s['name']: s for s in current["services"]}
+    for item in incoming["services"]:
+        old = services.get(item['name'])
+        if old is None: plan["services"]["insert"].append(item)
+        elif old['price'] != item['price'] or bool(old['is_daily']) != item['is_daily']:
+            plan["services"]["update"].append(item)
+        else: plan["services"]["unchanged"] += 1
+
+    car_names = {c['id']: c['name'] for c in current["cars"]}
+    known_cars = set(cars) | {c['name'] for c in incoming["cars"]}
+    rules = {r['name']: dict(r, car=car_names.get(r['car_id'])) for r in current.get("price_rules", [])}
+    for item in incoming["price_rules"]:
+        if item['car'] is not None and item['car'] not in known_cars:
+            raise ValueError(f"Price rule '{item['name']}' refers to the unknown car '{item['car']}'.")
+        if item['category_id'] is not None and item['category_id'] not in known_categories:
+            raise ValueError(f"Price rule '{item['name']}' refers to the unknown category '{item['category_id']}'.")
+        old = rules.get(item['name'])
+        if old is None: plan["price_rules"]["insert"].append(item)
+        elif any(old[field] != item[field] for field in RULE_FIELDS): plan["price_rules"]["update"].append(item)
+        else: plan["price_rules"]["unchanged"] += 1
+    return plan
+
+
+def has_changes(plan):
+    return any(p["insert"] or p["update"] for p in plan.values())
+
+
+def plan_summary(plan):
+    return ", ".join(f"{table}: {len(p['insert'])} new, {len(p['update'])} changed, {p['unchanged']} unchanged"
+                     for table, p in plan.items())
+
+
+def import_catalog(db, paths, chunk_size=1000, dry_run=False):
+    """Loads, diffs and applies the catalog files; returns {branch or None: plan}.
+
+    With branch databases the catalog is applied to every branch, each against its own tables.
+    """
+    incoming = load_catalog(paths)
+    targets = getattr(db, "branches", {None: db})
+    # Diff every branch first so that a file that does not fit one of them changes none.
+    plans = {branch: diff_catalog(target.get_catalog(), incoming) for branch, target in targets.items()}
+    if not dry_run:
+        for branch, plan in plans.items():
+            if has_changes(plan): targets[branch].apply_catalog(plan, chunk_size)
+    return plans
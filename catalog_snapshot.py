@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""A local SQLite copy of the catalog, so the app starts and browses without waiting for MySQL.
+
+The snapshot holds the categories, cars (with their unit counts), services and price rules, and the
+catalog version and change_log position it was taken at. It answers the same catalog reads as DBManager
+(get_all_categories, search_cars, get_pricing, ...), so RentalSystem can serve them from either.
+
+``sync`` catches up with the database: when the catalog version moved, or the change log was pruned
+past the stored position, everything is reloaded; otherwise only the cars named in the change log
+since then are read again. While the database is down, bookings are queued here and saved by
+RentalManager.reconcile_bookings once it is back.
+
+The file is ``$RENTAL_SNAPSHOT``, by default ``~/.car_rental/catalog.sqlite3``.
+"""
+import os
+import json
+import sqlite3
+import datetime
+from collections import namedtuple
+from decimal import Decimal
+
+from rental import Car
+from price_calendar import to_cents
+
+SNAPSHOT_PATH = os.environ.get("RENTAL_SNAPSHOT",
+                               os.path.join(os.path.expanduser("~"), ".car_rental", "catalog.sqlite3"))
+
+# Cars and categories keep their database ids as they are (ints, or "<branch>:<id>" with branch databases), so
+# those columns are declared without a type.
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS cars (id PRIMARY KEY, category_id, name TEXT, price_cents INTEGER,
+                                     is_available INTEGER, total_units INTEGER, available_units INTEGER, branch TEXT);
+    CREATE INDEX IF NOT EXISTS idx_cars_browse ON cars (is_available, category_id, price_cents);
+    DROP TABLE IF EXISTS users;  -- older versions kept the accounts that signed in, with their password hashes
+    CREATE TABLE IF NOT EXISTS bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, queued_at TEXT, record TEXT,
+                                         error TEXT);
+"""
+
+SEARCH_SORTS = {"name": "name COLLATE NOCASE", "price_asc": "price_cents", "price_desc": "price_cents DESC",
+                "units": "available_units DESC"}
+
+# A booking taken offline; ``error`` is set once reconciling it failed (e.g. no unit of the model was free).
+QueuedBooking = namedtuple("QueuedBooking", "id queued_at user car duration services final_total start_date error")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)): return value.isoformat()
+    if isinstance(value, Decimal): return str(value)
+    raise TypeError(f"Cannot store {type(value).__name__} in the snapshot.")
+
+
+def _price(cents): return Decimal(cents).scaleb(-2)
+
+
+class CatalogSnapshot:
+    CHANGE_LIMIT = 500  # change_log entries read per call while catching up
+    MAX_CHANGED_CARS = 200  # more changed cars than this are refreshed with one read of all unit counts
+    MAX_AGE_DAYS = 7  # older snapshots are reloaded: the change log since then may have been pruned
+
+    def __init__(self, path=None):
+        self.path = path or SNAPSHOT_PATH
+        if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._meta = {row['key']: json.loads(row['value']) for row in self.conn.execute("SELECT * FROM meta")}
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(key, json.dumps(value, default=_json_default)) for key, value in values.items()])
+        self._meta.update(json.loads(json.dumps(values, default=_json_default)))
+
+    @property
+    def loaded(self):
+        """Whether the snapshot holds a catalog (it is empty until the first load)."""
+        return "version" in self._meta
+
+    @property
+    def version(self): return self._meta.get("version")
+
+    @property
+    def position(self):
+        """The change_log position (a dict per branch with branch databases) the snapshot is up to date with."""
+        return self._meta.get("position")
+
+    @position.setter
+    def position(self, position):
+        with self.conn:
+            self._set_meta(position=position)
+
+    # --- Sync ---
+
+    def load(self, db):
+        """Replaces the whole catalog with the one in ``db``."""
+        position, version = db.change_position(), db.get_catalog_version()  # the position first: nothing is missed
+        units = {car['id']: car for car in db.get_all_cars_data()}
+        pricing = db.get_pricing()
+        cars = [(car['id'], car['category_id'], car['name'], to_cents(car['price_per_day']), bool(car['is_available']),
+                 int(units.get(car['id'], {}).get('total_units') or 0),
+                 int(units.get(car['id'], {}).get('available_units') or 0), car.get('branch'))
+                for car in pricing["cars"]]
+        with self.conn:
+            self.conn.execute("DELETE FROM cars")
+            self.conn.executemany("INSERT INTO cars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", cars)
+            self._set_meta(version=version, position=position, synced=datetime.datetime.now(),
+                           categories=db.get_all_categories(), services=db.get_all_services(), rules=pricing["rules"])
+
+    def refresh_cars(self, db, car_ids=None):
+        """Reads the price, availability and unit counts of ``car_ids`` (all cars by default) again."""
+        if car_ids is None or len(car_ids) > self.MAX_CHANGED_CARS: rows = db.get_all_cars_data()
+        else: rows = list(filter(None, (db.get_car_data(car_id) for car_id in dict.fromkeys(car_ids))))
+        with self.conn:
+            self.conn.executemany("UPDATE cars SET name = ?, price_cents = ?, is_available = ?, total_units = ?, "
+                                  "available_units = ? WHERE id = ?",
+                                  [(row['name'], to_cents(row['price_per_day']), bool(row['is_available']),
+                                    int(row['total_units'] or 0), int(row['available_units'] or 0), row['id'])
+                                   for row in rows])
+            self._set_meta(synced=datetime.datetime.now())
+
+    def sync(self, db):
+        """Brings the snapshot up to date with ``db``; returns the ids of the cars that changed, or None if the
+        whole catalog was reloaded."""
+        synced = self._meta.get("synced")
+        stale = not synced or datetime.datetime.fromisoformat(synced) < datetime.datetime.now() - datetime.timedelta(
+            days=self.MAX_AGE_DAYS)
+        if not self.loaded or stale or db.get_catalog_version() != self.version:
+            self.load(db)
+            return None
+        position, cars = self.position, []
+        while True:
+            changes, position = db.changes_since(position, self.CHANGE_LIMIT)
+            if any(change['entity'] == "catalog" for change in changes):
+                self.load(db)
+                return None
+            cars += [change['entity_id'] for change in changes if change['entity'] == "car"]
+            if len(changes) < self.CHANGE_LIMIT: break
+        cars = list(dict.fromkeys(cars))
+        if cars: self.refresh_cars(db, cars)
+        self.position = position
+        return cars
+
+    # --- Catalog reads, as in DBManager ---
+
+    def get_catalog_version(self): return self.version
+
+    def get_all_categories(self): return list(self._meta.get("categories", []))
+
+    def get_all_services(self):
+        return [dict(service, price=Decimal(str(service['price']))) for service in self._meta.get("services", [])]
+
+    def get_pricing(self):
+        cars = [{"id": row['id'], "category_id": row['category_id'], "name": row['name'],
+                 "price_per_day": _price(row['price_cents']), "is_available": row['is_available'],
+                 **({"branch": row['branch']} if row['branch'] else {})}
+                for row in self.conn.execute("SELECT * FROM cars")]
+        return {"cars": cars, "rules": list(self._meta.get("rules", []))}
+
+    def _row(self, row):
+        data = {"id": row['id'], "name": row['name'], "price_per_day": _price(row['price_cents']),
+                "is_available": row['is_available'], "total_units": row['total_units'],
+                "available_units": row['available_units']}
+        if row['branch']: data["branch"] = row['branch']
+        return data
+
+    def get_all_cars_data(self, only_available=False):
+        where = "WHERE is_available = 1 AND available_units > 0 " if only_available else ""
+        return [self._row(row) for row in self.conn.execute(f"SELECT * FROM cars {where}ORDER BY category_id, name")]
+
+    def get_car_data(self, car_id):
+        row = self.conn.execute("SELECT * FROM cars WHERE id = ?", (car_id,)).fetchone()
+        return self._row(row) if row else None
+
+    @staticmethod
+    def _car(row):
+        return Car(row['name'], _price(row['price_cents']), bool(row['is_available']), row['id'],
+                   row['available_units'])
+
+    def get_cars_by_category(self, category_id, only_available=False):
+        where = " AND is_available = 1 AND available_units > 0" if only_available else ""
+        return [self._car(row) for row in self.conn.execute(
+            f"SELECT * FROM cars WHERE category_id = ?{where} ORDER BY name", (category_id,))]
+
+    def search_cars(self, category_id=None, min_price=None, max_price=None, text="", sort="name", limit=20, offset=0):
+        """Returns one page of available models matching the filters, plus the total number of matches."""
+        where, params = ["is_available = 1", "available_units > 0"], []
+        for value, condition, param in ((category_id, "category_id = ?", category_id),
+                                        (min_price, "price_cents >= ?", min_price and to_cents(min_price)),
+                                        (max_price, "price_cents <= ?", max_price and to_cents(max_price)),
+                                        (text, "name LIKE ?", f"%{text}%")):
+            if value in (None, ""): continue
+            where.append(condition)
+            params.append(param)
+        where = " AND ".join(where)
+        total = self.conn.execute(f"SELECT COUNT(*) FROM cars WHERE {where}", params).fetchone()[0]
+        if not total: return [], 0
+        rows = self.conn.execute(f"SELECT * FROM cars WHERE {where} ORDER BY {SEARCH_SORTS.get(sort, 'name')}, id "
+                                 "LIMIT ? OFFSET ?", params + [limit, offset])
+        return [self._car(row) for row in rows], total
+
+    # --- Working offline ---
+
+    def hold_unit(self, car_id):
+        """Counts one unit of the model as taken by an offline booking; False if the snapshot has none free."""
+        with self.conn:
+            return self.conn.execute("UPDATE cars SET available_units = available_units - 1 "
+                                     "WHERE id = ? AND available_units > 0", (car_id,)).rowcount == 1
+
+    def queue_booking(self, user, data):
+        """Stores a booking (RentalManager.record_transaction ``data``) to be saved later; returns its number."""
+        car = data["car"]
+        record = {"user": user, "car": {"id": car.car_id, "name": car.name, "price_per_day": car.price_per_day},
+                  "duration": data["duration"], "services": data["services"], "final_total": data["final_total"],
+                  "start_date": data.get("start_date")}
+        with self.conn:
+            return self.conn.execute("INSERT INTO bookings (queued_at, record) VALUES (?, ?)",
+                                     (datetime.datetime.now().isoformat(),
+                                      json.dumps(record, default=_json_default))).lastrowid
+
+    def queued_bookings(self, failed=False):
+        """Returns the bookings still to be saved (or, with ``failed``, those that could not be), oldest first."""
+        rows = self.conn.execute(f"SELECT * FROM bookings WHERE error IS {'NOT ' if failed else ''}NULL ORDER BY id")
+        bookings = []
+        for row in rows:
+            record = json.loads(row['record'])
+            car = record["car"]
+            bookings.append(QueuedBooking(
+                row['id'], datetime.datetime.fromisoformat(row['queued_at']), record["user"],
+                Car(car["name"], Decimal(str(car["price_per_day"])), True, car["id"]), record["duration"],
+                [dict(service, cost=Decimal(str(service['cost']))) for service in record["services"]],
+                Decimal(str(record["final_total"])),
+                datetime.date.fromisoformat(record["start_date"]) if record["start_date"] else None, row['error']))
+        return bookings
+
+    def finish_booking(self, booking_id, error=None):
+        """Removes a booking that was saved, or keeps it with the reason it could not be."""
+        with self.conn:
+            if error is None: self.conn.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+            else: self.conn.execute("UPDATE bookings SET error = ? WHERE id = ?", (error, booking_id))
+
+    def close(self):
+        self.conn.close()
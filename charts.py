@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Sales charts for the admin dashboard, drawn without Qt and rendered off the GUI.
+
+Each chart is a function that draws a TransactionBatch on a matplotlib Axes. ``render_chart`` draws
+one on a standalone Agg figure and returns PNG bytes, so it runs in any thread or process.
+ChartService renders charts in a worker process and caches the images by chart, parameters and
+data version (the change_log position the data was read at, see DBManager.change_position), so
+asking again for a chart of unchanged data costs nothing.
+"""
+import io
+import multiprocessing
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, PercentFormatter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from receipts import parse_services
+
+# What a chart is drawn from: the transactions, {car model: category name} and the data version.
+SalesData = namedtuple("SalesData", "txns categories version")
+
+PERIODS = {"D": "Day", "W": "Week", "M": "Month"}
+
+
+def _peso(x, pos): return f"₱{x:,.0f}"
+
+
+def most_rented(ax, data):
+    df = data.txns.to_frame()
+    rental_counts = df.groupby('car_model', observed=True).size().sort_values(ascending=False)
+    colors = colormaps["viridis"](np.arange(len(rental_counts)) / len(rental_counts))
+    ax.bar(range(len(rental_counts)), rental_counts.values, color=colors)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f'{int(x)}'))
+    ax.set_title('Most Rented Units (Total Rental Count)', fontsize=16, weight='bold')
+    ax.set_xlabel('Car Model', fontsize=12)
+    ax.set_ylabel('Total Number of Rentals', fontsize=12)
+    ax.set_xticks(range(len(rental_counts)), [str(name) for name in rental_counts.index], rotation=45, ha='right',
+                  fontsize=10)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+
+def revenue_over_time(ax, data, period="M"):
+    df = data.txns.to_frame().dropna(subset=["timestamp"])
+    revenue = df.groupby(df["timestamp"].dt.to_period(period))["final_total"].sum().sort_index()
+    labels = revenue.index.start_time.strftime("%Y-%m" if period == "M" else "%Y-%m-%d")
+    ax.bar(range(len(revenue)), revenue.values, color="#27ae60")
+    step = max(1, len(revenue) // 12)  # at most about a dozen labels
+    ax.set_xticks(range(0, len(revenue), step), labels[::step], rotation=45, ha='right', fontsize=10)
+    ax.yaxis.set_major_formatter(FuncFormatter(_peso))
+    ax.set_title(f'Revenue per {PERIODS[period]}', fontsize=16, weight='bold')
+    ax.set_ylabel('Revenue', fontsize=12)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+
+def revenue_by_category(ax, data):
+    df = data.txns.to_frame()
+    category = df["car_model"].astype(object).map(data.categories or {}).fillna("Other")
+    revenue = df["final_total"].groupby(category).sum().sort_values()
+    ax.barh([str(name) for name in revenue.index], revenue.values, color="#3498db")
+    ax.xaxis.set_major_formatter(FuncFormatter(_peso))
+    ax.set_title('Revenue by Category', fontsize=16, weight='bold')
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+
+
+def addon_attach_rate(ax, data):
+    """Share of rentals that booked each add-on, counted per distinct services text rather than per rental."""
+    codes = data.txns.columns["services_used"]
+    counts = np.bincount(codes[codes >= 0], minlength=len(data.txns.values["services_used"]))
+    rentals = {}
+    for text, count in zip(data.txns.values["services_used"], counts.tolist()):
+        for name in {name for name, _ in parse_services(text)}: rentals[name] = rentals.get(name, 0) + count
+    names = sorted(rentals, key=rentals.get)
+    ax.barh(names, [rentals[name] / len(data.txns) for name in names], color="#e67e22")
+    ax.xaxis.set_major_formatter(PercentFormatter(1.0))
+    ax.set_xlim(0, 1)
+    ax.set_title('Add-on Attach Rate (Share of Rentals)', fontsize=16, weight='bold')
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+    if not names: ax.text(0.5, 0.5, "No add-ons booked yet.", ha="center", va="center", transform=ax.transAxes)
+
+
+# name -> (title for the chart picker, drawing function)
+CHARTS = {
+    "most_rented": ("Most Rented Units", most_rented),
+    "revenue_over_time": ("Revenue Over Time", revenue_over_time),
+    "revenue_by_category": ("Revenue by Category", revenue_by_category),
+    "addon_attach_rate": ("Add-on Attach Rate", addon_attach_rate),
+}
+
+
+def render_chart(name, data, **params):
+    """Draws the chart ``name`` of ``data`` (a SalesData) as PNG bytes; None without transactions."""
+    if not len(data.txns): return None
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    CHARTS[name][1](fig.add_subplot(), data, **params)
+    fig.tight_layout()
+    png = io.BytesIO()
+    fig.savefig(png, format="png")
+    return png.getvalue()
+
+
+class ChartService:
+    """Renders charts in a worker process, keeping the last ``cache_size`` images.
+
+    ``request`` returns at once; the PNG (or the exception) is handed to ``on_done`` from a pool thread, or right
+    away when the chart is cached. A chart asked for again while it renders waits for the same job.
+
+    The worker is spawned rather than forked, since the app forking itself with Qt and the database connections
+    open is unsafe, and only when the first chart is asked for, so start-up does not pay for it.
+    """
+
+    def __init__(self, workers=1, cache_size=32):
+        self.workers, self.pool = workers, None
+        self.cache_size = cache_size
+        self._cache, self._lock = OrderedDict(), threading.Lock()
+
+    @staticmethod
+    def key(name, data, **params):
+        return name, tuple(sorted(params.items())), data.version
+
+    def request(self, name, data, on_done, **params):
+        """Renders chart ``name`` of ``data``; calls ``on_done(key, png, error)`` when it is ready."""
+        key = self.key(name, data, **params)
+        with self._lock:
+            future = self._cache.get(key)
+            if future is None:
+                future = self._cache[key] = self._submit(name, data, params)
+                while len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+            self._cache.move_to_end(key)
+        future.add_done_callback(lambda done: on_done(key, *self._outcome(key, done)))
+        return key
+
+    def _submit(self, name, data, params):
+        if not len(data.txns):  # nothing to draw, no need to ship it to the worker
+            future = Future()
+            future.set_result(None)
+            return future
+        if self.pool is None:  # called under self._lock
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool.submit(render_chart, name, data, **params)
+
+    def _outcome(self, key, future):
+        if future.cancelled(): return None, RuntimeError("The chart service was closed.")
+        error = future.exception()
+        if error is None: return future.result(), None
+        with self._lock:
+            if self._cache.get(key) is future: del self._cache[key]  # let the next request try again
+        return None, error
+
+    def close(self):
+        with self._lock:
+            if self.pool is not None: self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Query timing, row counts and a slow-query log for DBManager.
+
+Every query DBManager runs is recorded under a short name (usually the DBManager method),
+so the Prometheus output shows which queries dominate as the data grows:
+
+    rental_db_query_duration_seconds_bucket{query="get_all_transactions",le="0.5"} 12
+
+Set RENTAL_SLOW_QUERY_MS to change the slow-query threshold (200 ms by default).
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger("rental.slow_queries")
+
+
+class _Series:
+    __slots__ = ("sql", "count", "total", "rows", "errors", "buckets")
+
+    def __init__(self, sql):
+        self.sql, self.count, self.total, self.rows, self.errors = sql, 0, 0.0, 0, 0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class QueryMetrics:
+    def __init__(self, slow_threshold=None, slow_log_size=200):
+        if slow_threshold is None:
+            slow_threshold = float(os.environ.get("RENTAL_SLOW_QUERY_MS", "200")) / 1000
+        self.slow_threshold = slow_threshold
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._series, self._lock = {}, threading.Lock()
+        self._server = None
+
+    def observe(self, name, sql, seconds, rows=0, failed=False):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None: series = self._series[name] = _Series(sql)
+            series.count += 1
+            series.total += seconds
+            series.rows += max(rows or 0, 0)
+            if failed: series.errors += 1
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series.buckets[i] += 1
+                    break
+        if seconds >= self.slow_threshold:
+            entry = {"time": time.time(), "query": name, "seconds": seconds, "rows": rows, "sql": " ".join(sql.split())}
+            self.slow_queries.append(entry)
+            slow_log.warning("slow query %s took %.1f ms (%s rows): %s", name, seconds * 1000, rows, entry["sql"])
+
+    def snapshot(self):
+        """Returns a plain dict summary per query, e.g. for the benchmark JSON."""
+        with self._lock:
+            return {name: {"count": s.count, "total_s": s.total, "mean_ms": s.total / s.count * 1000 if s.count else 0,
+                           "rows": s.rows, "errors": s.errors, "sql": " ".join(s.sql.split())}
+                    for name, s in sorted(self._series.items(), key=lambda item: -item[1].total)}
+
+    def to_prometheus(self):
+        lines = ["# HELP rental_db_query_duration_seconds Time spent running each DBManager query.",
+                 "# TYPE rental_db_query_duration_seconds histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for name, s in series:
+                cumulative = 0
+                for bound, count in zip(BUCKETS, s.buckets):
+                    cumulative += count
+                    lines.append(f'rental_db_query_duration_seconds_bucket{{query="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'rental_db_query_duration_seconds_bucket{{query="{name}",le="+Inf"}} {s.count}')
+                lines.append(f'rental_db_query_duration_seconds_sum{{query="{name}"}} {s.total:.6f}')
+                lines.append(f'rental_db_query_duration_seconds_count{{query="{name}"}} {s.count}')
+            lines += ["# HELP rental_db_query_rows_total Rows returned or affected by each query.",
+                      "# TYPE rental_db_query_rows_total counter"]
+            lines += [f'rental_db_query_rows_total{{query="{name}"}} {s.rows}' for name, s in series]
+            lines += ["# HELP rental_db_query_errors_total Queries that raised a database error.",
+                      "# TYPE rental_db_query_errors_total counter"]
+            lines += [f'rental_db_query_errors_total{{query="{name}"}} {s.errors}' for name, s in series]
+        lines += ["# HELP rental_db_slow_queries Slow queries kept in the in-memory log.",
+                  "# TYPE rental_db_slow_queries gauge", f"rental_db_slow_queries {len(self.slow_queries)}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the metrics in Prometheus text format, e.g. for the node_exporter textfile collector."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serves /metrics on a local port from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Booking demand by category, month, weekday and hour of booking, for deciding how many units to stock.
+
+The ``demand_cube`` table holds one row per category, month (1-12), weekday (0 = Monday) and hour
+with the number of bookings, their rental days and revenue. DBManager.refresh_demand_cube folds in
+only the transactions saved since its last run, so reading the cube costs the same however much
+history there is. A DemandCube loads those rows into one numpy array per measure and sums slices
+of them for the heatmap.
+"""
+import numpy as np
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MEASURES = {"bookings": "Bookings", "rental_days": "Rental Days", "revenue": "Revenue"}
+SEASONS = {"All Year": None, "Jan-Mar": (1, 2, 3), "Apr-Jun": (4, 5, 6), "Jul-Sep": (7, 8, 9),
+           "Oct-Dec": (10, 11, 12)}
+
+
+class DemandCube:
+    def __init__(self, rows, categories):
+        """``rows`` are demand_cube rows, possibly from several branches (they are added up); ``categories`` maps
+        category ids to names."""
+        self.category_ids = list(categories) + sorted({row['category_id'] for row in rows} - set(categories))
+        self.names = {c: categories.get(c) or "Other" for c in self.category_ids}
+        index = {c: n for n, c in enumerate(self.category_ids)}
+        at = tuple(np.array(column, dtype=np.int64).reshape(-1) for column in (
+            [index[row['category_id']] for row in rows], [row['month'] - 1 for row in rows],
+            [row['weekday'] for row in rows], [row['hour'] for row in rows]))
+        self.values = {}
+        for measure in MEASURES:
+            cube = self.values[measure] = np.zeros((len(self.category_ids), 12, 7, 24))
+            np.add.at(cube, at, np.array([float(row[measure] or 0) for row in rows]))
+
+    def heatmap(self, measure="bookings", category_id=None, months=None):
+        """Returns a weekday x hour (7 x 24) array of ``measure`` for one category (all by default) and months."""
+        cube = self.values[measure]
+        if category_id is not None: cube = cube[[self.category_ids.index(category_id)]]
+        if months: cube = cube[:, [month - 1 for month in months]]
+        return cube.sum(axis=(0, 1))
+
+    def totals(self, measure="bookings", months=None):
+        """Returns {category id: total of ``measure``} over the given months."""
+        cube = self.values[measure]
+        if months: cube = cube[:, [month - 1 for month in months]]
+        return dict(zip(self.category_ids, cube.sum(axis=(1, 2, 3)).tolist()))
+
+
+def fetch_demand_cube(db):
+    """Folds the latest bookings of ``db`` into the demand cube and reads it; only the new bookings are scanned."""
+    db.refresh_demand_cube()
+    return DemandCube(db.get_demand_cube(), {row['id']: row['name'] for row in db.get_all_categories()})
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Domain events published by RentalManager after a change is saved.
+
+Each event names what changed by id, so a view can update the affected rows instead of reloading
+everything. Handlers subscribe to an event type and are called synchronously, in the thread that
+published the event (the GUI thread in the app).
+"""
+import logging
+from collections import defaultdict, namedtuple
+
+log = logging.getLogger("rental.events")
+
+# car_ids is None when the whole catalog may have changed (e.g. after a catalog import).
+CarChanged = namedtuple("CarChanged", "car_ids")
+BookingCreated = namedtuple("BookingCreated", "transaction_id car_id unit_id")
+MessageReceived = namedtuple("MessageReceived", "message_id")
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers = defaultdict(list)
+
+    def subscribe(self, event_type, handler):
+        self._handlers[event_type].append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        if handler in self._handlers[event_type]: self._handlers[event_type].remove(handler)
+
+    def publish(self, event):
+        """Calls every handler of the event's type; a failing handler is logged and does not stop the others."""
+        for handler in list(self._handlers[type(event)]):
+            try:
+                handler(event)
+            except Exception:
+                log.exception("handler %r failed for %r", handler, event)
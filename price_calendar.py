@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Daily rental prices per car, built from the flat rate plus seasonal and weekday rules.
+
+Only the rules are stored (table ``price_rules``). The calendar expands them into a cars x days
+matrix of prices in centavos and keeps its running sum per car, so a quote for any number of
+days is two lookups. Rebuilding applies each rule to all matching cars and days at once.
+
+A rule matches cars by ``car_id``, ``category_id`` and/or ``branch`` (all cars when none is set)
+and days by ``start_date``/``end_date`` (inclusive) and ``weekdays``, a string of day numbers
+with Monday = 0, e.g. "56" for weekends. It sets the price to ``fixed_price`` or to the flat rate
+times ``multiplier``. Rules with a higher ``priority`` win where rules overlap.
+"""
+import datetime
+from decimal import Decimal
+
+import numpy as np
+
+CALENDAR_DAYS = 400
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+class PriceCalendar:
+    def __init__(self, cars, rules, start=None, days=CALENDAR_DAYS):
+        """``cars`` are dicts with id, category_id, price_per_day and optionally branch."""
+        self.start, self.days = start or datetime.date.today(), days
+        self.rules = sorted(rules, key=lambda r: (r.get('priority') or 0, str(r.get('id'))))
+        self.index = {car['id']: row for row, car in enumerate(cars)}
+        self.car_ids = np.array([str(car['id']) for car in cars], dtype=object)
+        self.categories = np.array([str(car.get('category_id')) for car in cars], dtype=object)
+        self.branches = np.array([str(car.get('branch')) for car in cars], dtype=object)
+        self.base = np.array([to_cents(car['price_per_day']) for car in cars], dtype=np.int64)
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes every daily price and the running sums, e.g. after a rule changed."""
+        prices = self._prices(np.arange(len(self.base)), self.start, self.days)
+        self.prefix = np.zeros((len(self.base), self.days + 1), dtype=np.int64)
+        np.cumsum(prices, axis=1, out=self.prefix[:, 1:])
+
+    def _prices(self, rows, start, days):
+        dates = np.arange(np.datetime64(start, "D"), np.datetime64(start, "D") + days)
+        weekdays = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        base = self.base[rows]
+        prices = np.repeat(base[:, None], days, axis=1)
+        for rule in self.rules:
+            cols = np.ones(days, dtype=bool)
+            if rule.get('start_date'): cols &= dates >= np.datetime64(rule['start_date'], "D")
+            if rule.get('end_date'): cols &= dates <= np.datetime64(rule['end_date'], "D")
+            if rule.get('weekdays'): cols &= np.isin(weekdays, [int(d) for d in str(rule['weekdays'])])
+            matched = np.ones(len(rows), dtype=bool)
+            for key, column in (("car_id", self.car_ids), ("category_id", self.categories),
+                                ("branch", self.branches)):
+                if rule.get(key) is not None: matched &= column[rows] == str(rule[key])
+            if not cols.any() or not matched.any(): continue
+            if rule.get('fixed_price') is not None:
+                prices[np.ix_(matched, cols)] = to_cents(rule['fixed_price'])
+            else:
+                multiplier = float(rule.get('multiplier') or 1)
+                prices[np.ix_(matched, cols)] = np.rint(base[matched] * multiplier).astype(np.int64)[:, None]
+        return prices
+
+    def daily_prices(self, car_id, start, days):
+        """Returns the price of each day as Decimals."""
+        row = self.index[car_id]
+        cents = self._prices(np.array([row]), start, days)[0]
+        return [Decimal(int(c)) / 100 for c in cents]
+
+    def quote(self, car_id, start, days, flat_rate=None):
+        """Returns the rental cost for ``days`` days from ``start``.
+
+        Ranges inside the calendar are answered from the running sums; others are computed for that car alone.
+        Cars added after the calendar was built are charged ``flat_rate`` per day.
+        """
+        row = self.index.get(car_id)
+        if row is None: return Decimal(str(flat_rate)) * days if flat_rate is not None else None
+        offset = (start - self.start).days
+        if 0 <= offset and offset + days <= self.days:
+            cents = self.prefix[row, offset + days] - self.prefix[row, offset]
+        else:
+            cents = self._prices(np.array([row]), start, days).sum()
+        return Decimal(int(cents)) / 100
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Renders booking receipts to HTML or PDF without the GUI.
+
+The functions take a row of the ``transactions`` table, so they work for a single booking as
+well as for back-office batches streamed from the database (see tools/batch_receipts.py).
+PDFs are drawn with matplotlib's PDF backend, which needs no display and no Qt.
+"""
+import os
+import re
+import html
+import time
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from rental import format_peso
+
+COMPANY = "Ragadio's Car Rentals"
+_SERVICE = re.compile(r"(.+?) \(₱([\d,]+\.\d{2})\)(?:, |$)")
+
+
+def parse_services(services_text):
+    """Splits the stored ``services_used`` text ("Name (₱1,500.00), ...") back into (name, cost) pairs."""
+    return [(name, Decimal(cost.replace(",", ""))) for name, cost in _SERVICE.findall(services_text or "")]
+
+
+def receipt_context(row):
+    services = parse_services(row.get('services_used'))
+    final_total = Decimal(str(row.get('final_total') or 0))
+    duration = row.get('duration') or 0
+    branch = f"{row['branch'].upper()}-" if row.get('branch') else ""
+    return {"number": f"RGD-{branch}{row['id']:08d}" if row.get('id') else "RGD-DRAFT", "id": row.get('id'),
+            "date": row['timestamp'].strftime("%Y-%m-%d %H:%M") if row.get('timestamp') else "N/A",
+            "client": row.get('user_name') or "", "email": row.get('user_email') or "",
+            "car": row.get('car_model') or "", "duration": f"{duration} Day{'s' if duration > 1 else ''}",
+            "unit": row.get('plate') or "N/A", "services": services,
+            "base_total": final_total - sum(cost for _, cost in services),
+            "final_total": final_total}
+
+
+def render_html(row):
+    ctx = receipt_context(row)
+    esc = html.escape
+    services = "".join(f"<tr><td>- {esc(name)}</td><td class='amount'>{format_peso(cost)}</td></tr>"
+                       for name, cost in ctx["services"]) \
+               or "<tr><td colspan='2'><em>(No extra services selected)</em></td></tr>"
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Receipt {ctx['number']}</title>
+<style>
+body {{ font-family: Arial, sans-serif; max-width: 480px; margin: 2em auto; color: #2c3e50; }}
+h1 {{ font-size: 1.2em; text-align: center; }} h2 {{ font-size: 1em; text-align: center; color: #7f8c8d; }}
+table {{ width: 100%; border-collapse: collapse; }} td {{ padding: 4px 0; }} .amount {{ text-align: right; }}
+.total td {{ font-weight: bold; font-size: 1.2em; border-top: 2px solid #2c3e50; padding-top: 8px; }}
+</style></head><body>
+<h1>{esc(COMPANY)} &mdash; BOOKING CONFIRMED</h1>
+<h2>Receipt {ctx['number']} &middot; {ctx['date']}</h2>
+<table>
+<tr><td colspan="2"><strong>Client: {esc(ctx['client'])}</strong> ({esc(ctx['email'])})</td></tr>
+<tr><td>Car Model:</td><td class="amount">{esc(ctx['car'])}</td></tr>
+<tr><td>Rental Days:</td><td class="amount">{ctx['duration']}</td></tr>
+<tr><td>Base Cost:</td><td class="amount">{format_peso(ctx['base_total'])}</td></tr>
+<tr><td>Unit Plate:</td><td class="amount">{esc(ctx['unit'])}</td></tr>
+<tr><td colspan="2"><strong>--- ADD-ONS ---</strong></td></tr>
+{services}
+<tr class="total"><td>FINAL TOTAL:</td><td class="amount">{format_peso(ctx['final_total'])}</td></tr>
+</table></body></html>
+"""
+
+
+def render_pdf(row, path):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_pdf import FigureCanvasPdf
+
+    ctx = receipt_context(row)
+    fig = Figure(figsize=(5.8, 8.3))  # A5
+    FigureCanvasPdf(fig)
+    lines = [(COMPANY, 15, "bold", "center"), ("BOOKING CONFIRMED", 12, "bold", "center"),
+             (f"Receipt {ctx['number']}  ·  {ctx['date']}", 9, "normal", "center"), ("", 9, "normal", "left"),
+             (f"Client: {ctx['client']} ({ctx['email']})", 10, "bold", "left"),
+             (("Car Model:", ctx['car']), 10, "normal", "pair"), (("Rental Days:", ctx['duration']), 10, "normal", "pair"),
+             (("Base Cost:", format_peso(ctx['base_total'])), 10, "normal", "pair"),
+             (("Unit Plate:", ctx['unit']), 10, "normal", "pair"),
+             ("--- ADD-ONS ---", 10, "bold", "center")]
+    lines += [((f"- {name}", format_peso(cost)), 10, "normal", "pair") for name, cost in ctx["services"]] \
+             or [("(No extra services selected)", 9, "italic", "center")]
+    lines += [("", 9, "normal", "left"), (("FINAL TOTAL:", format_peso(ctx['final_total'])), 13, "bold", "pair")]
+
+    y = 0.95
+    for text, size, weight, align in lines:
+        style = "italic" if weight == "italic" else "normal"
+        weight = "normal" if weight == "italic" else weight
+        if align == "pair":
+            fig.text(0.08, y, text[0], fontsize=size, weight=weight)
+            fig.text(0.92, y, text[1], fontsize=size, weight=weight, ha="right")
+        else:
+            fig.text(0.5 if align == "center" else 0.08, y, text, fontsize=size, weight=weight, style=style,
+                     ha="center" if align == "center" else "left")
+        y -= 0.045
+    fig.savefig(path, format="pdf")
+
+
+def receipt_filename(row, fmt):
+    if not row.get('id'): return f"receipt_draft.{fmt}"
+    return f"receipt_{row['branch']}_{row['id']:08d}.{fmt}" if row.get('branch') else f"receipt_{row['id']:08d}.{fmt}"
+
+
+def write_receipt(row, out_dir, fmt="html"):
+    """Writes one receipt into ``out_dir`` and returns its path."""
+    path = os.path.join(out_dir, receipt_filename(row, fmt))
+    if fmt == "pdf":
+        render_pdf(row, path)
+    else:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(render_html(row))
+    return path
+
+
+def _write_chunk(rows, out_dir, fmt):
+    return [write_receipt(row, out_dir, fmt) for row in rows]
+
+
+def generate_batch(rows, out_dir, fmt="html", workers=None, chunk_size=20, on_progress=None):
+    """Renders receipts for every row of the ``rows`` iterable with a process pool.
+
+    Rows are handed to the workers in chunks and at most a few chunks per worker are in flight,
+    so ``rows`` can be a cursor stream of any length without being held in memory.
+    Returns (receipt count, seconds).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    started, done = time.perf_counter(), 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending, chunk = set(), []
+
+        def collect(block):
+            nonlocal pending, done
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED if block else "ALL_COMPLETED")
+            for future in finished:
+                done += len(future.result())
+            if on_progress: on_progress(done)
+
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                pending.add(pool.submit(_write_chunk, chunk, out_dir, fmt))
+                chunk = []
+                if len(pending) >= workers * 2: collect(block=True)
+        if chunk: pending.add(pool.submit(_write_chunk, chunk, out_dir, fmt))
+        if pending: collect(block=False)
+    return done, time.perf_counter() - started
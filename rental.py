@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""The rental domain: cars, transactions, the cached catalog (RentalSystem) and RentalManager.
+
+Like rental_db, this module does not import Qt, so it can drive bookings and admin tasks from
+scripts and the command line as well as from the GUI.
+"""
+import time
+import datetime
+
+from user_import import hash_password, import_users
+from catalog_import import import_catalog, has_changes
+from price_calendar import PriceCalendar
+from events import EventBus, CarChanged, BookingCreated, MessageReceived
+
+
+def format_peso(amount):
+    return f"₱{amount:,.2f}"
+
+
+class Car:
+    __slots__ = ("_name", "_price", "_is_available", "car_id", "available_units")
+
+    def __init__(self, name, price_per_day, is_available=True, car_id=None, available_units=None):
+        self._name, self._price, self._is_available = name, price_per_day, is_available
+        self.car_id, self.available_units = car_id, available_units
+
+    @property
+    def name(self): return self._name
+
+    @property
+    def price_per_day(self): return self._price
+
+    @property
+    def is_available(self): return self._is_available
+
+    def to_string(self):
+        status = " (Available)" if self._is_available else " (UNAVAILABLE)"
+        return f"{self._name} - {format_peso(self._price)} / day{status}"
+
+
+class Transaction:
+    __slots__ = ("id", "timestamp", "user", "car", "duration", "services", "final_total", "start_date")
+
+    def __init__(self, user, car, duration, services, final_total, start_date=None):
+        self.id, self.timestamp = None, datetime.datetime.now()
+        self.user, self.car, self.duration, self.services, self.final_total = user, car, duration, services, final_total
+        self.start_date = start_date or self.timestamp.date()  # the pick-up day, which may be later than the booking
+
+
+class OfflineError(Exception):
+    """The change needs the database, but the app is working from the catalog snapshot."""
+
+
+class BookingUncertain(Exception):
+    """A unit was claimed but the booking could not be confirmed, e.g. the connection was lost while saving it.
+
+    The booking may have been saved, and the unit stays claimed until release_expired_units frees it, so the booking
+    must not be taken (or queued) again without checking the sales report first.
+    """
+
+    def __init__(self, unit, error):
+        super().__init__(f"The booking of unit {unit.get('plate') or unit['id']} could not be confirmed: {error}")
+        self.unit = unit
+
+
+class RentalSystem:
+    CATALOG_CHECK_SECONDS = 30  # how often the cached catalog asks the database whether it changed
+
+    def __init__(self, db_manager, snapshot=None):
+        self.db, self.snapshot, self.offline = db_manager, snapshot, False
+        self._catalog, self._catalog_version, self._catalog_checked = {}, None, 0.0
+
+    @property
+    def catalog(self):
+        """Answers the catalog reads: the local snapshot (see catalog_snapshot.py) once it holds one, else the db."""
+        return self.snapshot if self.snapshot is not None and self.snapshot.loaded else self.db
+
+    def _cached(self, key, load):
+        """Returns catalog data from the cache, reloading it after a catalog import (here or on another desk)."""
+        now = time.monotonic()
+        if now - self._catalog_checked >= self.CATALOG_CHECK_SECONDS:
+            version = self.catalog.get_catalog_version()
+            if version != self._catalog_version: self._catalog, self._catalog_version = {}, version
+            self._catalog_checked = now
+        if key not in self._catalog: self._catalog[key] = load()
+        return self._catalog[key]
+
+    def invalidate_catalog(self): self._catalog, self._catalog_checked = {}, 0.0
+
+    def get_categories(self): return self._cached("categories", self.catalog.get_all_categories)
+
+    def get_cars(self, cat_id): return self.catalog.get_cars_by_category(cat_id, only_available=True)
+
+    def release_expired_units(self):
+        if self.offline: return 0
+        released = self.db.release_expired_units()
+        # The released units are logged as this desk's own changes, which poll_changes skips.
+        if released and self.catalog is self.snapshot: self.snapshot.refresh_cars(self.db)
+        return released
+
+    def search_cars(self, **filters): return self.catalog.search_cars(**filters)
+
+    def price_calendar(self):
+        return self._cached("calendar", lambda: PriceCalendar(**self.catalog.get_pricing()))
+
+    def quote(self, car, start_date, days):
+        """Returns the rental cost of ``car`` for ``days`` days from ``start_date`` under the current price rules."""
+        return self.price_calendar().quote(car.car_id, start_date, days, car.price_per_day)
+
+    def get_services(self): return self._cached("services", lambda: [
+        {"name": s['name'], "price": s['price'], "is_daily": bool(s['is_daily'])}
+        for s in self.catalog.get_all_services()])
+
+
+class RentalManager:
+    def __init__(self, db_manager, snapshot=None, offline=False):
+        """``snapshot`` is an optional CatalogSnapshot that serves the catalog and lets the desk work ``offline``.
+
+        Starting offline needs a loaded snapshot; go_online connects and catches up later.
+        """
+        self.db, self.snapshot = db_manager, snapshot
+        self.r_sys = RentalSystem(self.db, snapshot)
+        self.events = EventBus()
+        self.current_user = {"name": "", "email": ""}
+        self._change_position = None
+        if not offline or not self.go_offline():
+            self._change_position = self.db.change_position()
+            self._sync_snapshot()
+
+    @property
+    def offline(self): return self.r_sys.offline
+
+    def go_offline(self):
+        """Serves the catalog from the snapshot and queues bookings there; False without a loaded snapshot."""
+        if self.snapshot is None or not self.snapshot.loaded: return False
+        self.r_sys.offline = True
+        return True
+
+    def go_online(self):
+        """Reconnects after working offline, catches the snapshot up and saves the bookings queued meanwhile.
+
+        Returns reconcile_bookings' result. If the database is still down this raises and the desk stays offline.
+        """
+        self.db.ping()
+        self._change_position = self.db.change_position()
+        self.r_sys.offline = False
+        self._sync_snapshot()
+        return self.reconcile_bookings()
+
+    def _require_online(self):
+        if self.offline: raise OfflineError("The database cannot be reached; please try again once it is back.")
+
+    def _sync_snapshot(self):
+        if self.snapshot is None: return
+        changed = self.snapshot.sync(self.db)
+        if changed is None:
+            self.r_sys.invalidate_catalog()
+            self.events.publish(CarChanged(None))
+        elif changed:
+            self.events.publish(CarChanged(tuple(changed)))
+
+    def _refresh_snapshot(self, car_ids=None):
+        """Copies changed cars (or, for None, the whole catalog) into the snapshot before views read them again."""
+        if self.snapshot is None or not self.snapshot.loaded: return
+        if car_ids is None: self.snapshot.load(self.db)
+        else: self.snapshot.refresh_cars(self.db, car_ids)
+
+    def register(self, name, email, password):
+        if self.offline: return "Registration needs the database, which cannot be reached right now."
+        return self.db.register_user(name, email, hash_password(password))
+
+    def import_users(self, path, update_existing=False, on_progress=None, db=None):
+        """Imports accounts from a CSV file; ``db`` is the connection to use instead of ours, e.g. a worker's own."""
+        self._require_online()
+        return import_users(db or self.db, path, update_existing, on_progress=on_progress)
+
+    def import_catalog(self, paths, dry_run=False):
+        self._require_online()
+        plans = import_catalog(self.db, paths, dry_run=dry_run)
+        if not dry_run and any(has_changes(plan) for plan in plans.values()):
+            self.r_sys.invalidate_catalog()
+            self._refresh_snapshot()
+            self.events.publish(CarChanged(None))
+        return plans
+
+    def login(self, email, password):
+        """Signs in against the database; raises OfflineError while it cannot be reached."""
+        self._require_online()
+        user_data = self.db.login_user(email, hash_password(password))
+        if user_data:
+            self.current_user = {"name": user_data['name'], "email": user_data['email']}
+            return True
+        return False
+
+    def logout(self): self.current_user = {"name": "", "email": ""}
+
+    def browse_as_guest(self):
+        """Lets the desk browse the catalog without signing in, e.g. from the snapshot while offline; guests cannot
+        book or send messages."""
+        self.current_user = {"name": "Guest", "email": ""}
+
+    @property
+    def is_guest(self): return self.current_user == {"name": "Guest", "email": ""}
+
+    def record_transaction(self, data):
+        """Assigns a unit of the chosen model and saves the booking; returns the unit, or None if none is free.
+
+        Offline the booking is queued in the snapshot instead (the unit then has no id yet); reconcile_bookings saves
+        it once the database is back.
+        """
+        if self.offline: return self._queue_booking(data)
+        pickup = datetime.datetime.combine(data.get("start_date") or datetime.date.today(),
+                                           datetime.datetime.now().time())
+        unit, data["transaction_id"] = self._book(self.current_user, data["car"], data["duration"], data["services"],
+                                                  data["final_total"], pickup)
+        return unit
+
+    def _book(self, user, car, duration, services, final_total, pickup, timestamp=None):
+        """Claims a unit from ``pickup`` and saves the booking; returns (unit, transaction id), or (None, None).
+
+        Any other error it raises means nothing is held, so the booking may be taken again (e.g. queued offline);
+        once a unit was claimed and that cannot be undone, BookingUncertain is raised instead.
+        """
+        unit = self.db.allocate_unit(car.car_id, pickup + datetime.timedelta(days=duration))
+        if unit is None: return None, None
+        txn = Transaction(user=user, car=car, duration=duration, services=services, final_total=final_total,
+                          start_date=pickup.date())
+        if timestamp: txn.timestamp = timestamp
+        try:
+            transaction_id = self.db.save_transaction(txn, unit['id'])
+        except Exception as err:
+            # A save cut off by a lost connection may have been committed: keep the claim, never free a rented unit.
+            if getattr(err, "errno", None) in self.db.CONNECTION_LOST: raise BookingUncertain(unit, err) from err
+            try:
+                self.db.release_unit(unit['id'])
+            except Exception as release_err:
+                raise BookingUncertain(unit, release_err) from err
+            raise
+        try:
+            self._refresh_snapshot((car.car_id,))
+        except Exception:
+            pass  # the booking is saved; the snapshot catches up with the change log on its next sync
+        self.events.publish(BookingCreated(transaction_id, car.car_id, unit['id']))
+        self.events.publish(CarChanged((car.car_id,)))  # one unit fewer is free
+        return unit, transaction_id
+
+    def _queue_booking(self, data):
+        car = data["car"]
+        if not self.snapshot.hold_unit(car.car_id): return None
+        data["transaction_id"] = None
+        number = self.snapshot.queue_booking(self.current_user, data)
+        self.events.publish(CarChanged((car.car_id,)))
+        return {"id": None, "plate": "To be assigned", "branch": f"offline booking #{number}"}
+
+    def reconcile_bookings(self):
+        """Saves the bookings taken offline, oldest first; returns the (saved, failed) QueuedBookings.
+
+        A booking whose model has no free unit left, or whose save could not be confirmed, is kept in the snapshot with
+        the reason, for the desk to follow up with the customer.
+        """
+        saved, failed = [], []
+        for booking in self.snapshot.queued_bookings() if self.snapshot is not None else []:
+            pickup = datetime.datetime.combine(booking.start_date or booking.queued_at.date(),
+                                               booking.queued_at.time())
+            try:
+                unit, _ = self._book(booking.user, booking.car, booking.duration, booking.services,
+                                     booking.final_total, pickup, booking.queued_at)
+                error = None if unit else f"No unit of {booking.car.name} was free."
+            except BookingUncertain as err:
+                error = f"{err}; check the sales report before booking it again."
+            if error:
+                self.snapshot.finish_booking(booking.id, error)
+                failed.append(booking._replace(error=error))
+            else:
+                self.snapshot.finish_booking(booking.id)
+                saved.append(booking)
+        return saved, failed
+
+    def save_message(self, name, email, message):
+        self._require_online()
+        message_id = self.db.save_message(name, email, message)
+        self.events.publish(MessageReceived(message_id))
+
+    def poll_changes(self):
+        """Publishes the changes other desks saved since the last poll as events; returns how many there were.
+
+        Only new change_log entries are read, so this is cheap enough to call every few seconds.
+        """
+        if self.offline: return 0
+        changes, self._change_position = self.db.changes_since(self._change_position)
+        cars, catalog = [], False
+        for change in changes:
+            if change['entity'] == "car": cars.append(change['entity_id'])
+            elif change['entity'] == "transaction": self.events.publish(BookingCreated(change['entity_id'], None, None))
+            elif change['entity'] == "message": self.events.publish(MessageReceived(change['entity_id']))
+            elif change['entity'] == "catalog": catalog = True
+        if catalog:
+            self.r_sys.invalidate_catalog()
+            self._refresh_snapshot()
+            self.events.publish(CarChanged(None))
+        elif cars:
+            self._refresh_snapshot(cars)
+            self.events.publish(CarChanged(tuple(dict.fromkeys(cars))))
+        if changes and self.snapshot is not None and self.snapshot.loaded:
+            self.snapshot.position = self._change_position
+        return len(changes)
+
+    def get_all_cars_for_admin(self): return self.db.get_all_cars_data(only_available=False)
+
+    def get_car_data(self, car_id): return (self.snapshot if self.offline else self.db).get_car_data(car_id)
+
+    def update_car_unit_availability(self, car_id, is_available):
+        self.update_cars_availability([car_id], is_available)
+
+    def update_cars_availability(self, car_ids, is_available):
+        """Sets the availability of several models and announces them in a single CarChanged event."""
+        self._require_online()
+        done = []
+        try:
+            for car_id in car_ids:
+                self.db.update_car_availability(car_id, is_available)
+                done.append(car_id)
+        finally:
+            if done:
+                self._refresh_snapshot(done)
+                self.events.publish(CarChanged(tuple(done)))
+
+    def get_transaction(self, txn_id): return self.db.get_transaction(txn_id)
+
+    def get_message(self, message_id): return self.db.get_message(message_id)
+
+    def get_all_transactions(self, include_archive=False): return self.db.get_all_transactions(include_archive)
+
+    def get_all_messages(self, include_archive=False): return self.db.get_all_messages(include_archive)
@@ -0,0 +1,1191 @@
+# -*- coding: utf-8 -*-
+"""The database layer: DBManager for one MySQL (or SQLite stand-in) database, BranchDBManager for several.
+
+Nothing here imports Qt, pandas or matplotlib, so batch jobs and the command line (tools/admin.py)
+can use it without loading the GUI.
+"""
+import os
+import json
+import time
+import heapq
+import random
+import logging
+import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+from db_metrics import QueryMetrics
+from user_import import hash_password
+from transaction_batch import TransactionBatch
+from rental import Car
+
+replica_log = logging.getLogger("rental.replicas")
+db_log = logging.getLogger("rental.db")
+
+
+# The columns of transactions and transactions_archive, in the order the archive copies them.
+TRANSACTION_COLUMNS = ("id, timestamp, user_name, user_email, car_model, duration, services_used, final_total, "
+                       "unit_id, start_date")
+# Transaction reads join the rented unit, so receipts and reports can show its plate.
+_WITH_PLATE = "LEFT JOIN vehicle_units u ON u.id = t.unit_id"
+
+# Every query DBManager runs after start-up. Each one is prepared once per connection and reused.
+QUERIES = {
+    "register_user": "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+    "update_user": "UPDATE users SET name = %s, password_hash = %s WHERE email = %s",
+    "login_user": "SELECT name, email FROM users WHERE email = %s AND password_hash = %s",
+    # Unit counts come from the (car_id, status) index on vehicle_units, never from scanning the units.
+    "get_all_cars_data": "SELECT c.id, c.name, c.price_per_day, c.is_available, COUNT(u.id) AS total_units, "
+                         "COALESCE(SUM(u.status = 'available'), 0) AS available_units FROM cars c "
+                         "LEFT JOIN vehicle_units u ON u.car_id = c.id "
+                         "GROUP BY c.id, c.name, c.price_per_day, c.is_available ORDER BY c.category_id, c.name",
+    "get_car_data": "SELECT c.id, c.name, c.price_per_day, c.is_available, COUNT(u.id) AS total_units, "
+                    "COALESCE(SUM(u.status = 'available'), 0) AS available_units FROM cars c "
+                    "LEFT JOIN vehicle_units u ON u.car_id = c.id WHERE c.id = %s "
+                    "GROUP BY c.id, c.name, c.price_per_day, c.is_available",
+    "get_available_cars_data": "SELECT c.id, c.name, c.price_per_day, c.is_available, "
+                               "COUNT(u.id) AS available_units FROM cars c "
+                               "JOIN vehicle_units u ON u.car_id = c.id AND u.status = 'available' "
+                               "WHERE c.is_available = TRUE "
+                               "GROUP BY c.id, c.name, c.price_per_day, c.is_available ORDER BY c.category_id, c.name",
+    "get_cars_by_category": "SELECT c.id, c.name, c.price_per_day, c.is_available, "
+                            "COALESCE(SUM(u.status = 'available'), 0) AS available_units FROM cars c "
+                            "LEFT JOIN vehicle_units u ON u.car_id = c.id WHERE c.category_id = %s "
+                            "GROUP BY c.id, c.name, c.price_per_day, c.is_available",
+    "get_available_cars_by_category": "SELECT c.id, c.name, c.price_per_day, c.is_available, "
+                                      "COUNT(u.id) AS available_units FROM cars c "
+                                      "JOIN vehicle_units u ON u.car_id = c.id AND u.status = 'available' "
+                                      "WHERE c.category_id = %s AND c.is_available = TRUE "
+                                      "GROUP BY c.id, c.name, c.price_per_day, c.is_available",
+    "update_car_availability": "UPDATE cars SET is_available = %s WHERE id = %s",
+    "find_available_units": "SELECT id, plate, branch FROM vehicle_units WHERE car_id = %s AND status = 'available' "
+                            "LIMIT 5",
+    "claim_unit": "UPDATE vehicle_units SET status = 'rented', rented_until = %s WHERE id = %s AND status = 'available'",
+    "release_unit": "UPDATE vehicle_units SET status = 'available', rented_until = NULL WHERE id = %s",
+    "release_expired_units": "UPDATE vehicle_units SET status = 'available', rented_until = NULL "
+                             "WHERE status = 'rented' AND rented_until <= %s",
+    "add_vehicle_unit": "INSERT INTO vehicle_units (car_id, plate, branch) VALUES (%s, %s, %s)",
+    "get_all_categories": "SELECT id, name FROM categories ORDER BY id",
+    "get_all_services": "SELECT name, price, is_daily FROM services",
+    "get_catalog_categories": "SELECT id, name FROM categories",
+    "get_catalog_cars": "SELECT id, category_id, name, price_per_day, is_available FROM cars",
+    "upsert_category": "INSERT INTO categories (name, id) VALUES (%s, %s) ON DUPLICATE KEY UPDATE name = VALUES(name)",
+    "upsert_car": "INSERT INTO cars (category_id, price_per_day, is_available, name) VALUES (%s, %s, %s, %s) "
+                  "ON DUPLICATE KEY UPDATE category_id = VALUES(category_id), price_per_day = VALUES(price_per_day), "
+                  "is_available = VALUES(is_available)",
+    "upsert_service": "INSERT INTO services (price, is_daily, name) VALUES (%s, %s, %s) "
+                      "ON DUPLICATE KEY UPDATE price = VALUES(price), is_daily = VALUES(is_daily)",
+    "get_price_rules": "SELECT * FROM price_rules",
+    "upsert_price_rule": "INSERT INTO price_rules (car_id, category_id, start_date, end_date, weekdays, multiplier, "
+                         "fixed_price, priority, name) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                         "ON DUPLICATE KEY UPDATE car_id = VALUES(car_id), category_id = VALUES(category_id), "
+                         "start_date = VALUES(start_date), end_date = VALUES(end_date), weekdays = VALUES(weekdays), "
+                         "multiplier = VALUES(multiplier), fixed_price = VALUES(fixed_price), "
+                         "priority = VALUES(priority)",
+    "delete_price_rule": "DELETE FROM price_rules WHERE name = %s",
+    "get_catalog_version": "SELECT version FROM catalog_version WHERE id = 1",
+    "bump_catalog_version": "UPDATE catalog_version SET version = version + 1 WHERE id = 1",
+    "save_transaction": "INSERT INTO transactions (timestamp, user_name, user_email, car_model, duration, "
+                        "services_used, final_total, unit_id, start_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+    "save_message": "INSERT INTO messages (timestamp, user_name, user_email, message_text) VALUES (%s, %s, %s, %s)",
+    "get_all_transactions": "SELECT t.id, t.timestamp, t.user_name, t.user_email, t.car_model, t.duration, "
+                            "t.services_used, t.final_total, t.unit_id, t.start_date, u.plate "
+                            f"FROM transactions t {_WITH_PLATE} ORDER BY t.timestamp DESC",
+    "get_transaction": f"SELECT t.*, u.plate FROM transactions t {_WITH_PLATE} WHERE t.id = %s",
+    "iter_transactions": f"SELECT t.*, u.plate FROM transactions t {_WITH_PLATE} "
+                         "WHERE t.timestamp >= %s AND t.timestamp < %s ORDER BY t.timestamp, t.id",
+    "get_all_messages": "SELECT * FROM messages ORDER BY timestamp DESC",
+    # The same reads across the hot tables and their archives (see DBManager.archive).
+    "get_all_transactions_archived": "SELECT t.id, t.timestamp, t.user_name, t.user_email, t.car_model, t.duration, "
+                                     "t.services_used, t.final_total, t.unit_id, t.start_date, u.plate "
+                                     f"FROM (SELECT {TRANSACTION_COLUMNS} FROM transactions UNION ALL "
+                                     f"SELECT {TRANSACTION_COLUMNS} FROM transactions_archive) t {_WITH_PLATE} "
+                                     "ORDER BY t.timestamp DESC",
+    "get_archived_transaction": f"SELECT t.*, u.plate FROM transactions_archive t {_WITH_PLATE} WHERE t.id = %s",
+    "iter_transactions_archived": f"SELECT t.*, u.plate FROM (SELECT {TRANSACTION_COLUMNS} FROM transactions "
+                                  "WHERE timestamp >= %s AND timestamp < %s UNION ALL "
+                                  f"SELECT {TRANSACTION_COLUMNS} FROM transactions_archive "
+                                  f"WHERE timestamp >= %s AND timestamp < %s) t {_WITH_PLATE} "
+                                  "ORDER BY t.timestamp, t.id",
+    "get_all_messages_archived": "SELECT * FROM messages UNION ALL SELECT * FROM messages_archive "
+                                 "ORDER BY timestamp DESC",
+    # Transactions picked up in [start, end), in TransactionBatch column order (see the utilization report).
+    "get_transactions_between": "SELECT t.id, t.timestamp, t.user_name, t.user_email, t.car_model, t.duration, "
+                                "t.services_used, t.final_total, t.unit_id, t.start_date, u.plate "
+                                f"FROM transactions t {_WITH_PLATE} WHERE t.start_date >= %s AND t.start_date < %s",
+    "get_transactions_between_archived": "SELECT t.id, t.timestamp, t.user_name, t.user_email, t.car_model, "
+                                         "t.duration, t.services_used, t.final_total, t.unit_id, t.start_date, u.plate "
+                                         f"FROM (SELECT {TRANSACTION_COLUMNS} FROM transactions "
+                                         "WHERE start_date >= %s AND start_date < %s UNION ALL "
+                                         f"SELECT {TRANSACTION_COLUMNS} FROM transactions_archive "
+                                         f"WHERE start_date >= %s AND start_date < %s) t {_WITH_PLATE}",
+    # The newest id is never archived: MySQL before 8.0 restarts AUTO_INCREMENT at MAX(id) + 1, which would hand out
+    # ids that are already in the archive.
+    "get_archive_batch_transactions": "SELECT MAX(id) AS upto FROM (SELECT id FROM transactions WHERE timestamp < %s "
+                                      "AND id <= %s AND id < (SELECT MAX(id) FROM transactions) "
+                                      "ORDER BY id LIMIT %s) t",
+    "archive_transactions": f"INSERT INTO transactions_archive ({TRANSACTION_COLUMNS}) SELECT {TRANSACTION_COLUMNS} "
+                            "FROM transactions WHERE timestamp < %s AND id <= %s",
+    "delete_archived_transactions": "DELETE FROM transactions WHERE timestamp < %s AND id <= %s",
+    "get_archive_batch_messages": "SELECT MAX(id) AS upto FROM (SELECT id FROM messages WHERE timestamp < %s "
+                                  "AND id <= %s AND id < (SELECT MAX(id) FROM messages) ORDER BY id LIMIT %s) t",
+    "archive_messages": "INSERT INTO messages_archive SELECT * FROM messages WHERE timestamp < %s AND id <= %s",
+    "delete_archived_messages": "DELETE FROM messages WHERE timestamp < %s AND id <= %s",
+    "log_change": "INSERT INTO change_log (entity, entity_id, origin) VALUES (%s, %s, %s)",
+    "log_unit_change": "INSERT INTO change_log (entity, entity_id, origin) SELECT 'car', car_id, %s "
+                       "FROM vehicle_units WHERE id = %s",
+    "log_expired_units": "INSERT INTO change_log (entity, entity_id, origin) SELECT DISTINCT 'car', car_id, %s "
+                         "FROM vehicle_units WHERE status = 'rented' AND rented_until <= %s",
+    "get_changes": "SELECT id, entity, entity_id FROM change_log WHERE id > %s AND origin <> %s ORDER BY id LIMIT %s",
+    "get_change_head": "SELECT COALESCE(MAX(id), 0) AS head FROM change_log",
+    "prune_change_log": "DELETE FROM change_log WHERE created_at < %s",
+    "get_message": "SELECT * FROM messages WHERE id = %s",
+    "get_demand_position": "SELECT last_transaction_id AS position FROM demand_cube_state WHERE id = 1",
+    # head: the newest transaction after the position; fresh: the first one too recent to fold in yet.
+    "get_demand_pending": "SELECT COALESCE(MAX(id), 0) AS head, MIN(CASE WHEN timestamp >= %s THEN id END) AS fresh "
+                          "FROM transactions WHERE id > %s",
+    "claim_demand_range": "UPDATE demand_cube_state SET last_transaction_id = %s "
+                          "WHERE id = 1 AND last_transaction_id = %s",
+    "fold_demand": "INSERT INTO demand_cube (category_id, month, weekday, hour, bookings, rental_days, revenue) "
+                   "SELECT COALESCE(c.category_id, ''), MONTH(t.timestamp), WEEKDAY(t.timestamp), HOUR(t.timestamp), "
+                   "COUNT(*), COALESCE(SUM(t.duration), 0), COALESCE(SUM(t.final_total), 0) FROM transactions t "
+                   "LEFT JOIN cars c ON c.name = t.car_model "
+                   "WHERE t.id > %s AND t.id <= %s AND t.timestamp IS NOT NULL "
+                   "GROUP BY COALESCE(c.category_id, ''), MONTH(t.timestamp), WEEKDAY(t.timestamp), HOUR(t.timestamp) "
+                   "ON DUPLICATE KEY UPDATE bookings = bookings + VALUES(bookings), "
+                   "rental_days = rental_days + VALUES(rental_days), revenue = revenue + VALUES(revenue)",
+    "get_demand_cube": "SELECT category_id, month, weekday, hour, bookings, rental_days, revenue FROM demand_cube",
+}
+
+# Identifies this app instance in change_log, so that it skips its own changes when polling for those of other desks.
+CLIENT_ID = uuid.uuid4().hex[:16]
+
+# Reads that may be answered by a read replica, i.e. that can be a moment behind the primary (see DBManager._reader).
+STALE_OK = {"get_all_transactions", "get_all_messages", "get_transaction", "iter_transactions", "get_all_cars_data",
+            "get_available_cars_data", "get_cars_by_category", "get_available_cars_by_category", "search_cars",
+            "get_all_categories", "get_all_services", "get_price_rules", "get_catalog_version", "get_demand_cube",
+            "get_all_transactions_archived", "get_archived_transaction", "iter_transactions_archived",
+            "get_all_messages_archived", "get_transactions_between", "get_transactions_between_archived"}
+
+SEARCH_SORTS = {"name": "c.name", "price_asc": "c.price_per_day", "price_desc": "c.price_per_day DESC",
+                "units": "available_units DESC"}
+
+# Indexes added to existing tables; (table, index name, columns).
+INDEXES = [
+    ("cars", "idx_cars_browse", "is_available, category_id, price_per_day"),
+    ("cars", "idx_cars_price", "is_available, price_per_day"),
+    ("transactions", "idx_transactions_timestamp", "timestamp"),
+    ("messages", "idx_messages_timestamp", "timestamp"),
+    ("transactions", "idx_transactions_start_date", "start_date"),
+    ("transactions_archive", "idx_transactions_archive_start_date", "start_date"),
+]
+
+# Columns added to existing tables; (table, column, definition, value for the existing rows or None).
+NEW_COLUMNS = [
+    ("transactions", "unit_id", "INT NULL", None),
+    ("transactions_archive", "unit_id", "INT NULL", None),
+    ("transactions", "start_date", "DATE NULL", "DATE(timestamp)"),
+    ("transactions_archive", "start_date", "DATE NULL", "DATE(timestamp)"),
+]
+
+
+def search_query(filters, sort=None):
+    """Registers the vehicle search variant for the given filter flags and returns its QUERIES name.
+
+    ``filters`` flags (category, min price, max price, text) in that order. Without ``sort`` the variant counts the
+    matches instead of returning a page. There are only a few dozen variants, each prepared once per connection.
+    """
+    name = f"search_cars:{''.join('1' if f else '0' for f in filters)}:{sort or 'count'}"
+    if name not in QUERIES:
+        category, min_price, max_price, text = filters
+        where = "c.is_available = TRUE" + (" AND c.category_id = %s" if category else "") \
+                + (" AND c.price_per_day >= %s" if min_price else "") \
+                + (" AND c.price_per_day <= %s" if max_price else "") + (" AND c.name LIKE %s" if text else "")
+        if sort is None:
+            QUERIES[name] = (f"SELECT COUNT(*) AS total FROM cars c WHERE {where} AND EXISTS (SELECT 1 FROM "
+                             "vehicle_units u WHERE u.car_id = c.id AND u.status = 'available')")
+        else:
+            QUERIES[name] = ("SELECT c.id, c.name, c.price_per_day, c.is_available, COUNT(u.id) AS available_units "
+                             "FROM cars c JOIN vehicle_units u ON u.car_id = c.id AND u.status = 'available' "
+                             f"WHERE {where} GROUP BY c.id, c.name, c.price_per_day, c.is_available "
+                             f"ORDER BY {SEARCH_SORTS[sort]}, c.id LIMIT %s OFFSET %s")
+    return name
+
+
+def connection_options(options):
+    """Turns a JSON connection entry into DBManager arguments; ``"backend": "sqlite"`` selects the SQLite stand-in."""
+    options = dict(options)
+    if options.pop("backend", "mysql") == "sqlite":
+        import sqlite_standin
+        options["connector"] = sqlite_standin
+    return options
+
+
+class DatabaseUnavailable(Exception):
+    """The database could not be reached, even after retrying with backoff."""
+
+
+class DBManager:
+    UNITS_PER_MODEL = 3  # units seeded for each model of the initial catalog
+    REPLICA_RETRY_SECONDS = 30  # a replica that failed is skipped for this long
+    CONNECT_ATTEMPTS = 5  # tries per (re)connect, waiting BACKOFF_SECONDS, then twice as long each time
+    BACKOFF_SECONDS, BACKOFF_MAX_SECONDS = 0.5, 8.0
+    CONNECT_TIMEOUT_SECONDS = 10
+    KEEPALIVE_SECONDS = 300  # a connection idle for longer is pinged before use (MySQL's wait_timeout is 8 hours)
+    CONNECTION_LOST = {2006, 2013, 2055}  # server gone away, lost connection during query, lost connection to server
+    ACCESS_DENIED = {1044, 1045, 1049}  # wrong credentials or database: retrying cannot help
+    CHANGE_LOG_DAYS = 7  # change_log entries older than this are deleted at start-up
+    DEMAND_SETTLE_SECONDS = 60  # bookings younger than this are left for the next demand cube refresh
+
+    def __init__(self, host="localhost", user="root", password="", database="car_rental_db_final", connector=None,
+                 metrics=None, prepared=True, replicas=None, read_only=False, read_your_writes=5.0, create_schema=True,
+                 connect=True):
+        """``replicas`` lists connection options (as in connection_options) of read replicas of this database.
+
+        Reads in STALE_OK go to the replicas in turn, except during the ``read_your_writes`` seconds after this
+        manager wrote something, so the session always sees its own changes. ``read_only`` managers (the replicas)
+        never create or seed tables, nor do managers with ``create_schema`` off (see clone). With ``connect`` off
+        nothing is opened until the first query or ping, e.g. to start from the catalog snapshot while offline.
+        """
+        self.host, self.user, self.password, self.database = host, user, password, database
+        # Any module with the mysql.connector interface works here (e.g. sqlite_standin for local testing).
+        self.connector = connector or mysql.connector
+        self.metrics = metrics or QueryMetrics()
+        self.prepared, self.read_only, self.read_your_writes = prepared, read_only, read_your_writes
+        self.create_schema, self._replica_options = create_schema and not read_only, list(replicas or [])
+        self._label = "@replica" if read_only else ""
+        self.conn, self.cursor = None, None
+        self._statements, self._last_used, self._pending = {}, time.monotonic(), False
+        self.replicas, self._connected = [], False
+        self._next_replica, self._last_write, self._replica_down = 0, float("-inf"), {}
+        self.connect_attempts = self.CONNECT_ATTEMPTS
+        if connect: self.connect()
+
+    def connect(self):
+        """Opens the connection and creates the schema; raises DatabaseUnavailable if the server cannot be reached."""
+        self._with_backoff(self._connect_and_prepare)
+        self._connected = True
+        for options in self._replica_options:
+            try:
+                self.replicas.append(DBManager(metrics=self.metrics, prepared=self.prepared, read_only=True,
+                                               **connection_options(options)))
+                self.replicas[-1].connect_attempts = self.connect_attempts
+            except DatabaseUnavailable as err:
+                replica_log.warning("skipping replica: %s", err)  # the primary can serve every read on its own
+
+    def _connect_and_prepare(self):
+        if self.create_schema:
+            conn = self.connector.connect(host=self.host, user=self.user, password=self.password,
+                                          connection_timeout=self.CONNECT_TIMEOUT_SECONDS)
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
+            conn.close()
+        self._open()
+        if not self.create_schema: return
+        self._create_tables()
+        self._add_columns()
+        self._create_indexes()
+        self._insert_initial_data()
+        self.prune_change_log()
+
+    def clone(self):
+        """Returns a manager on a connection of its own to the same database (and replicas), e.g. for a worker
+        thread: a connection must never be used by two threads at once."""
+        return DBManager(self.host, self.user, self.password, self.database, self.connector, self.metrics,
+                         self.prepared, self._replica_options, self.read_only, self.read_your_writes,
+                         create_schema=False)
+
+    def _open(self):
+        self.conn = self.connector.connect(host=self.host, user=self.user, password=self.password,
+                                           database=self.database, connection_timeout=self.CONNECT_TIMEOUT_SECONDS)
+        self.cursor = self.conn.cursor(dictionary=True)
+        self._statements, self._last_used, self._pending = {}, time.monotonic(), False
+
+    def _with_backoff(self, func):
+        """Calls ``func`` until it succeeds, waiting longer (with jitter) after each connection error."""
+        delay = self.BACKOFF_SECONDS
+        for attempt in range(1, self.connect_attempts + 1):
+            try:
+                return func()
+            except self.connector.Error as err:
+                if err.errno in self.ACCESS_DENIED or attempt == self.connect_attempts:
+                    raise DatabaseUnavailable(f"Cannot reach {self.database} on {self.host}: {err}") from err
+                db_log.warning("connecting to %s/%s failed (%s); retrying in %.1fs", self.host, self.database, err,
+                               delay)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.BACKOFF_MAX_SECONDS)
+
+    def fail_fast(self):
+        """Gives up a (re)connect after one attempt instead of backing off, for the connection of the GUI thread.
+
+        A query then raises DatabaseUnavailable at once and waiting for the server is left to a worker (see clone,
+        whose connections keep the backoff).
+        """
+        self.connect_attempts = 1
+        for replica in self.replicas: replica.connect_attempts = 1
+
+    def reconnect(self):
+        """Drops the current connection and opens a new one; uncommitted changes on the old one are lost."""
+        try:
+            if self.conn: self.conn.close()
+        except self.connector.Error:
+            pass  # the old connection is already gone
+        self.conn = None
+        self._with_backoff(self._open)
+        self.metrics.observe("reconnect" + self._label, "RECONNECT", 0.0)
+
+    def ping(self):
+        """Checks the connection, reconnecting if the server dropped it (e.g. after MySQL's wait_timeout)."""
+        if not self._connected: return self.connect()  # opened with connect=False and not used yet
+        try:
+            if self.conn is None: raise self.connector.Error("Not connected", 2006)
+            self.conn.ping(reconnect=False)
+            self._last_used = time.monotonic()
+        except self.connector.Error as err:
+            db_log.warning("connection to %s/%s lost (%s); reconnecting", self.host, self.database, err)
+            self.reconnect()
+
+    def keepalive(self):
+        """Pings the connections that have been idle for KEEPALIVE_SECONDS, so the server does not drop them."""
+        if time.monotonic() - self._last_used >= self.KEEPALIVE_SECONDS: self.ping()
+        for replica in self.replicas:
+            try:
+                replica.keepalive()
+            except DatabaseUnavailable as err:
+                replica_log.warning("replica %s/%s is down (%s)", replica.host, replica.database, err)
+                self._replica_down[id(replica)] = time.monotonic() + self.REPLICA_RETRY_SECONDS
+
+    def _statement(self, name):
+        """Returns the prepared cursor for a registered query, preparing it on first use."""
+        cursor = self._statements.get(name)
+        if cursor is None:
+            cursor = self._statements[name] = self.conn.cursor(prepared=True, dictionary=True)
+        return cursor
+
+    def _reader(self, name):
+        """Returns the manager that should run the read ``name``: a replica if it may be stale, else this primary."""
+        if not self.replicas or name.split(":")[0] not in STALE_OK: return self
+        now = time.monotonic()
+        if now - self._last_write < self.read_your_writes: return self
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next_replica % len(self.replicas)]
+            self._next_replica += 1
+            if self._replica_down.get(id(replica), 0) <= now: return replica
+        return self
+
+    def _replica_failed(self, replica, err):
+        # Fall back to the primary and leave the replica alone for a while.
+        replica_log.warning("replica %s/%s failed (%s); reading from the primary", replica.host, replica.database, err)
+        self._replica_down[id(replica)] = time.monotonic() + self.REPLICA_RETRY_SECONDS
+
+    def _query(self, name, params=(), fetch=None, many=False):
+        """Runs the registered query ``name``; batches (``many``) go through the plain cursor's multi-row insert.
+
+        A read that fails because the connection was lost is retried once on a new connection, unless it is part of
+        a transaction with uncommitted writes. Writes are never retried: the caller cannot know whether they landed.
+        """
+        if fetch is None:
+            self._last_write = time.monotonic()
+        elif (reader := self._reader(name)) is not self:
+            try:
+                return reader._query(name, params, fetch, many)
+            except (reader.connector.Error, DatabaseUnavailable) as err:
+                self._replica_failed(reader, err)
+        if self.conn is None or time.monotonic() - self._last_used >= self.KEEPALIVE_SECONDS: self.ping()
+        retry = fetch is not None and not self._pending
+        if fetch is None: self._pending = True
+        try:
+            cursor = self._statement(name) if self.prepared and not many else self.cursor
+            return self._run(name, QUERIES[name], params, fetch, many, cursor)
+        except self.connector.Error as err:
+            if err.errno not in self.CONNECTION_LOST: raise
+            if not retry:
+                # The open transaction is gone with the connection; check it (and reconnect) before the next query.
+                self._pending, self._last_used = False, float("-inf")
+                raise
+            db_log.warning("connection to %s/%s lost during %s (%s); reconnecting", self.host, self.database, name,
+                           err)
+        self.reconnect()
+        cursor = self._statement(name) if self.prepared and not many else self.cursor
+        return self._run(name, QUERIES[name], params, fetch, many, cursor)
+
+    def _run(self, name, sql, params=(), fetch=None, many=False, cursor=None):
+        """Runs one statement, recording its latency and row count under ``name``.
+
+        ``fetch`` is None for statements without a result set, "one" or "all" otherwise.
+        """
+        cursor = cursor or self.cursor
+        self._last_used = time.monotonic()
+        started = time.perf_counter()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            if fetch == "all":
+                result = cursor.fetchall()
+                rows = len(result)
+            elif fetch == "one":
+                # Read the whole result so the connection has no unread rows left.
+                result = next(iter(cursor.fetchall()), None)
+                rows = 1 if result else 0
+            else:
+                result = rows = cursor.rowcount
+        except self.connector.Error:
+            self.metrics.observe(name + self._label, sql, time.perf_counter() - started, failed=True)
+            raise
+        self.metrics.observe(name + self._label, sql, time.perf_counter() - started, rows)
+        return result
+
+    def _scan(self, name, build, params=(), chunk_size=5000):
+        """Runs the registered read ``name`` on a cursor of its own and returns ``build(chunks)``.
+
+        ``chunks`` yields lists of up to ``chunk_size`` row tuples straight from the cursor, so a large result is
+        never held as one list of dicts.
+        """
+        if (reader := self._reader(name)) is not self:
+            try:
+                return reader._scan(name, build, params, chunk_size)
+            except (reader.connector.Error, DatabaseUnavailable) as err:
+                self._replica_failed(reader, err)
+        if self.conn is None or time.monotonic() - self._last_used >= self.KEEPALIVE_SECONDS: self.ping()
+        sql, cursor = QUERIES[name], self.conn.cursor()
+        self._last_used = time.monotonic()
+        started, rows, failed = time.perf_counter(), 0, False
+
+        def chunks():
+            nonlocal rows
+            while chunk := cursor.fetchmany(chunk_size):
+                rows += len(chunk)
+                yield chunk
+
+        try:
+            cursor.execute(sql, params)
+            return build(chunks())
+        except self.connector.Error:
+            failed = True
+            raise
+        finally:
+            cursor.close()
+            self.metrics.observe(name + self._label, sql, time.perf_counter() - started, rows, failed)
+
+    def _commit(self):
+        started = time.perf_counter()
+        self.conn.commit()
+        self._pending = False
+        self.metrics.observe("commit", "COMMIT", time.perf_counter() - started)
+
+    def _rollback(self):
+        self._pending = False
+        self.conn.rollback()
+
+    def end_read(self):
+        """Ends the read snapshot of this connection and its replicas, so that the next read sees the latest data.
+
+        InnoDB keeps a snapshot from the first read until the next commit; connections that only read (the
+        BackgroundLoader's) would otherwise see the same data forever. Does nothing while writes are uncommitted.
+        """
+        if self.conn is not None and not self._pending:
+            try:
+                self._commit()
+            except self.connector.Error:
+                self._last_used = float("-inf")  # ping, and reconnect if need be, before the next query
+        for replica in self.replicas: replica.end_read()
+
+    def _create_tables(self):
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS categories (id VARCHAR(10) PRIMARY KEY, name VARCHAR(100) NOT NULL)")
+
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cars (
+                id INT AUTO_INCREMENT PRIMARY KEY, category_id VARCHAR(10), 
+                name VARCHAR(100) NOT NULL UNIQUE, price_per_day DECIMAL(10, 2) NOT NULL,
+                is_available BOOLEAN DEFAULT TRUE, FOREIGN KEY (category_id) REFERENCES categories(id)
+            )
+        """)
+
+        # Physical vehicles: each row is one unit (plate) of a car model in `cars`.
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vehicle_units (
+                id INT AUTO_INCREMENT PRIMARY KEY, car_id INT NOT NULL, plate VARCHAR(20) NOT NULL UNIQUE,
+                branch VARCHAR(100) NOT NULL DEFAULT 'Main', status VARCHAR(20) NOT NULL DEFAULT 'available',
+                rented_until DATETIME NULL, FOREIGN KEY (car_id) REFERENCES cars(id),
+                INDEX idx_units_car_status (car_id, status), INDEX idx_units_status_until (status, rented_until)
+            )
+        """)
+
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL,
+                email VARCHAR(100) NOT NULL UNIQUE, password_hash VARCHAR(256) NOT NULL
+            )
+        """)
+
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS services (id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, price DECIMAL(10, 2) NOT NULL, is_daily BOOLEAN NOT NULL)")
+        # Seasonal and weekday pricing, expanded into a daily price calendar by price_calendar.PriceCalendar.
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_rules (
+                id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, car_id INT NULL,
+                category_id VARCHAR(10) NULL, start_date DATE NULL, end_date DATE NULL, weekdays VARCHAR(7) NULL,
+                multiplier DECIMAL(6, 3) NULL, fixed_price DECIMAL(10, 2) NULL, priority INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (car_id) REFERENCES cars(id)
+            )
+        """)
+        # Bumped by every catalog import so that caches of categories and services know to reload.
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS catalog_version (id INT PRIMARY KEY, version INT NOT NULL)")
+        self.cursor.execute("INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS transactions (id INT AUTO_INCREMENT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100), user_email VARCHAR(100), car_model VARCHAR(100), duration INT, services_used TEXT, final_total DECIMAL(10, 2), unit_id INT NULL, start_date DATE NULL)")
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INT AUTO_INCREMENT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100),
+                user_email VARCHAR(100), message_text TEXT
+            )
+        """)
+        # Transactions and messages older than the archive age are moved here (see archive), keeping their ids.
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS transactions_archive (
+                id INT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100), user_email VARCHAR(100),
+                car_model VARCHAR(100), duration INT, services_used TEXT, final_total DECIMAL(10, 2),
+                unit_id INT NULL, start_date DATE NULL, INDEX idx_transactions_archive_timestamp (timestamp)
+            )
+        """)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS messages_archive (
+                id INT PRIMARY KEY, timestamp DATETIME, user_name VARCHAR(100), user_email VARCHAR(100),
+                message_text TEXT, INDEX idx_messages_archive_timestamp (timestamp)
+            )
+        """)
+        # One row per change, written in the same transaction as the change itself; other desks poll it for new rows
+        # (see changes_since). entity is "car", "transaction", "message" or "catalog" (entity_id NULL).
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY, entity VARCHAR(20) NOT NULL, entity_id INT NULL,
+                origin VARCHAR(32) NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_change_log_created (created_at)
+            )
+        """)
+        # Bookings per category, month, weekday and hour (see demand.py), and the last transaction folded into it.
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS demand_cube (
+                category_id VARCHAR(10) NOT NULL, month TINYINT NOT NULL, weekday TINYINT NOT NULL,
+                hour TINYINT NOT NULL, bookings INT NOT NULL DEFAULT 0, rental_days INT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0, PRIMARY KEY (category_id, month, weekday, hour)
+            )
+        """)
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS demand_cube_state (id INT PRIMARY KEY, last_transaction_id INT NOT NULL)")
+        self.cursor.execute("INSERT IGNORE INTO demand_cube_state (id, last_transaction_id) VALUES (1, 0)")
+        self.conn.commit()
+
+    def _add_columns(self):
+        for table, column, definition, fill in NEW_COLUMNS:
+            try:
+                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            except self.connector.Error as err:
+                if err.errno != 1060: raise  # 1060: the column already exists
+                continue
+            if fill: self.cursor.execute(f"UPDATE {table} SET {column} = {fill}")
+        self.conn.commit()
+
+    def _create_indexes(self):
+        for table, name, columns in INDEXES:
+            try:
+                self.cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+            except self.connector.Error as err:
+                if err.errno != 1061: raise  # 1061: the index already exists
+
+    def _insert_initial_data(self):
+        categories = [('1', '6 Seaters (SUVs, MPVs, Vans)'), ('2', '4 Seaters (Sedans & Specialty)')]
+        self._run("seed_categories", "INSERT IGNORE INTO categories (id, name) VALUES (%s, %s)", categories,
+                  many=True)
+
+        cars = [('1', 'Toyota Innova (MPV)', 3200.00), ('1', 'Mitsubishi Xpander (MPV)', 2800.00),
+                ('1', 'Nissan Terra (SUV)', 4500.00), ('1', 'Ford Everest (SUV)', 4300.00),
+                ('1', 'Hyundai Staria (Van)', 6000.00), ('2', 'Toyota Vios / Honda City', 1750.00),
+                ('2', 'Mazda 3', 2200.00), ('2', 'Honda Civic Turbo', 2600.00),
+                ('2', 'Toyota Camry', 3500.00), ('2', 'BMW 3-Series (Luxury)', 5000.00)]
+        car_names = [c[1] for c in cars]
+        rows = self._run("seed_cars_existing",
+                         f"SELECT name FROM cars WHERE name IN ({', '.join(['%s'] * len(car_names))})", car_names,
+                         fetch="all")
+        existing_cars = {row['name'] for row in rows}
+        new_cars = [c for c in cars if c[1] not in existing_cars]
+        if new_cars:
+            self._run("seed_cars", "INSERT INTO cars (category_id, name, price_per_day) VALUES (%s, %s, %s)",
+                      new_cars, many=True)
+
+        rows = self._run("seed_units_missing",
+                         "SELECT c.id FROM cars c LEFT JOIN vehicle_units u ON u.car_id = c.id "
+                         f"WHERE u.id IS NULL AND c.name IN ({', '.join(['%s'] * len(car_names))})", car_names,
+                         fetch="all")
+        new_units = [(row['id'], f"RGD {row['id']:03d}-{n}", "Main") for row in rows for n in
+                     range(1, self.UNITS_PER_MODEL + 1)]
+        if new_units:
+            self._run("seed_units", QUERIES["add_vehicle_unit"], new_units, many=True)
+
+        if self._run("seed_user_exists", "SELECT COUNT(*) FROM users WHERE email = 'test@user.com'",
+                     fetch="one")['COUNT(*)'] == 0:
+            self._run("seed_user", "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+                      ("Test User", "test@user.com", hash_password("password")))
+
+        services = [('Insurance and Waivers', 1500.00, False), ('RFID Pass (Toll Fees)', 750.00, False)]
+        service_names = [s[0] for s in services]
+        rows = self._run("seed_services_existing",
+                         f"SELECT name FROM services WHERE name IN ({', '.join(['%s'] * len(service_names))})",
+                         service_names, fetch="all")
+        existing_services = {row['name'] for row in rows}
+        new_services = [s for s in services if s[0] not in existing_services]
+        if new_services:
+            self._run("seed_services", "INSERT INTO services (name, price, is_daily) VALUES (%s, %s, %s)",
+                      new_services, many=True)
+
+        self._commit()
+
+    def register_user(self, name, email, password_hash):
+        try:
+            self._query("register_user", (name, email, password_hash))
+            self._commit()
+            return True
+        except self.connector.Error as err:
+            if err.errno == 1062: return "Email already registered."
+            return str(err)
+
+    def upsert_users(self, users, update_existing=False):
+        """Imports (name, email, password_hash) rows in one batch; returns (inserted, updated, duplicate emails).
+
+        Emails that are already registered are duplicates, unless ``update_existing`` replaces their name and password;
+        an email repeated within ``users`` is always a duplicate.
+        """
+        if not users: return 0, 0, []
+        emails = list({email for _, email, _ in users})
+        rows = self._run("find_existing_users", f"SELECT email FROM users WHERE email IN "
+                                                f"({', '.join(['%s'] * len(emails))})", emails, fetch="all")
+        existing, seen = {row['email'] for row in rows}, set()
+        inserts, updates, duplicates = [], [], []
+        for name, email, password_hash in users:
+            if email in seen or (email in existing and not update_existing):
+                duplicates.append(email)
+            elif email in existing:
+                updates.append((name, password_hash, email))
+            else:
+                inserts.append((name, email, password_hash))
+            seen.add(email)
+        try:
+            if inserts: self._query("register_user", inserts, many=True)
+            if updates: self._query("update_user", updates, many=True)
+            self._commit()
+        except self.connector.Error as err:
+            self._rollback()
+            if err.errno != 1062 or len(users) == 1: raise
+            # Someone registered one of the emails meanwhile: redo the batch one row at a time.
+            results = [self.upsert_users([user], update_existing) for user in users]
+            return (sum(r[0] for r in results), sum(r[1] for r in results), [e for r in results for e in r[2]])
+        return len(inserts), len(updates), duplicates
+
+    def login_user(self, email, password_hash):
+        return self._query("login_user", (email, password_hash), fetch="one")
+
+    def get_all_cars_data(self, only_available=False):
+        return self._query("get_available_cars_data" if only_available else "get_all_cars_data", fetch="all")
+
+    def get_car_data(self, car_id):
+        """Returns one row as in get_all_cars_data, or None; always read from the primary (it follows a change)."""
+        return self._query("get_car_data", (car_id,), fetch="one")
+
+    def get_cars_by_category(self, category_id, only_available=False):
+        rows = self._query("get_available_cars_by_category" if only_available else "get_cars_by_category",
+                           (category_id,), fetch="all")
+        return [Car(c['name'], c['price_per_day'], c['is_available'], c['id'], int(c['available_units'])) for c in rows]
+
+    def search_cars(self, category_id=None, min_price=None, max_price=None, text="", sort="name", limit=20, offset=0):
+        """Returns one page of available models matching the filters, plus the total number of matches."""
+        filters = [(category_id, category_id), (min_price, min_price), (max_price, max_price), (text, f"%{text}%")]
+        flags = [value not in (None, "") for value, _ in filters]
+        params = tuple(param for (_, param), used in zip(filters, flags) if used)
+        total = self._query(search_query(flags), params, fetch="one")['total']
+        if not total: return [], 0
+        sort = sort if sort in SEARCH_SORTS else "name"
+        rows = self._query(search_query(flags, sort), params + (limit, offset), fetch="all")
+        return [Car(c['name'], c['price_per_day'], c['is_available'], c['id'], int(c['available_units'])) for c in
+                rows], total
+
+    def _log_change(self, entity, entity_id=None):
+        self._query("log_change", (entity, entity_id, CLIENT_ID))
+
+    def update_car_availability(self, car_id, is_available):
+        self._query("update_car_availability", (is_available, car_id))
+        self._log_change("car", car_id)
+        self._commit()
+
+    def add_units(self, car_id, plates, branch="Main"):
+        self._query("add_vehicle_unit", [(car_id, plate, branch) for plate in plates], many=True)
+        self._log_change("car", car_id)
+        self._commit()
+
+    def allocate_unit(self, car_id, rented_until, attempts=5):
+        """Claims a free unit of the model, or returns None when none is left.
+
+        The claim only succeeds while the unit is still available, so two desks can never rent the same unit;
+        a desk that loses the race simply tries another candidate.
+        """
+        for _ in range(attempts):
+            candidates = self._query("find_available_units", (car_id,), fetch="all")
+            self._commit()  # end the read snapshot so a retry sees the other desks' claims
+            if not candidates: return None
+            random.shuffle(candidates)
+            for unit in candidates:
+                if self._query("claim_unit", (rented_until, unit['id'])) == 1:
+                    self._log_change("car", car_id)
+                    self._commit()
+                    return unit
+        return None
+
+    def release_unit(self, unit_id):
+        self._query("release_unit", (unit_id,))
+        self._query("log_unit_change", (CLIENT_ID, unit_id))
+        self._commit()
+
+    def release_expired_units(self):
+        now = datetime.datetime.now()
+        self._query("log_expired_units", (CLIENT_ID, now))  # the models about to get units back
+        released = self._query("release_expired_units", (now,))
+        self._commit()
+        return released
+
+    def get_all_categories(self):
+        return self._query("get_all_categories", fetch="all")
+
+    def get_all_services(self):
+        return self._query("get_all_services", fetch="all")
+
+    def get_catalog(self):
+        """Returns the current categories, cars and services, e.g. to diff a catalog import against."""
+        return {"categories": self._query("get_catalog_categories", fetch="all"),
+                "cars": self._query("get_catalog_cars", fetch="all"),
+                "services": self._query("get_all_services", fetch="all"),
+                "price_rules": self._query("get_price_rules", fetch="all")}
+
+    def get_pricing(self):
+        """Returns the cars and price rules a PriceCalendar is built from."""
+        return {"cars": self._query("get_catalog_cars", fetch="all"), "rules": self._query("get_price_rules", fetch="all")}
+
+    def delete_price_rule(self, name):
+        deleted = self._query("delete_price_rule", (name,))
+        if deleted:
+            self._query("bump_catalog_version")
+            self._log_change("catalog")
+        self._commit()
+        return deleted
+
+    def get_catalog_version(self):
+        return self._query("get_catalog_version", fetch="one")['version']
+
+    def change_position(self):
+        """Returns the position of the newest change_log entry, to pass to changes_since later."""
+        return self._query("get_change_head", fetch="one")['head']
+
+    def changes_since(self, position, limit=500):
+        """Returns the changes other app instances logged after ``position``, oldest first, and the new position.
+
+        Each change is a dict with ``entity`` and ``entity_id``; at most ``limit`` are returned per call.
+        """
+        changes = self._query("get_changes", (position, CLIENT_ID, limit), fetch="all")
+        self._commit()  # end the read snapshot, or the next poll would not see newer entries
+        return changes, changes[-1]['id'] if changes else position
+
+    def prune_change_log(self, days=None):
+        pruned = self._query("prune_change_log",
+                             (datetime.datetime.now() - datetime.timedelta(days=days or self.CHANGE_LOG_DAYS),))
+        self._commit()
+        return pruned
+
+    def apply_catalog(self, plan, chunk_size=1000):
+        """Writes a catalog diff (see catalog_import.diff_catalog) in one transaction; returns the new catalog version.
+
+        New cars get ``units`` vehicle units at the Main branch. Nothing is written if any statement fails.
+        """
+        columns = {"categories": ("name", "id"), "cars": ("category_id", "price_per_day", "is_available", "name"),
+                   "services": ("price", "is_daily", "name")}
+        singular = {"categories": "category", "cars": "car", "services": "service"}
+        try:
+            for table in ("categories", "cars", "services"):
+                # executemany turns each chunk into a single multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+                rows = [tuple(item[c] for c in columns[table]) for item in plan[table]["insert"] + plan[table]["update"]]
+                for start in range(0, len(rows), chunk_size):
+                    self._query(f"upsert_{singular[table]}", rows[start:start + chunk_size], many=True)
+            new_cars = {item['name']: item['units'] for item in plan["cars"]["insert"] if item.get('units')}
+            if new_cars:
+                ids = self._run("catalog_new_car_ids", f"SELECT id, name FROM cars WHERE name IN "
+                                                       f"({', '.join(['%s'] * len(new_cars))})", list(new_cars),
+                                fetch="all")
+                units = [(row['id'], f"RGD {row['id']:03d}-{n}", "Main") for row in ids
+                         for n in range(1, new_cars[row['name']] + 1)]
+                for start in range(0, len(units), chunk_size):
+                    self._query("add_vehicle_unit", units[start:start + chunk_size], many=True)
+            rules = plan["price_rules"]["insert"] + plan["price_rules"]["update"]
+            if rules:
+                names = list({rule['car'] for rule in rules if rule['car']})
+                car_ids = {row['name']: row['id'] for row in self._run(
+                    "catalog_rule_car_ids", f"SELECT id, name FROM cars WHERE name IN ({', '.join(['%s'] * len(names))})",
+                    names, fetch="all")} if names else {}
+                rows = [(car_ids.get(rule['car']), rule['category_id'], rule['start_date'], rule['end_date'],
+                         rule['weekdays'], rule['multiplier'], rule['fixed_price'], rule['priority'], rule['name'])
+                        for rule in rules]
+                self._query("upsert_price_rule", rows, many=True)
+            self._query("bump_catalog_version")
+            self._log_change("catalog")
+            self._commit()
+        except self.connector.Error:
+            self._rollback()
+            raise
+        return self.get_catalog_version()
+
+    def save_transaction(self, txn, unit_id=None):
+        """Saves a booking together with the id of the unit rented for it; returns the transaction id."""
+        services = ", ".join([f"{s['name']} (₱{s['cost']:,.2f})" for s in txn.services])
+        data = (txn.timestamp, txn.user.get('name'), txn.user.get('email'), txn.car.name, txn.duration, services,
+                txn.final_total, unit_id, txn.start_date)
+        self._query("save_transaction", data)
+        txn.id = (self._statement("save_transaction") if self.prepared else self.cursor).lastrowid
+        self._log_change("transaction", txn.id)
+        self._commit()
+        return txn.id
+
+    def save_message(self, name, email, message):
+        self._query("save_message", (datetime.datetime.now(), name, email, message))
+        message_id = (self._statement("save_message") if self.prepared else self.cursor).lastrowid
+        self._log_change("message", message_id)
+        self._commit()
+        return message_id
+
+    def get_message(self, message_id):
+        return self._query("get_message", (message_id,), fetch="one")
+
+    def get_all_transactions(self, include_archive=False):
+        """Returns every transaction, newest first, as a TransactionBatch; the archived ones too with
+        ``include_archive``."""
+        name = "get_all_transactions_archived" if include_archive else "get_all_transactions"
+        return self._scan(name, TransactionBatch.from_chunks)
+
+    def get_transactions_between(self, start, end, include_archive=False):
+        """Returns the transactions picked up from ``start`` to before ``end`` (dates) as a TransactionBatch."""
+        name = "get_transactions_between_archived" if include_archive else "get_transactions_between"
+        return self._scan(name, TransactionBatch.from_chunks, (start, end) * (2 if include_archive else 1))
+
+    def get_transaction(self, txn_id):
+        """Returns one transaction, looking in the archive if it has been moved there."""
+        return self._query("get_transaction", (txn_id,), fetch="one") \
+            or self._query("get_archived_transaction", (txn_id,), fetch="one")
+
+    def iter_transactions(self, start=None, end=None, chunk_size=500, include_archive=False):
+        """Yields raw transaction rows in [start, end) oldest first, fetching ``chunk_size`` rows at a time.
+
+        The rows are streamed on a cursor of their own; consume the generator fully (or close it) before running other
+        queries on this connection. With ``include_archive`` the archived transactions are included.
+        """
+        name = "iter_transactions_archived" if include_archive else "iter_transactions"
+        reader = self._reader(name)
+        if reader is not self:
+            yield from reader.iter_transactions(start, end, chunk_size, include_archive)
+            return
+        sql = QUERIES[name]
+        start, end = start or datetime.datetime(1970, 1, 1), end or datetime.datetime(9999, 12, 31)
+        if self.conn is None or time.monotonic() - self._last_used >= self.KEEPALIVE_SECONDS: self.ping()
+        cursor = self.conn.cursor(dictionary=True)
+        started, rows, failed = time.perf_counter(), 0, False
+        try:
+            cursor.execute(sql, (start, end) * (2 if include_archive else 1))
+            while chunk := cursor.fetchmany(chunk_size):
+                rows += len(chunk)
+                yield from chunk
+        except self.connector.Error:
+            failed = True
+            raise
+        finally:
+            cursor.close()
+            self.metrics.observe(name + self._label, sql, time.perf_counter() - started, rows, failed)
+
+    def get_all_messages(self, include_archive=False):
+        return self._query("get_all_messages_archived" if include_archive else "get_all_messages", fetch="all")
+
+    def archive(self, before, batch_size=5000):
+        """Moves the transactions and messages older than ``before`` into their archive tables.
+
+        Each batch is copied and deleted in one transaction, so a row is always in exactly one of the two tables.
+        The demand cube is refreshed first and only transactions it has already counted are moved, so it stays
+        complete. Returns the number of (transactions, messages) archived.
+        """
+        position = self.refresh_demand_cube()
+        moved = {}
+        for table, upto in (("transactions", position), ("messages", 2 ** 31 - 1)):
+            moved[table] = 0
+            while True:
+                batch = self._query(f"get_archive_batch_{table}", (before, upto, batch_size),
+                                    fetch="one")['upto']
+                if batch is None: break
+                try:
+                    moved[table] += self._query(f"archive_{table}", (before, batch))
+                    self._query(f"delete_archived_{table}", (before, batch))
+                    self._commit()
+                except self.connector.Error:
+                    self._rollback()
+                    raise
+        if any(moved.values()):
+            self._log_change("archive")  # moves the change position on, so cached reports are read again
+            self._commit()
+        self._commit()  # end the read snapshot
+        return moved["transactions"], moved["messages"]
+
+    def refresh_demand_cube(self, chunk_size=100000):
+        """Folds the transactions saved since the last refresh into demand_cube; returns the last one folded in.
+
+        Transactions are folded in id order, up to the first one younger than DEMAND_SETTLE_SECONDS: a booking that
+        another desk is still saving can get a lower id than one already committed, and must not be skipped. Each
+        chunk of ids is claimed with a conditional update, so desks refreshing at the same time never count a
+        transaction twice.
+        """
+        while True:
+            position = self._query("get_demand_position", fetch="one")['position']
+            settled = datetime.datetime.now() - datetime.timedelta(seconds=self.DEMAND_SETTLE_SECONDS)
+            pending = self._query("get_demand_pending", (settled, position), fetch="one")
+            upto = min(pending['head'], position + chunk_size)
+            if pending['fresh'] is not None: upto = min(upto, pending['fresh'] - 1)
+            if upto <= position: break
+            if not self._query("claim_demand_range", (upto, position)):
+                self._rollback()  # another desk has just folded this range in
+                continue
+            self._query("fold_demand", (position, upto))
+            self._commit()
+        self._commit()  # end the read snapshot
+        return position
+
+    def get_demand_cube(self):
+        return self._query("get_demand_cube", fetch="all")
+
+    def close(self):
+        for replica in getattr(self, "replicas", []): replica.close()
+        if self.conn and self.conn.is_connected():
+            for statement in self._statements.values(): statement.close()
+            self._statements = {}
+            self.cursor.close()
+            self.conn.close()
+
+
+class BranchDBManager:
+    """Spreads the rental data over one DBManager per branch database.
+
+    Cars, units and transactions belong to the branch that stocks the car; their ids become "<branch>:<id>" so that
+    writes can be routed back to the owning branch. Users and messages live in the home branch (the first one).
+    Dashboard and catalog reads fan out to all branches at once and the results are merged, so a read costs as much as
+    the slowest branch rather than the sum of all of them.
+    """
+
+    SEARCH_KEYS = {"name": lambda car: car.name.lower(), "price_asc": lambda car: car.price_per_day,
+                   "price_desc": lambda car: -car.price_per_day, "units": lambda car: -car.available_units}
+
+    def __init__(self, branches, metrics=None):
+        if not branches: raise ValueError("At least one branch database is required.")
+        for name in branches:
+            if ":" in name: raise ValueError(f"Branch name '{name}' must not contain ':'.")
+        self.branches = dict(branches)
+        self.home = next(iter(self.branches.values()))
+        self.metrics = metrics or self.home.metrics
+        self._pool = ThreadPoolExecutor(max_workers=len(self.branches), thread_name_prefix="branch")
+
+    @classmethod
+    def from_config(cls, path, connect=True):
+        """Opens the branches listed in a JSON file: {"<branch>": {"host": ..., "database": ..., "backend": "mysql"}}.
+
+        ``backend`` may be "sqlite" to use the local SQLite stand-in; the other keys (including ``replicas``) are
+        DBManager arguments.
+        """
+        with open(path, encoding="utf-8") as fh:
+            config = json.load(fh)
+        metrics = QueryMetrics()
+        branches = {name: DBManager(metrics=metrics, connect=connect, **connection_options(options))
+                    for name, options in config.items()}
+        return cls(branches, metrics)
+
+    def clone(self):
+        return BranchDBManager({name: db.clone() for name, db in self.branches.items()}, self.metrics)
+
+    def __getattr__(self, name):
+        # Anything not branch-aware (e.g. connector, prepared) is answered by the home branch.
+        if "home" not in self.__dict__: raise AttributeError(name)
+        return getattr(self.home, name)
+
+    @staticmethod
+    def split_id(value):
+        branch, _, local_id = str(value).rpartition(":")
+        return branch, int(local_id)
+
+    def _owner(self, value):
+        branch, local_id = self.split_id(value)
+        if branch not in self.branches: raise KeyError(f"Unknown branch '{branch}'.")
+        return branch, self.branches[branch], local_id
+
+    def _fan_out(self, func):
+        """Runs ``func(db)`` on every branch concurrently; returns [(branch, result)] in branch order."""
+        futures = [(name, self._pool.submit(func, db)) for name, db in self.branches.items()]
+        return [(name, future.result()) for name, future in futures]
+
+    def _cars(self, branch, cars):
+        for car in cars: car.car_id = f"{branch}:{car.car_id}"
+        return cars
+
+    def register_user(self, name, email, password_hash): return self.home.register_user(name, email, password_hash)
+
+    def upsert_users(self, users, update_existing=False): return self.home.upsert_users(users, update_existing)
+
+    def login_user(self, email, password_hash): return self.home.login_user(email, password_hash)
+
+    def get_all_cars_data(self, only_available=False):
+        rows = []
+        for branch, cars in self._fan_out(lambda db: db.get_all_cars_data(only_available)):
+            rows += [dict(car, id=f"{branch}:{car['id']}", branch=branch) for car in cars]
+        return rows
+
+    def get_car_data(self, car_id):
+        branch, db, local_id = self._owner(car_id)
+        row = db.get_car_data(local_id)
+        return dict(row, id=car_id, branch=branch) if row else None
+
+    def get_cars_by_category(self, category_id, only_available=False):
+        results = self._fan_out(lambda db: db.get_cars_by_category(category_id, only_available))
+        return [car for branch, cars in results for car in self._cars(branch, cars)]
+
+    def search_cars(self, category_id=None, min_price=None, max_price=None, text="", sort="name", limit=20, offset=0):
+        """Merges the sorted result of every branch; each branch returns its first ``offset + limit`` matches."""
+        sort = sort if sort in self.SEARCH_KEYS else "name"
+        results = self._fan_out(lambda db: db.search_cars(category_id, min_price, max_price, text, sort,
+                                                          offset + limit, 0))
+        merged = heapq.merge(*(self._cars(branch, cars) for branch, (cars, _) in results), key=self.SEARCH_KEYS[sort])
+        return list(merged)[offset:offset + limit], sum(total for _, (_, total) in results)
+
+    def update_car_availability(self, car_id, is_available):
+        _, db, local_id = self._owner(car_id)
+        db.update_car_availability(local_id, is_available)
+
+    def add_units(self, car_id, plates, branch=None):
+        name, db, local_id = self._owner(car_id)
+        db.add_units(local_id, plates, branch or name)
+
+    def allocate_unit(self, car_id, rented_until, attempts=5):
+        branch, db, local_id = self._owner(car_id)
+        unit = db.allocate_unit(local_id, rented_until, attempts)
+        return dict(unit, id=f"{branch}:{unit['id']}") if unit else None
+
+    def release_unit(self, unit_id):
+        _, db, local_id = self._owner(unit_id)
+        db.release_unit(local_id)
+
+    def release_expired_units(self):
+        return sum(released for _, released in self._fan_out(lambda db: db.release_expired_units()))
+
+    def get_all_categories(self):
+        categories = {}
+        for _, rows in self._fan_out(lambda db: db.get_all_categories()):
+            for row in rows: categories.setdefault(row['id'], row)
+        return sorted(categories.values(), key=lambda row: row['id'])
+
+    def get_all_services(self): return self.home.get_all_services()
+
+    def get_pricing(self):
+        """Merges the cars and rules of all branches; each branch's rules only apply to its own cars."""
+        cars, rules = [], []
+        for branch, pricing in self._fan_out(lambda db: db.get_pricing()):
+            cars += [dict(car, id=f"{branch}:{car['id']}", branch=branch) for car in pricing["cars"]]
+            rules += [dict(rule, id=f"{branch}:{rule['id']}", branch=branch,
+                           car_id=f"{branch}:{rule['car_id']}" if rule['car_id'] is not None else None)
+                      for rule in pricing["rules"]]
+        return {"cars": cars, "rules": rules}
+
+    def delete_price_rule(self, name):
+        """Deletes the rule from every branch that has one by that name; True if any did."""
+        return any([deleted for _, deleted in self._fan_out(lambda db: db.delete_price_rule(name))])
+
+    def get_catalog_version(self):
+        return sum(version for _, version in self._fan_out(lambda db: db.get_catalog_version()))
+
+    def change_position(self):
+        return dict(self._fan_out(lambda db: db.change_position()))
+
+    def changes_since(self, position, limit=500):
+        """Polls every branch's change_log; ``position`` maps each branch to its own position."""
+        start = {id(db): position.get(branch, 0) for branch, db in self.branches.items()}
+        changes, position = [], dict(position)
+        for branch, (rows, position[branch]) in self._fan_out(lambda db: db.changes_since(start[id(db)], limit)):
+            # Messages live in the home branch and keep their plain ids; cars and transactions get the branch prefix.
+            changes += [dict(row, entity_id=f"{branch}:{row['entity_id']}") if row['entity'] in ("car", "transaction")
+                        else row for row in rows]
+        return changes, position
+
+    def save_transaction(self, txn, unit_id=None):
+        branch, db, _ = self._owner(txn.car.car_id)
+        local_unit = self._owner(unit_id)[2] if unit_id is not None else None
+        return f"{branch}:{db.save_transaction(txn, local_unit)}"
+
+    def save_message(self, name, email, message): return self.home.save_message(name, email, message)
+
+    def get_all_transactions(self, include_archive=False):
+        results = self._fan_out(lambda db: db.get_all_transactions(include_archive))
+        return TransactionBatch.concat([txns for _, txns in results], [branch for branch, _ in results]).newest_first()
+
+    def get_transactions_between(self, start, end, include_archive=False):
+        results = self._fan_out(lambda db: db.get_transactions_between(start, end, include_archive))
+        return TransactionBatch.concat([txns for _, txns in results], [branch for branch, _ in results])
+
+    def get_transaction(self, txn_id):
+        branch, db, local_id = self._owner(txn_id)
+        row = db.get_transaction(local_id)
+        return dict(row, branch=branch) if row else None
+
+    def iter_transactions(self, start=None, end=None, chunk_size=500, include_archive=False):
+        """Streams the transactions of each branch in turn; rows carry their ``branch``."""
+        for branch, db in self.branches.items():
+            for row in db.iter_transactions(start, end, chunk_size, include_archive): yield dict(row, branch=branch)
+
+    def get_all_messages(self, include_archive=False): return self.home.get_all_messages(include_archive)
+
+    def archive(self, before, batch_size=5000):
+        """Archives every branch; returns the (transactions, messages) archived in total."""
+        results = [moved for _, moved in self._fan_out(lambda db: db.archive(before, batch_size))]
+        return sum(t for t, _ in results), sum(m for _, m in results)
+
+    def refresh_demand_cube(self): return dict(self._fan_out(lambda db: db.refresh_demand_cube()))
+
+    def get_demand_cube(self):
+        # Categories are shared, so DemandCube adds up the branches' rows for the same cell.
+        return [row for _, rows in self._fan_out(lambda db: db.get_demand_cube()) for row in rows]
+
+    def keepalive(self): self._fan_out(lambda db: db.keepalive())
+
+    def fail_fast(self):
+        for db in self.branches.values(): db.fail_fast()
+
+    def ping(self): self._fan_out(lambda db: db.ping())
+
+    def end_read(self):
+        for db in self.branches.values(): db.end_read()
+
+    def close(self):
+        self._pool.shutdown()
+        for db in self.branches.values(): db.close()
+
+
+def open_database(connect=True):
+    """Returns the DBManager for this install: one database, or the branches listed in $RENTAL_BRANCHES.
+
+    $RENTAL_REPLICAS may name a JSON file listing read replicas of the single database. With ``connect`` off the
+    connections are opened by the first query instead (see DBManager).
+    """
+    config = os.environ.get("RENTAL_BRANCHES")
+    if config: return BranchDBManager.from_config(config, connect)
+    replicas = os.environ.get("RENTAL_REPLICAS")
+    if not replicas: return DBManager(connect=connect)
+    with open(replicas, encoding="utf-8") as fh:
+        return DBManager(replicas=json.load(fh), connect=connect)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""A small SQLite stand-in for ``mysql.connector``.
+
+It implements just enough of the mysql.connector interface (``connect``, ``Error``,
+dictionary cursors, ``%s`` placeholders, errno 1062 on duplicates) for ``DBManager``
+to run against a local SQLite file, e.g. ``DBManager(database="loadtest", connector=sqlite_standin)``.
+Each database name maps to ``<name>.sqlite3`` inside ``SQLITE_DIR`` (the current folder by default).
+"""
+import os
+import re
+import sqlite3
+import datetime
+import threading
+from decimal import Decimal
+from functools import lru_cache
+
+SQLITE_DIR = os.environ.get("RENTAL_SQLITE_DIR", ".")
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: datetime.date.fromisoformat(raw.decode()))
+
+
+def _decimal(raw):
+    value = Decimal(raw.decode())
+    cents = value.quantize(Decimal("0.01"))
+    return cents if cents == value else value  # keep DECIMAL(6, 3) and the like exact
+
+
+sqlite3.register_converter("DECIMAL", _decimal)
+
+
+def _datetime_part(part):
+    def extract(value):
+        if value is None: return None
+        moment = datetime.datetime.fromisoformat(str(value))
+        return moment.weekday() if part == "weekday" else getattr(moment, part)
+    return extract
+
+
+# MySQL date functions used by DBManager's queries; WEEKDAY is 0 for Monday, as in MySQL.
+_FUNCTIONS = {"HOUR": _datetime_part("hour"), "MONTH": _datetime_part("month"), "WEEKDAY": _datetime_part("weekday")}
+
+
+class Error(Exception):
+    def __init__(self, msg=None, errno=None):
+        super().__init__(msg)
+        self.msg, self.errno = msg, errno
+
+    def __str__(self):
+        return f"{self.errno} {self.msg}" if self.errno else str(self.msg)
+
+
+class InterfaceError(Error): pass
+
+
+class DatabaseError(Error): pass
+
+
+class IntegrityError(DatabaseError): pass
+
+
+class OperationalError(DatabaseError): pass
+
+
+class ProgrammingError(DatabaseError): pass
+
+
+_REWRITES = [
+    (re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bBIGINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bNOW\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"%s"), "?"),
+]
+_SKIPPED = re.compile(r"^\s*(CREATE\s+DATABASE|USE\s)", re.I)
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+_INLINE_INDEX = re.compile(r",\s*(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)", re.I)
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """Rewrites the MySQL dialect used by DBManager into SQLite."""
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+@lru_cache(maxsize=64)
+def statements(sql):
+    """Translates ``sql``, moving inline INDEX clauses of a CREATE TABLE into separate CREATE INDEX statements."""
+    sql = translate(sql)
+    table = _CREATE_TABLE.match(sql)
+    if not table: return (sql,)
+    indexes = [f"CREATE {unique or ''}INDEX IF NOT EXISTS {name} ON {table.group(1)} ({columns})"
+               for unique, name, columns in _INLINE_INDEX.findall(sql)]
+    return (_INLINE_INDEX.sub("", sql), *indexes)
+
+
+def _wrap(err):
+    text = str(err)
+    if isinstance(err, sqlite3.IntegrityError):
+        return IntegrityError(f"Duplicate entry: {text}" if "UNIQUE" in text else text,
+                              1062 if "UNIQUE" in text else 1452)
+    if isinstance(err, sqlite3.OperationalError):
+        if "already exists" in text and "index" in text: return OperationalError(text, 1061)
+        if "duplicate column" in text: return OperationalError(text, 1060)
+        return OperationalError(text, 1205 if "locked" in text else 1064)
+    if isinstance(err, sqlite3.ProgrammingError):
+        return ProgrammingError(text, 2055)
+    return DatabaseError(text)
+
+
+class Cursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection, self._dictionary = connection, dictionary
+        try:
+            self._cursor = connection._raw.cursor()
+        except sqlite3.Error as err:
+            raise _wrap(err) from err
+
+    @property
+    def rowcount(self): return self._cursor.rowcount
+
+    @property
+    def lastrowid(self): return self._cursor.lastrowid
+
+    @property
+    def description(self): return self._cursor.description
+
+    @property
+    def with_rows(self): return self._cursor.description is not None
+
+    def _row(self, row):
+        if row is None or not self._dictionary: return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def execute(self, sql, params=()):
+        if _SKIPPED.match(sql): return
+        try:
+            with self._connection._lock:
+                for statement in statements(sql):
+                    self._cursor.execute(statement, tuple(params or ()))
+        except sqlite3.Error as err:
+            raise _wrap(err) from err
+
+    def executemany(self, sql, seq_params):
+        try:
+            with self._connection._lock:
+                self._cursor.executemany(translate(sql), [tuple(p) for p in seq_params])
+        except sqlite3.Error as err:
+            raise _wrap(err) from err
+
+    def fetchone(self): return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1): return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self): return [self._row(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self): return (self._row(r) for r in self._cursor)
+
+    def close(self): self._cursor.close()
+
+
+class Connection:
+    def __init__(self, database=None, timeout=30):
+        if database:
+            path = database if database.endswith((".sqlite3", ".db")) else os.path.join(SQLITE_DIR,
+                                                                                         f"{database}.sqlite3")
+        else:
+            path = ":memory:"
+        self.database, self._lock = database, threading.RLock()
+        try:
+            self._raw = sqlite3.connect(path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                                        check_same_thread=False)
+        except sqlite3.Error as err:
+            raise InterfaceError(str(err), 2003) from err
+        if database: self._raw.execute("PRAGMA journal_mode=WAL")
+        for name, function in _FUNCTIONS.items(): self._raw.create_function(name, 1, function, deterministic=True)
+        self._open = True
+
+    def cursor(self, dictionary=False, prepared=False, buffered=None, **_):
+        return Cursor(self, dictionary)
+
+    def start_transaction(self, **_):
+        with self._lock:
+            if not self._raw.in_transaction: self._raw.execute("BEGIN")
+
+    @property
+    def in_transaction(self): return self._raw.in_transaction
+
+    def commit(self):
+        with self._lock:
+            self._raw.commit()
+
+    def rollback(self):
+        with self._lock:
+            self._raw.rollback()
+
+    def is_connected(self): return self._open
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self._open: raise InterfaceError("Connection is closed", 2013)
+
+    def close(self):
+        if self._open:
+            self._raw.close()
+            self._open = False
+
+
+def connect(host=None, user=None, password=None, database=None, **kwargs):
+    return Connection(database, kwargs.get("connection_timeout", 30))
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Puts the app folder on sys.path and loads the application script, for the tools that need its widgets."""
+import os
+import sys
+import importlib.util
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, "Car Rentals and Services.py")
+
+# The app's Qt-free modules (rental_db, rental, receipts, sqlite_standin, ...) live next to the script.
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def load_app():
+    if "rental_app" in sys.modules:
+        return sys.modules["rental_app"]
+    spec = importlib.util.spec_from_file_location("rental_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["rental_app"] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Common admin tasks from the command line, without starting the GUI.
+
+Only the Qt-free data and domain modules (rental_db, rental) are loaded, and pandas only for the
+reports that need it, so each command starts in a fraction of the time the app takes.
+
+Usage:
+    python tools/admin.py sales --from 2026-09-01 --to 2026-10-01
+    python tools/admin.py export transactions.csv --from 2026-01-01
+    python tools/admin.py cars --unavailable
+    python tools/admin.py availability off "Toyota Innova (MPV)" 42
+    python tools/admin.py release-expired
+    python tools/admin.py messages --limit 10
+    python tools/admin.py utilization --from 2026-01-01 --to 2026-06-30 --by category
+    python tools/admin.py demand --measure revenue --season Jul-Sep
+    python tools/admin.py archive --older-than 365
+
+Connects like the other tools (see --help); ``--branches`` defaults to $RENTAL_BRANCHES. The reports read
+only the transactions and messages that are not archived unless given --include-archive.
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+
+import numpy as np
+
+import datagen
+from rental import format_peso, RentalManager
+
+
+def parse_date(text):
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got '{text}'")
+
+
+def sales(db, args):
+    txns = db.get_all_transactions(args.include_archive)
+    stamps, keep = txns.columns["timestamp"], np.ones(len(txns), bool)
+    if args.start: keep &= stamps >= np.datetime64(args.start)
+    if args.end: keep &= stamps < np.datetime64(args.end)
+    txns = txns.take(keep)
+    print(f"{len(txns):,} rentals, {format_peso(txns.total())} revenue")
+    codes = txns.columns["car_model"]
+    known = codes >= 0
+    counts = np.bincount(codes[known], minlength=len(txns.values["car_model"]))
+    cents = np.bincount(codes[known], weights=txns.columns["final_total"][known], minlength=len(counts))
+    for code in np.argsort(-counts, kind="stable")[:args.top].tolist():
+        if not counts[code]: break
+        print(f"  {txns.values['car_model'][code]:<40} {counts[code]:>8,} rentals {format_peso(cents[code] / 100):>18}")
+
+
+def export(db, args):
+    """Streams the transactions into a CSV file, so the export never holds them all in memory."""
+    out = sys.stdout if args.file == "-" else open(args.file, "w", newline="", encoding="utf-8")
+    rows, writer = 0, None
+    try:
+        for row in db.iter_transactions(args.start, args.end, include_archive=args.include_archive):
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            rows += 1
+    finally:
+        if out is not sys.stdout: out.close()
+    if out is not sys.stdout: print(f"Exported {rows:,} transactions to {args.file}")
+
+
+def cars(db, args):
+    rows = [car for car in db.get_all_cars_data()
+            if (not args.unavailable or not car['is_available']) and args.search.lower() in car['name'].lower()]
+    for car in rows:
+        status = "available" if car['is_available'] else "UNAVAILABLE"
+        print(f"{car['id']:>8}  {car['name']:<40} {format_peso(car['price_per_day']):>14}/day  {status:<11}  "
+              f"{int(car['available_units'])}/{int(car['total_units'])} units free")
+    print(f"{len(rows):,} car model(s)")
+
+
+def availability(db, args):
+    ids = {str(car['id']): car['id'] for car in db.get_all_cars_data()}
+    names = {car['name']: car['id'] for car in db.get_all_cars_data()}
+    missing = [car for car in args.cars if car not in ids and car not in names]
+    if missing: sys.exit(f"No car named or numbered: {', '.join(missing)}")
+    car_ids = [ids.get(car, names.get(car)) for car in args.cars]
+    RentalManager(db).update_cars_availability(car_ids, args.state == "on")
+    print(f"Marked {len(car_ids)} car model(s) {'available' if args.state == 'on' else 'unavailable'}.")
+
+
+def release_expired(db, args):
+    released = RentalManager(db).r_sys.release_expired_units()
+    print(f"Released {released or 0:,} unit(s) whose rental ended.")
+
+
+def messages(db, args):
+    rows = db.get_all_messages(args.include_archive)
+    for row in rows[:args.limit]:
+        print(f"{row['timestamp']}  {row['user_name']} <{row['user_email']}>\n    {row['message_text']}")
+    print(f"{min(len(rows), args.limit):,} of {len(rows):,} message(s)")
+
+
+def utilization(db, args):
+    from utilization import fetch_utilization_report  # pandas is only loaded for the reports
+    report = fetch_utilization_report(db, args.start.date(), args.end.date(), args.period,
+                                      args.include_archive)
+    frame = {"car": report.by_car, "category": report.by_category, "period": report.by_period}[args.by]
+    if args.by != "period": frame = frame.sort_values("utilization", ascending=False)
+    print(frame.to_string(formatters={"utilization": "{:.1%}".format}))
+    if report.unmatched: print(f"({report.unmatched:,} transactions matched no car in the fleet)")
+
+
+def demand(db, args):
+    from demand import fetch_demand_cube, MEASURES, SEASONS, WEEKDAYS
+    cube, months = fetch_demand_cube(db), SEASONS[args.season]
+    totals = cube.totals(args.measure, months)
+    print(f"{MEASURES[args.measure]}, {args.season}:")
+    for category_id in sorted(totals, key=totals.get, reverse=True):
+        grid = cube.heatmap(args.measure, category_id, months)
+        weekday, hour = divmod(int(grid.argmax()), 24)
+        busiest = f"busiest {WEEKDAYS[weekday]} {hour:02d}:00" if grid.any() else ""
+        print(f"  {cube.names[category_id]:<30} {totals[category_id]:>16,.2f}  {busiest}")
+
+
+def archive(db, args):
+    """Moves old transactions and messages into the archive tables; meant to run nightly, e.g. from cron."""
+    before = datetime.datetime.now() - datetime.timedelta(days=args.older_than)
+    transactions, messages = db.archive(before, args.batch_size)
+    print(f"Archived {transactions:,} transaction(s) and {messages:,} message(s) from before {before:%Y-%m-%d}.")
+
+
+COMMANDS = {"sales": sales, "export": export, "cars": cars, "availability": availability,
+            "release-expired": release_expired, "messages": messages, "utilization": utilization, "demand": demand,
+            "archive": archive}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_final")
+    parser.set_defaults(branches=os.environ.get("RENTAL_BRANCHES"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("sales", help="rentals and revenue, with the most rented models")
+    command.add_argument("--from", dest="start", type=parse_date, help="first day, YYYY-MM-DD")
+    command.add_argument("--to", dest="end", type=parse_date, help="day after the last, YYYY-MM-DD")
+    command.add_argument("--top", type=int, default=10, help="number of models to list (default 10)")
+    command.add_argument("--include-archive", action="store_true", help="also count archived transactions")
+    command = commands.add_parser("export", help="write the transactions to a CSV file ('-' for stdout)")
+    command.add_argument("file")
+    command.add_argument("--from", dest="start", type=parse_date, help="first day, YYYY-MM-DD")
+    command.add_argument("--to", dest="end", type=parse_date, help="day after the last, YYYY-MM-DD")
+    command.add_argument("--include-archive", action="store_true", help="also export archived transactions")
+    command = commands.add_parser("cars", help="list the car models with their free units")
+    command.add_argument("--unavailable", action="store_true", help="only the models marked unavailable")
+    command.add_argument("--search", default="", help="only models whose name contains this text")
+    command = commands.add_parser("availability", help="mark car models available or unavailable")
+    command.add_argument("state", choices=["on", "off"])
+    command.add_argument("cars", nargs="+", metavar="CAR", help="car model name or id")
+    commands.add_parser("release-expired", help="free the units whose rental has ended")
+    command = commands.add_parser("messages", help="show the latest customer messages")
+    command.add_argument("--limit", type=int, default=20)
+    command.add_argument("--include-archive", action="store_true", help="also show archived messages")
+    command = commands.add_parser("utilization", help="fleet utilization over a date range")
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    command.add_argument("--from", dest="start", type=parse_date, default=today - datetime.timedelta(days=89),
+                         help="first day, YYYY-MM-DD (default 90 days ago)")
+    command.add_argument("--to", dest="end", type=parse_date, default=today, help="last day, YYYY-MM-DD (default today)")
+    command.add_argument("--period", choices=["D", "W", "M"], default="M")
+    command.add_argument("--by", choices=["car", "category", "period"], default="category")
+    command.add_argument("--include-archive", action="store_true", help="also count archived transactions")
+    command = commands.add_parser("demand", help="booking demand per category, from the demand cube")
+    command.add_argument("--measure", choices=["bookings", "rental_days", "revenue"], default="bookings")
+    command.add_argument("--season", choices=["All Year", "Jan-Mar", "Apr-Jun", "Jul-Sep", "Oct-Dec"],
+                         default="All Year")
+    command = commands.add_parser("archive", help="move old transactions and messages into the archive tables")
+    command.add_argument("--older-than", type=int, metavar="DAYS",
+                         default=int(os.environ.get("RENTAL_ARCHIVE_DAYS", 365)),
+                         help="archive what is older than this many days (default $RENTAL_ARCHIVE_DAYS or 365)")
+    command.add_argument("--batch-size", type=int, default=5000, help="rows moved per transaction")
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        COMMANDS[args.command](db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
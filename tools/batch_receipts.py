@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Reissues booking receipts as HTML or PDF files, one per transaction.
+
+Transactions are streamed from the database in chunks and rendered by a pool of worker
+processes, so a month of bookings never has to fit in memory and the app keeps running.
+
+Usage:
+    python tools/batch_receipts.py --id 1042 --format pdf
+    python tools/batch_receipts.py --id Makati:1042 --branches branches.json
+    python tools/batch_receipts.py --month 2026-09 --out receipts/2026-09
+    python tools/batch_receipts.py --from 2026-01-01 --to 2026-04-01 --workers 8
+"""
+import argparse
+import datetime
+import os
+import sys
+
+import datagen
+import receipts  # importing datagen puts the app folder on sys.path
+
+
+def parse_month(text):
+    try:
+        start = datetime.datetime.strptime(text, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got '{text}'")
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def parse_id(text):
+    """A transaction id: a number, or "<branch>:<number>" as BranchDBManager numbers them."""
+    branch, _, number = text.rpartition(":")
+    if not number.isdigit() or (_ and not branch):
+        raise argparse.ArgumentTypeError(f"expected a number or <branch>:<number>, got '{text}'")
+    return text if branch else int(number)
+
+
+def parse_date(text):
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got '{text}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_final")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--id", type=parse_id, action="append",
+                           help="transaction id, <branch>:<id> with --branches (repeatable)")
+    selection.add_argument("--month", type=parse_month, help="all transactions of a month, YYYY-MM")
+    selection.add_argument("--from", dest="start", type=parse_date, help="first day, YYYY-MM-DD (use with --to)")
+    parser.add_argument("--to", dest="end", type=parse_date, help="day after the last one, YYYY-MM-DD")
+    parser.add_argument("--format", choices=["html", "pdf"], default="html")
+    parser.add_argument("--out", default="receipts", help="output folder (default ./receipts)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows fetched from the database at a time")
+    parser.add_argument("--include-archive", action="store_true", help="also reissue archived transactions")
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        if args.id:
+            rows = []
+            for txn_id in args.id:
+                try:
+                    row = db.get_transaction(txn_id)
+                except (KeyError, ValueError):  # no such branch, or a plain id where branches need <branch>:<id>
+                    row = None
+                if row is None:
+                    print(f"Transaction {txn_id} not found.", file=sys.stderr)
+                else:
+                    rows.append(row)
+            os.makedirs(args.out, exist_ok=True)
+            for row in rows: print(receipts.write_receipt(row, args.out, args.format))
+            return
+        start, end = args.month or (args.start, args.end)
+        progress = lambda done: print(f"\r{done:,} receipts", end="", flush=True)
+        rows = db.iter_transactions(start, end, args.chunk_size, args.include_archive)
+        count, seconds = receipts.generate_batch(rows, args.out, args.format, args.workers, on_progress=progress)
+        print(f"\rWrote {count:,} {args.format.upper()} receipts to {args.out} in {seconds:.1f}s "
+              f"({count / seconds if seconds else 0:.0f}/s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
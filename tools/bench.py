@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Times the start-up, the data layer, the rental flows and the heavy widgets against a seeded database.
+
+Usage:
+    python tools/bench.py --seed-data --cars 10000 --users 100000 --transactions 1000000 --messages 200000
+    python tools/bench.py --output after.json --compare before.json
+    python tools/bench.py --no-prepared --output plain.json && python tools/bench.py --compare plain.json
+
+Results are saved as JSON so two runs (e.g. before and after a change) can be compared.
+Widgets are rendered with the offscreen Qt platform, so no display is needed.
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import datagen
+from _app import APP_DIR, load_app
+from db_metrics import QueryMetrics
+from rental import Car, Transaction, RentalManager
+from user_import import hash_password
+from utilization import fetch_utilization_report
+from demand import fetch_demand_cube
+
+
+class Bench:
+    def __init__(self, repeat, log=print):
+        self.repeat, self.log = repeat, log
+        self.results = {}
+
+    def time(self, name, func, repeat=None, setup=None):
+        runs, rows = [], None
+        for _ in range(repeat or self.repeat):
+            if setup: setup()
+            started = time.perf_counter()
+            result = func()
+            runs.append(time.perf_counter() - started)
+            if rows is None and isinstance(result, (list, tuple)): rows = len(result)
+        self.results[name] = {"runs": len(runs), "min": min(runs), "median": statistics.median(runs),
+                              "mean": statistics.fmean(runs), "max": max(runs), "rows": rows}
+        self.log(f"{name:<55} median {statistics.median(runs) * 1000:10.2f} ms"
+                 + (f"  ({rows:,} rows)" if rows is not None else ""))
+        return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Each start-up is a fresh interpreter, so module caches of this process do not hide the import cost.
+STARTUP = {
+    "startup: import rental_db, rental": ["-c", "import rental_db, rental"],
+    "startup: tools/admin.py --help": [os.path.join("tools", "admin.py"), "--help"],
+    "startup: import the app script": ["-c", "import sys; sys.path.insert(0, 'tools'); import _app; _app.load_app()"],
+}
+
+
+def bench_startup(bench):
+    for name, argv in STARTUP.items():
+        bench.time(name, lambda: subprocess.run([sys.executable, *argv], cwd=APP_DIR, check=True,
+                                                stdout=subprocess.DEVNULL))
+
+
+def bench_db(bench, db):
+    stamp = int(time.time() * 1000)
+    counter = iter(range(10 ** 9))
+    cars = db.get_all_cars_data()
+    car_id = max(cars, key=lambda c: c['available_units'])['id'] if cars else 1
+    categories = db.get_all_categories()
+    category_id = categories[-1]['id'] if categories else '1'
+    txn = Transaction(user={"name": "Bench", "email": "bench0@user.com"},
+                          car=Car("Toyota Innova (MPV)", 3200, car_id=car_id),
+                      duration=3, services=[{"name": "Insurance and Waivers", "cost": 1500.0}],
+                      final_total=11100.0)
+
+    bench.time("DBManager.register_user",
+               lambda: db.register_user("Bench User", f"bench-{stamp}-{next(counter)}@user.com", "x"))
+    bench.time("DBManager.login_user", lambda: db.login_user("test@user.com", hash_password("password")))
+    bench.time("DBManager.get_all_cars_data", db.get_all_cars_data)
+    bench.time("DBManager.get_all_cars_data(only_available)", lambda: db.get_all_cars_data(only_available=True))
+    bench.time("DBManager.get_cars_by_category", lambda: db.get_cars_by_category(category_id, only_available=True))
+    bench.time("DBManager.search_cars", lambda: db.search_cars(limit=20)[0])
+    bench.time("DBManager.search_cars(category, price, sort)",
+               lambda: db.search_cars(category_id=category_id, min_price=2000, max_price=6000, sort="price_desc")[0])
+    bench.time("DBManager.search_cars(text, last page)", lambda: db.search_cars(text="Toyota", offset=1000)[0])
+    bench.time("DBManager.update_car_availability", lambda: db.update_car_availability(car_id, True))
+    units, rented_until = [], datetime.datetime.now() + datetime.timedelta(days=1)
+    bench.time("DBManager.allocate_unit", lambda: units.append(db.allocate_unit(car_id, rented_until)))
+    units = [u for u in units if u]
+    bench.time("DBManager.release_unit", lambda: db.release_unit(units.pop()['id']), repeat=len(units) or None)
+    bench.time("DBManager.release_expired_units", db.release_expired_units)
+    bench.time("DBManager.get_all_categories", db.get_all_categories)
+    bench.time("DBManager.get_all_services", db.get_all_services)
+    bench.time("DBManager.save_transaction", lambda: db.save_transaction(txn))
+    bench.time("DBManager.save_message", lambda: db.save_message("Bench", "bench0@user.com", "Benchmark message"))
+    bench.time("DBManager.get_all_transactions", db.get_all_transactions)
+    bench.time("DBManager.get_all_messages", db.get_all_messages)
+    bench.time("DBManager.refresh_demand_cube", db.refresh_demand_cube)
+    bench.time("fetch_demand_cube", lambda: fetch_demand_cube(db))
+    today = datetime.date.today()
+    bench.time("fetch_utilization_report(1 year, weekly)",
+               lambda: fetch_utilization_report(db, today - datetime.timedelta(days=364), today, "W").by_car)
+
+
+def bench_manager(bench, db):
+    stamp = int(time.time() * 1000)
+    counter = iter(range(10 ** 9))
+    manager = RentalManager(db)
+    cars = itertools.cycle([car for cat in manager.r_sys.get_categories() for car in manager.r_sys.get_cars(cat['id'])]
+                           or [Car("Toyota Innova (MPV)", 3200)])
+    booked = []
+
+    def book():
+        car = next(cars)
+        booked.append(manager.record_transaction({"car": car, "duration": 2, "services": [],
+                                                  "final_total": car.price_per_day * 2}))
+
+    bench.time("RentalManager.register",
+               lambda: manager.register("Bench User", f"flow-{stamp}-{next(counter)}@user.com", "password"))
+    bench.time("RentalManager.login", lambda: manager.login("test@user.com", "password"))
+    bench.time("RentalSystem.get_categories", manager.r_sys.get_categories)
+    bench.time("RentalSystem.get_services", manager.r_sys.get_services)
+    bench.time("RentalManager.record_transaction", book)
+    for unit in filter(None, booked): db.release_unit(unit['id'])
+    bench.time("RentalManager.save_message", lambda: manager.save_message("Bench", "bench0@user.com", "Hello"))
+    bench.time("RentalManager.get_all_cars_for_admin", manager.get_all_cars_for_admin)
+    bench.time("RentalManager.get_all_transactions", manager.get_all_transactions)
+    bench.time("RentalManager.get_all_messages", manager.get_all_messages)
+
+
+def bench_widgets(bench, app, db):
+    import matplotlib
+    matplotlib.use("Agg")
+    qt_app = app.QApplication.instance() or app.QApplication(sys.argv)
+    manager = app.RentalManager(db)
+    manager.login("test@user.com", "password")
+
+    def settle(result=None):
+        qt_app.processEvents()
+        return result
+
+    vehicle_list = bench.time("VehicleListWidget.__init__", lambda: settle(app.VehicleListWidget(manager)), repeat=1)
+    bench.time("VehicleListWidget.update_car_list", lambda: settle(vehicle_list.update_car_list()))
+    vehicle_list.search_in.setText("Toyota")
+    bench.time("VehicleListWidget.apply_filters", lambda: settle(vehicle_list.apply_filters()))
+
+    dashboard = app.AdminDashboardWidget(manager)
+    dashboard.resize(950, 700)
+    sales = app.fetch_sales_report(db)
+    bench.time("AdminDashboardWidget.populate_sales_report", lambda: settle(dashboard.populate_sales_report(sales)))
+    bench.time("AdminDashboardWidget.generate_chart", dashboard.generate_chart)
+    bench.time("AdminDashboardWidget.populate_availability_table",
+               lambda: settle(dashboard.populate_availability_table()))
+    bench.time("AdminDashboardWidget.populate_message_table", lambda: settle(dashboard.populate_message_table()))
+
+
+def compare(current, baseline_path, log=print):
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)["results"]
+    log(f"\n{'benchmark':<55} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current.items():
+        if name not in baseline: continue
+        before, after = baseline[name]["median"], result["median"]
+        change = (after - before) / before * 100 if before else 0.0
+        log(f"{name:<55} {before * 1000:8.2f}ms {after * 1000:8.2f}ms {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument("--seed-data", action="store_true", help="empty and re-seed the benchmark database first")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-widgets", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true", help="do not time the start-up of the app and CLI")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="print the change against an earlier run")
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        volumes = datagen.volumes_from_args(args)
+        if args.seed_data:
+            datagen.reset(db)
+            db._insert_initial_data()
+            datagen.seed(db, volumes, args.seed, args.chunk_size, units_per_car=args.units_per_car)
+        db.metrics = QueryMetrics()
+
+        bench = Bench(args.repeat)
+        if not args.skip_startup: bench_startup(bench)
+        bench_db(bench, db)
+        bench_manager(bench, db)
+        if not args.skip_widgets: bench_widgets(bench, load_app(), db)
+    finally:
+        db.close()
+
+    report = {"meta": {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "revision": _git_revision(), "python": platform.python_version(),
+                       "platform": platform.platform(), "database": args.database,
+                       "volumes": volumes if args.seed_data else None, "repeat": args.repeat,
+                       "prepared": not args.no_prepared},
+              "results": bench.results, "queries": db.metrics.snapshot()}
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nSaved {len(bench.results)} results to {args.output}")
+
+    if args.compare: compare(bench.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
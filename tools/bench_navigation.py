@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Repeats the vehicle list and receipt screens thousands of times and checks that memory stays flat.
+
+Each navigation reloads the vehicle list, turns a page and fills in a receipt with a different
+number of add-ons, like a desk taking bookings all day. Every block of navigations reports its
+latency, the Python memory in use (tracemalloc), the process RSS and the number of Qt objects
+under the two screens. With the rows reused these stay flat; the run fails if they grow.
+
+Usage:
+    python tools/bench_navigation.py --backend sqlite --navigations 5000
+    python tools/bench_navigation.py --navigations 2000 --block 250 --max-growth-kb 256
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("QT_LOGGING_RULES", "qt.qpa.*=false")  # the offscreen platform warns on every show()
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+
+import datagen
+from _app import load_app
+from rental import RentalManager
+from PyQt6.QtCore import QEvent, QObject
+
+
+def rss_bytes():
+    """Current resident set size; 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def run(app, db, navigations, block, log=print):
+    """Navigates ``navigations`` times; returns one dict of measurements per ``block`` navigations."""
+    qt_app = app.QApplication.instance() or app.QApplication(sys.argv)
+    manager = RentalManager(db)
+    manager.login("test@user.com", "password")
+    vehicle_list, receipt = app.VehicleListWidget(manager), app.ReceiptWidget()
+    vehicle_list.show();
+    receipt.show()
+    services = [{"name": svc['name'], "cost": svc['price']} for svc in manager.r_sys.get_services()]
+
+    def settle():
+        qt_app.processEvents()
+        qt_app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)  # free what deleteLater released
+
+    def navigate(n):
+        vehicle_list.update_car_list()
+        if vehicle_list.next_btn.isEnabled(): vehicle_list.change_page(1)
+        else: vehicle_list.apply_filters()  # back to the first page
+        car = vehicle_list.car_checkboxes[0].property("car_object") if vehicle_list.car_checkboxes else None
+        if car is None: return
+        picked = services[:n % (len(services) + 1)]
+        receipt.update_receipt("Test User", {"car": car, "duration": n % 7 + 1, "base_total": car.price_per_day,
+                                             "services": picked, "final_total": car.price_per_day,
+                                             "unit": {"plate": "RGD 001-1", "branch": "Main"}})
+        settle()
+
+    for n in range(block): navigate(n)  # warm up: caches, fonts and the rows themselves
+    tracemalloc.start()
+    blocks = []
+    log(f"{'navigations':>11} {'median ms':>10} {'p95 ms':>8} {'python KB':>10} {'RSS MB':>8} {'Qt objects':>11}")
+    for start in range(0, navigations, block):
+        times = []
+        for n in range(start, min(start + block, navigations)):
+            started = time.perf_counter()
+            navigate(n)
+            times.append(time.perf_counter() - started)
+        times.sort()
+        result = {"navigations": start + len(times), "median_ms": statistics.median(times) * 1000,
+                  "p95_ms": times[int(len(times) * 0.95)] * 1000,
+                  "python_kb": tracemalloc.get_traced_memory()[0] / 1024, "rss_mb": rss_bytes() / 2 ** 20,
+                  "qt_objects": len(vehicle_list.findChildren(QObject)) + len(receipt.findChildren(QObject))}
+        blocks.append(result)
+        log(f"{result['navigations']:>11,} {result['median_ms']:>10.2f} {result['p95_ms']:>8.2f} "
+            f"{result['python_kb']:>10.0f} {result['rss_mb']:>8.1f} {result['qt_objects']:>11,}")
+    tracemalloc.stop()
+    vehicle_list.close();
+    receipt.close()
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_connection_arguments(parser)
+    parser.add_argument("--navigations", type=int, default=5000)
+    parser.add_argument("--block", type=int, default=500, help="navigations per reported block (default 500)")
+    parser.add_argument("--max-growth-kb", type=float, default=512,
+                        help="fail if Python memory grows more than this from the first block to the last")
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        blocks = run(load_app(), db, args.navigations, args.block)
+    finally:
+        db.close()
+    first, last = blocks[0], blocks[-1]
+    growth_kb, objects = last["python_kb"] - first["python_kb"], last["qt_objects"] - first["qt_objects"]
+    print(f"\nFrom the first block to the last: Python memory {growth_kb:+.0f} KB, RSS "
+          f"{last['rss_mb'] - first['rss_mb']:+.1f} MB, Qt objects {objects:+,}, median latency "
+          f"{first['median_ms']:.2f} -> {last['median_ms']:.2f} ms")
+    if growth_kb > args.max_growth_kb or objects > 0:
+        sys.exit("Memory is not flat: the screens keep allocating across navigations.")
+
+
+if __name__ == "__main__":
+    main()
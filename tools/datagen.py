@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Seeds a database with synthetic rental data for benchmarking.
+
+Usage:
+    python tools/datagen.py --cars 10000 --users 100000 --transactions 1000000 --messages 200000
+
+The data goes into its own database (``car_rental_db_bench`` by default) so the
+real rental data is never touched.
+"""
+import argparse
+import datetime
+import random
+import time
+
+import _app  # noqa: F401 -- puts the app folder (rental_db, rental, ...) on sys.path
+from rental_db import DBManager, BranchDBManager
+from user_import import hash_password
+
+BRANDS = ["Toyota", "Mitsubishi", "Nissan", "Ford", "Hyundai", "Honda", "Mazda", "BMW", "Kia", "Suzuki",
+          "Isuzu", "Chevrolet", "Subaru", "Lexus", "Mercedes-Benz", "Volkswagen"]
+BODIES = ["Sedan", "Hatchback", "SUV", "MPV", "Van", "Pickup", "Coupe", "Crossover"]
+FIRST_NAMES = ["Juan", "Maria", "Jose", "Ana", "Mark", "Grace", "Paolo", "Kristine", "Miguel", "Andrea", "Carlo",
+               "Bea", "Rafael", "Camille", "Luis", "Patricia"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Ramos", "Aquino", "Villanueva",
+              "Castillo", "Ragadio", "Dela Cruz", "Navarro", "Torres"]
+BRANCHES = ["Main", "Makati", "Cebu", "Davao"]
+MESSAGES = ["Can I extend my rental by two days?", "Is the RFID pass already loaded?",
+            "Do you offer airport pick-up?", "I left my umbrella in the car, please check.",
+            "What documents do I need for the booking?", "Can I change the car model I reserved?"]
+
+DEFAULT_VOLUMES = {"categories": 20, "cars": 10000, "users": 100000, "transactions": 1000000, "messages": 200000}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(db, sql, rows, chunk_size):
+    count = 0
+    for chunk in _chunks(rows, chunk_size):
+        db.cursor.executemany(sql, chunk)
+        db.conn.commit()
+        count += len(chunk)
+    return count
+
+
+def _car_name(index, rng):
+    return f"{rng.choice(BRANDS)} {rng.choice(BODIES)} #{index:06d}"
+
+
+def seed(db, volumes, seed_value=42, chunk_size=5000, days_back=730, units_per_car=3, log=print):
+    """Fills ``db`` with the requested number of synthetic rows per table and returns timings."""
+    rng = random.Random(seed_value)
+    timings = {}
+
+    started = time.perf_counter()
+    categories = [(f"B{i}", f"Bench Category {i}") for i in range(1, volumes["categories"] + 1)]
+    _insert(db, "INSERT IGNORE INTO categories (id, name) VALUES (%s, %s)", categories, chunk_size)
+    timings["categories"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cars = [(categories[i % len(categories)][0], _car_name(i, rng), float(rng.randrange(1200, 9000, 50)),
+             rng.random() > 0.1) for i in range(volumes["cars"])]
+    _insert(db, "INSERT IGNORE INTO cars (category_id, name, price_per_day, is_available) VALUES (%s, %s, %s, %s)",
+            cars, chunk_size)
+    timings["cars"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db.cursor.execute("SELECT id FROM cars WHERE category_id LIKE 'B%' ORDER BY id")
+    car_ids = [row['id'] for row in db.cursor.fetchall()]
+    units = ((car_id, f"B{car_id:06d}-{n}", BRANCHES[(car_id + n) % len(BRANCHES)]) for car_id in car_ids
+             for n in range(1, units_per_car + 1))
+    _insert(db, "INSERT IGNORE INTO vehicle_units (car_id, plate, branch) VALUES (%s, %s, %s)", units, chunk_size)
+    timings["units"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    password_hash = hash_password("password")
+    users = ((f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"bench{i}@user.com", password_hash)
+             for i in range(volumes["users"]))
+    _insert(db, "INSERT IGNORE INTO users (name, email, password_hash) VALUES (%s, %s, %s)", users, chunk_size)
+    timings["users"] = time.perf_counter() - started
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    car_models = [(c[1], c[2]) for c in cars] or [("Toyota Innova (MPV)", 3200.00)]
+    services = [("Insurance and Waivers", 1500.00), ("RFID Pass (Toll Fees)", 750.00)]
+
+    def transaction_rows():
+        for i in range(volumes["transactions"]):
+            model, price = rng.choice(car_models)
+            duration = rng.randint(1, 14)
+            picked = [s for s in services if rng.random() < 0.4]
+            services_text = ", ".join(f"{name} (₱{cost:,.2f})" for name, cost in picked)
+            total = price * duration + sum(cost for _, cost in picked)
+            timestamp = now - datetime.timedelta(seconds=rng.randrange(days_back * 86400))
+            yield (timestamp, f"Bench User {i % 1000}", f"bench{i % max(volumes['users'], 1)}@user.com", model,
+                   duration, services_text, total, timestamp.date())
+
+    started = time.perf_counter()
+    _insert(db, "INSERT INTO transactions (timestamp, user_name, user_email, car_model, duration, services_used, "
+                "final_total, start_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", transaction_rows(), chunk_size)
+    timings["transactions"] = time.perf_counter() - started
+
+    def message_rows():
+        for i in range(volumes["messages"]):
+            timestamp = now - datetime.timedelta(seconds=rng.randrange(days_back * 86400))
+            yield timestamp, f"Bench User {i % 1000}", f"bench{i % max(volumes['users'], 1)}@user.com", \
+                rng.choice(MESSAGES)
+
+    started = time.perf_counter()
+    _insert(db, "INSERT INTO messages (timestamp, user_name, user_email, message_text) VALUES (%s, %s, %s, %s)",
+            message_rows(), chunk_size)
+    timings["messages"] = time.perf_counter() - started
+
+    for table, seconds in timings.items():
+        count = volumes[table] if table in volumes else volumes["cars"] * units_per_car
+        log(f"Seeded {count:>9,} {table:<13} in {seconds:8.2f}s")
+    return timings
+
+
+def reset(db):
+    """Empties every table of the benchmark database, keeping the schema."""
+    for table in ["transactions", "messages", "users", "vehicle_units", "cars", "services", "categories"]:
+        db.cursor.execute(f"DELETE FROM {table}")
+    db.conn.commit()
+
+
+def add_connection_arguments(parser, default_database="car_rental_db_bench"):
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql",
+                        help="run against MySQL or the local SQLite stand-in")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default=default_database)
+    parser.add_argument("--no-prepared", action="store_true",
+                        help="send plain SQL text instead of cached server-side prepared statements")
+    parser.add_argument("--replica", metavar="DATABASE", action="append", default=[],
+                        help="read replica of --database on the same server/backend (repeatable)")
+    parser.add_argument("--branches", metavar="JSON",
+                        help="run against the branch databases listed in this file (see RENTAL_BRANCHES)")
+
+
+def db_factory(args):
+    """Returns a callable opening a new DBManager connection for the parsed arguments."""
+    if getattr(args, "branches", None):
+        return lambda: BranchDBManager.from_config(args.branches)
+    connector = None
+    if args.backend == "sqlite":
+        import sqlite_standin
+        connector = sqlite_standin
+    replicas = [{"host": args.host, "user": args.user, "password": args.password, "database": name,
+                 "backend": args.backend} for name in getattr(args, "replica", [])]
+    return lambda: DBManager(args.host, args.user, args.password, args.database, connector=connector,
+                             prepared=not args.no_prepared, replicas=replicas)
+
+
+def add_arguments(parser):
+    add_connection_arguments(parser)
+    for table, count in DEFAULT_VOLUMES.items():
+        parser.add_argument(f"--{table}", type=int, default=count, help=f"number of {table} (default {count:,})")
+    parser.add_argument("--units-per-car", type=int, default=3, help="physical units seeded for each car model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+
+
+def volumes_from_args(args):
+    return {table: getattr(args, table) for table in DEFAULT_VOLUMES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--reset", action="store_true", help="empty the benchmark database before seeding")
+    args = parser.parse_args()
+
+    db = db_factory(args)()
+    try:
+        # With --branches every branch database gets its own synthetic data set.
+        for index, (branch, branch_db) in enumerate(getattr(db, "branches", {None: db}).items()):
+            if branch: print(f"Branch {branch}:")
+            if args.reset: reset(branch_db)
+            seed(branch_db, volumes_from_args(args), args.seed + index, args.chunk_size,
+                 units_per_car=args.units_per_car)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
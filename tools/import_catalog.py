@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Imports categories, cars, prices and services from CSV or JSON files.
+
+Only the differences with the current tables are written, in one transaction per database.
+
+Usage:
+    python tools/import_catalog.py fleet.json
+    python tools/import_catalog.py prices.csv --dry-run
+"""
+import argparse
+import sys
+import time
+
+import datagen
+import catalog_import
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="catalog CSV or JSON files")
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_final")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per multi-row upsert")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would change")
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        started = time.perf_counter()
+        plans = catalog_import.import_catalog(db, args.files, args.chunk_size, args.dry_run)
+        seconds = time.perf_counter() - started
+    except (OSError, ValueError) as e:
+        sys.exit(f"Could not import the catalog: {e}")
+    finally:
+        db.close()
+
+    for branch, plan in plans.items():
+        print(f"{branch + ': ' if branch else ''}{catalog_import.plan_summary(plan)}")
+    print(f"{'Checked' if args.dry_run else 'Applied'} in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
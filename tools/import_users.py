@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Imports customer accounts from a CSV file with name, email and password columns.
+
+Usage:
+    python tools/import_users.py employees.csv
+    python tools/import_users.py employees.csv --update --chunk-size 2000 --workers 4
+"""
+import argparse
+import sys
+
+import datagen
+import user_import
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV file to import")
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_final")
+    parser.add_argument("--update", action="store_true",
+                        help="replace name and password of already registered emails instead of skipping them")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows hashed and inserted per batch")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: one per CPU)")
+    parser.add_argument("--show", type=int, default=20, help="duplicate/invalid rows to list (default 20)")
+    args = parser.parse_args()
+
+    progress = lambda report: print(f"\r{report['read']:,} rows ({report['rows_per_s']:,.0f} rows/s)", end="",
+                                    flush=True)
+    db = datagen.db_factory(args)()
+    try:
+        report = user_import.import_users(db, args.csv, args.update, args.chunk_size, args.workers, progress)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Could not read {args.csv}: {e}")
+    finally:
+        db.close()
+
+    print(f"\r{report['read']:,} rows in {report['seconds']:.2f}s ({report['rows_per_s']:,.0f} rows/s): "
+          f"{report['inserted']:,} added, {report['updated']:,} updated, {len(report['duplicates']):,} duplicates, "
+          f"{len(report['invalid']):,} invalid")
+    problems = sorted(report['duplicates'] + report['invalid'])
+    for line, email, reason in problems[:args.show]:
+        print(f"  line {line}: {email or '(no email)'} - {reason}")
+    if len(problems) > args.show: print(f"  ... and {len(problems) - args.show:,} more")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Simulates concurrent customers running the booking flow through RentalManager.
+
+Every virtual customer owns its own DBManager connection and repeats the session
+register -> login -> browse catalog -> quote -> book -> return -> send message, with random
+think time between steps. Steps after login happen with the probability given in --mix.
+
+Usage:
+    python tools/loadgen.py --customers 50 --duration 60
+    python tools/loadgen.py --backend sqlite --customers 8 --sessions 20 --think-time 0
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import datagen
+from rental import RentalManager
+
+OPERATIONS = ["register", "login", "browse", "quote", "book", "return", "message"]
+DEFAULT_MIX = {"returning": 0.7, "browse": 1.0, "quote": 0.8, "book": 0.5, "return": 1.0, "message": 0.2}
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or "").split(",")):
+        key, _, value = part.partition("=")
+        if key.strip() not in mix: raise argparse.ArgumentTypeError(f"unknown mix entry '{key}'")
+        mix[key.strip()] = float(value)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class VirtualCustomer(threading.Thread):
+    def __init__(self, index, open_db, args, deadline, stop_event):
+        super().__init__(name=f"customer-{index}", daemon=True)
+        self.index, self.open_db, self.args = index, open_db, args
+        self.deadline, self.stop_event = deadline, stop_event
+        self.rng = random.Random(args.seed + index)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.sessions = 0
+
+    def think(self):
+        if self.args.think_time > 0: self.stop_event.wait(self.rng.expovariate(1 / self.args.think_time))
+
+    def timed(self, op, func, *params):
+        started = time.perf_counter()
+        try:
+            result = func(*params)
+        except Exception as e:
+            self.latencies[op].append(time.perf_counter() - started)
+            self.errors[op][type(e).__name__] += 1
+            return None
+        self.latencies[op].append(time.perf_counter() - started)
+        return result
+
+    def done(self):
+        if self.stop_event.is_set() or time.monotonic() >= self.deadline: return True
+        return bool(self.args.sessions) and self.sessions >= self.args.sessions
+
+    def run(self):
+        try:
+            manager = RentalManager(self.open_db())
+        except BaseException as e:
+            self.errors["connect"][type(e).__name__] += 1
+            return
+        try:
+            while not self.done():
+                self.session(manager)
+                self.sessions += 1
+        finally:
+            manager.db.close()
+
+    def session(self, manager):
+        mix, rng = self.args.mix, self.rng
+        if rng.random() < mix["returning"]:
+            email, password = f"loadtest{rng.randrange(self.args.customers * 4)}@user.com", "password"
+            if not self.timed("login", manager.login, email, password):
+                self.timed("register", manager.register, "Load Test", email, password)
+                self.timed("login", manager.login, email, password)
+        else:
+            email, password = f"loadtest-{self.index}-{self.sessions}-{rng.random():.8f}@user.com", "secret"
+            result = self.timed("register", manager.register, "Load Test", email, password)
+            if result is not True:
+                self.errors["register"][str(result)[:40]] += 1
+                return
+            self.think()
+            if not self.timed("login", manager.login, email, password):
+                self.errors["login"]["rejected"] += 1
+                return
+        self.think()
+
+        car = None
+        if rng.random() < mix["browse"]:
+            cars = self.timed("browse", self.browse, manager)
+            car = rng.choice(cars) if cars else None
+            self.think()
+        if car is None: return
+
+        quote = None
+        if rng.random() < mix["quote"]:
+            quote = self.timed("quote", self.quote, manager, car, rng.randint(1, 7))
+            self.think()
+        if quote and rng.random() < mix["book"]:
+            unit = self.timed("book", manager.record_transaction, quote)
+            if unit is None:
+                self.errors["book"]["no free unit"] += 1
+            elif rng.random() < mix["return"]:
+                # Hand the unit back straight away so the fleet does not run dry during long runs.
+                self.think()
+                self.timed("return", manager.db.release_unit, unit['id'])
+            self.think()
+        if rng.random() < mix["message"]:
+            user = manager.current_user
+            self.timed("message", manager.save_message, user['name'], user['email'], "Load test message")
+            self.think()
+        manager.logout()
+
+    @staticmethod
+    def browse(manager):
+        cars = []
+        for cat in manager.r_sys.get_categories():
+            cars.extend(manager.r_sys.get_cars(cat['id']))
+        return cars
+
+    def quote(self, manager, car, days):
+        # Mirrors OptionsWidget.confirm_and_book.
+        services = [{"name": s['name'], "cost": s['price'] * days if s['is_daily'] else s['price']}
+                    for s in manager.r_sys.get_services() if self.rng.random() < 0.4]
+        start_date = datetime.date.today() + datetime.timedelta(days=self.rng.randrange(60))
+        base_total = manager.r_sys.quote(car, start_date, days)
+        return {"car": car, "duration": days, "start_date": start_date, "base_total": base_total,
+                "services": services, "final_total": base_total + sum(s['cost'] for s in services)}
+
+
+def run(open_db, args, log=print):
+    deadline = time.monotonic() + args.duration
+    stop_event = threading.Event()
+    customers = [VirtualCustomer(i, open_db, args, deadline, stop_event) for i in range(args.customers)]
+    started = time.perf_counter()
+    for customer in customers:
+        customer.start()
+        if args.ramp_up: time.sleep(args.ramp_up / args.customers)
+    try:
+        for customer in customers: customer.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for customer in customers: customer.join()
+    elapsed = time.perf_counter() - started
+    return summarize(customers, elapsed, log)
+
+
+def summarize(customers, elapsed, log=print):
+    latencies, errors = defaultdict(list), defaultdict(lambda: defaultdict(int))
+    for customer in customers:
+        for op, values in customer.latencies.items(): latencies[op].extend(values)
+        for op, kinds in customer.errors.items():
+            for kind, count in kinds.items(): errors[op][kind] += count
+
+    total_ops = sum(len(v) for v in latencies.values())
+    report = {"elapsed_s": elapsed, "customers": len(customers),
+              "sessions": sum(c.sessions for c in customers),
+              "throughput_ops_s": total_ops / elapsed if elapsed else 0.0, "operations": {}}
+    log(f"\n{len(customers)} customers, {report['sessions']:,} sessions, {total_ops:,} operations in {elapsed:.1f}s "
+        f"({report['throughput_ops_s']:.1f} ops/s)\n")
+    log(f"{'operation':<10} {'count':>8} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} "
+        f"{'err %':>6}")
+    for op in OPERATIONS + sorted(set(errors) - set(OPERATIONS)):
+        values = sorted(latencies.get(op, []))
+        error_count = sum(errors[op].values()) if op in errors else 0
+        if not values and not error_count: continue
+        stats = {"count": len(values), "ops_s": len(values) / elapsed if elapsed else 0.0,
+                 "p50_ms": percentile(values, 50) * 1000, "p95_ms": percentile(values, 95) * 1000,
+                 "p99_ms": percentile(values, 99) * 1000,
+                 "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+                 "errors": error_count, "error_rate": error_count / max(len(values), 1),
+                 "error_kinds": dict(errors[op]) if op in errors else {}}
+        report["operations"][op] = stats
+        log(f"{op:<10} {stats['count']:>8,} {stats['ops_s']:>8.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {error_count:>7,} {stats['error_rate'] * 100:>5.1f}%")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_loadtest")
+    parser.add_argument("--customers", type=int, default=20, help="number of concurrent virtual customers")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run (default 60)")
+    parser.add_argument("--sessions", type=int, default=0, help="stop each customer after this many sessions")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean think time between steps in seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which customers are started")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="step probabilities, e.g. returning=0.7,browse=1,quote=0.8,book=0.5,return=1,message=0.2")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="save the report as JSON")
+    args = parser.parse_args()
+
+    open_db = datagen.db_factory(args)
+    open_db().close()  # create the schema once before the customers race for it
+    report = run(open_db, args)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "password"}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
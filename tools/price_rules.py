@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Lists, removes and tries out the seasonal and weekday price rules.
+
+Rules are added or changed with a catalog import (the ``price_rules`` section, see
+catalog_import.py). This tool shows them, deletes them and prints quotes from the calendar.
+
+Usage:
+    python tools/price_rules.py list
+    python tools/price_rules.py delete "Holy Week"
+    python tools/price_rules.py quote "Toyota Innova (MPV)" --from 2027-03-20 --days 5
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import datagen
+from rental import RentalSystem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_connection_arguments(parser, default_database="car_rental_db_final")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show the price rules")
+    delete = commands.add_parser("delete", help="remove a price rule by name")
+    delete.add_argument("name")
+    quote = commands.add_parser("quote", help="price a rental with the current rules")
+    quote.add_argument("car", help="car model name")
+    quote.add_argument("--from", dest="start", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                       help="pick-up date, YYYY-MM-DD (default today)")
+    quote.add_argument("--days", type=int, default=1)
+    args = parser.parse_args()
+
+    db = datagen.db_factory(args)()
+    try:
+        if args.command == "list":
+            rules = db.get_pricing()["rules"]
+            for rule in sorted(rules, key=lambda r: (-(r['priority'] or 0), r['name'])):
+                scope = ", ".join(f"{key}={rule[key]}" for key in ("car_id", "category_id", "branch", "start_date",
+                                                                   "end_date", "weekdays") if rule.get(key) is not None)
+                effect = f"₱{rule['fixed_price']:,.2f}/day" if rule['fixed_price'] is not None \
+                    else f"x{rule['multiplier']}"
+                print(f"{rule['name']:<30} {effect:>14}  priority {rule['priority']}  {scope or 'all cars, all days'}")
+            if not rules: print("No price rules.")
+        elif args.command == "delete":
+            if not db.delete_price_rule(args.name): sys.exit(f"No price rule named '{args.name}'.")
+            print(f"Deleted '{args.name}'.")
+        else:
+            r_sys = RentalSystem(db)
+            started = time.perf_counter()
+            calendar = r_sys.price_calendar()
+            built = time.perf_counter() - started
+            car = next((c for c in db.get_pricing()["cars"] if c['name'] == args.car), None)
+            if car is None: sys.exit(f"No car named '{args.car}'.")
+            started = time.perf_counter()
+            total = calendar.quote(car['id'], args.start, args.days, car['price_per_day'])
+            quoted = time.perf_counter() - started
+            days = calendar.daily_prices(car['id'], args.start, args.days)
+            for offset, price in enumerate(days):
+                day = args.start + datetime.timedelta(days=offset)
+                print(f"  {day:%a %Y-%m-%d}  ₱{price:>12,.2f}")
+            print(f"{args.car}, {args.days} day(s) from {args.start}: ₱{total:,.2f}")
+            print(f"(calendar of {len(calendar.base):,} cars built in {built * 1000:.1f} ms, quote took "
+                  f"{quoted * 1e6:.1f} µs)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Automated version of bench_navigation.py: a short run on the SQLite stand-in, offscreen, that fails when
+memory or the number of Qt objects under the vehicle list and receipt grows across navigations.
+
+Usage:
+    python -m unittest discover -s tools -p "test_*.py"
+    python tools/test_navigation.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("QT_LOGGING_RULES", "qt.qpa.*=false")
+SQLITE_DIR = tempfile.TemporaryDirectory(prefix="rental_navigation_")
+os.environ["RENTAL_SQLITE_DIR"] = SQLITE_DIR.name  # read when sqlite_standin is imported
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench_navigation  # noqa: E402
+import sqlite_standin  # noqa: E402
+from _app import load_app  # noqa: E402
+from rental_db import DBManager  # noqa: E402
+
+NAVIGATIONS = 600
+BLOCK = 150
+MAX_GROWTH_KB = 256
+
+
+class NavigationMemoryTest(unittest.TestCase):
+    def test_memory_and_qt_objects_stay_flat(self):
+        db = DBManager(database="car_rental_db_navigation", connector=sqlite_standin)
+        try:
+            blocks = bench_navigation.run(load_app(), db, NAVIGATIONS, BLOCK, log=lambda line: None)
+        finally:
+            db.close()
+        first, last = blocks[0], blocks[-1]
+        self.assertLessEqual(last["qt_objects"], first["qt_objects"], "Qt objects pile up across navigations")
+        self.assertLessEqual(last["python_kb"] - first["python_kb"], MAX_GROWTH_KB,
+                             "Python memory grows across navigations")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Column-oriented storage for many transactions (sales report, charts, exports).
+
+A TransactionBatch keeps one numpy array per column instead of one object per row: ids, timestamps,
+pick-up dates, durations and totals (in centavos) in typed arrays, and the text columns dictionary-encoded as int32
+codes into the list of their distinct values, since the same car models, customers and service lists
+repeat over and over. DBManager fills a batch straight from the cursor, chunk by chunk, and
+``to_frame`` hands the arrays to pandas as they are (text columns become Categoricals).
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+COLUMNS = ("id", "timestamp", "user_name", "user_email", "car_model", "duration", "services_used", "final_total",
+           "unit_id", "start_date", "plate")
+TEXT_COLUMNS = ("user_name", "user_email", "car_model", "services_used", "plate", "branch")
+DTYPES = {"id": np.int64, "timestamp": "datetime64[s]", "duration": np.int32, "final_total": np.int64,
+          "unit_id": np.int64, "start_date": "datetime64[D]", **{name: np.int32 for name in TEXT_COLUMNS}}
+
+TransactionRow = namedtuple("TransactionRow", COLUMNS + ("branch",))
+
+
+def _encode(values, index):
+    """Returns the codes of ``values`` in ``index`` (value -> code), adding new values; None is coded -1."""
+    return np.fromiter((-1 if v is None else index.setdefault(v, len(index)) for v in values), np.int32, len(values))
+
+
+class TransactionBatch:
+    def __init__(self, columns, values):
+        """``columns`` maps every name in COLUMNS plus "branch" to an array; ``values`` maps each text column to the
+        list its codes point into."""
+        self.columns, self.values = columns, values
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Builds a batch from lists of row tuples in COLUMNS order, e.g. successive ``cursor.fetchmany`` results."""
+        parts = {name: [] for name in COLUMNS}
+        index = {name: {} for name in TEXT_COLUMNS}
+        for rows in chunks:
+            if not rows: continue
+            ids, stamps, names, emails, models, durations, services, totals, units, starts, plates = zip(*rows)
+            parts["id"].append(np.fromiter(ids, np.int64, len(rows)))
+            parts["timestamp"].append(np.array(stamps, dtype="datetime64[s]"))
+            parts["duration"].append(np.fromiter((d or 0 for d in durations), np.int32, len(rows)))
+            parts["final_total"].append(np.fromiter((round((t or 0) * 100) for t in totals), np.int64, len(rows)))
+            parts["unit_id"].append(np.fromiter((-1 if u is None else u for u in units), np.int64, len(rows)))
+            parts["start_date"].append(np.array(starts, dtype="datetime64[D]"))  # NaT for bookings saved without one
+            for name, column in (("user_name", names), ("user_email", emails), ("car_model", models),
+                                 ("services_used", services), ("plate", plates)):
+                parts[name].append(_encode(column, index[name]))
+        columns = {name: np.concatenate(arrays) if arrays else np.empty(0, DTYPES[name])
+                   for name, arrays in parts.items()}
+        columns["branch"] = np.full(len(columns["id"]), -1, np.int32)
+        return cls(columns, {name: list(index[name]) for name in TEXT_COLUMNS})
+
+    @classmethod
+    def empty(cls): return cls.from_chunks([])
+
+    @classmethod
+    def concat(cls, batches, branches=None):
+        """Joins batches into one, recoding the text columns; ``branches`` names the branch of each batch."""
+        batches = list(batches)
+        index = {name: {} for name in TEXT_COLUMNS}
+        codes = {name: [] for name in TEXT_COLUMNS}
+        for n, batch in enumerate(batches):
+            branch = batch.columns["branch"] if branches is None else np.zeros(len(batch), np.int32)
+            values = batch.values["branch"] if branches is None else [branches[n]]
+            for name in TEXT_COLUMNS:
+                column, names = (branch, values) if name == "branch" else (batch.columns[name], batch.values[name])
+                remap = np.append(_encode(names, index[name]), np.int32(-1))  # code -1 stays -1
+                codes[name].append(remap[column])
+        columns = {name: np.concatenate([b.columns[name] for b in batches] or [np.empty(0, DTYPES[name])])
+                   for name in COLUMNS if name not in TEXT_COLUMNS}
+        for name in TEXT_COLUMNS:
+            columns[name] = np.concatenate(codes[name] or [np.empty(0, np.int32)])
+        return cls(columns, {name: list(index[name]) for name in TEXT_COLUMNS})
+
+    def __len__(self): return len(self.columns["id"])
+
+    def take(self, rows):
+        """Returns the rows at the given positions (or boolean mask) as a new batch sharing the text values."""
+        return TransactionBatch({name: column[rows] for name, column in self.columns.items()}, self.values)
+
+    def newest_first(self):
+        # NaT is the smallest int64, so transactions without a timestamp end up last.
+        return self.take(np.argsort(self.columns["timestamp"].view(np.int64), kind="stable")[::-1])
+
+    def total(self):
+        return Decimal(int(self.columns["final_total"].sum())).scaleb(-2)
+
+    def decoded(self, name):
+        """Returns a text column as an object array of strings (None where missing)."""
+        return np.array(self.values[name] + [None], dtype=object)[self.columns[name]]
+
+    @property
+    def nbytes(self):
+        return (sum(column.nbytes for column in self.columns.values())
+                + sum(len(v) for values in self.values.values() for v in values if v))
+
+    def __iter__(self):
+        """Yields a TransactionRow per transaction, e.g. to fill a table; prefer the columns for calculations."""
+        stamps = self.columns["timestamp"].astype(object)
+        totals = (Decimal(cents).scaleb(-2) for cents in self.columns["final_total"].tolist())
+        units = (None if unit < 0 else unit for unit in self.columns["unit_id"].tolist())
+        starts = self.columns["start_date"].astype(object)
+        text = {name: self.decoded(name) for name in TEXT_COLUMNS}
+        return map(TransactionRow._make, zip(self.columns["id"].tolist(), stamps, text["user_name"],
+                                             text["user_email"], text["car_model"], self.columns["duration"].tolist(),
+                                             text["services_used"], totals, units, starts, text["plate"],
+                                             text["branch"]))
+
+    def to_frame(self):
+        """Returns a DataFrame with one column per field; text columns are Categoricals over the shared values."""
+        import pandas as pd  # only here, so the data layer loads without pandas (see rental_db)
+        frame = {name: self.columns[name] for name in ("id", "timestamp", "duration", "unit_id", "start_date")}
+        frame["final_total"] = self.columns["final_total"] / 100
+        for name in TEXT_COLUMNS:
+            frame[name] = pd.Categorical.from_codes(self.columns[name], categories=self.values[name])
+        return pd.DataFrame(frame, columns=COLUMNS + ("branch",))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Opt-in tracing of UI navigation and signal handlers.
+
+Run the app with RENTAL_TRACE=trace.json and open the file in https://ui.perfetto.dev or
+chrome://tracing. Each navigation and handler becomes a span, split into "fetch" (database),
+"build" (widget work) and "paint" (layout and repaint) phases. Without RENTAL_TRACE the
+spans cost a single attribute check.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+
+
+class Tracer:
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = bool(path)
+        self.events = []
+        self._pid, self._lock = os.getpid(), threading.Lock()
+        if self.enabled: atexit.register(self.save)
+
+    @contextmanager
+    def _span(self, name, cat, args):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            event = {"name": name, "cat": cat, "ph": "X", "ts": started / 1000,
+                     "dur": (time.perf_counter_ns() - started) / 1000, "pid": self._pid, "tid": threading.get_ident()}
+            if args: event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def span(self, name, cat="ui", **args):
+        return self._span(name, cat, args) if self.enabled else _NULL
+
+    def fetch(self, name="fetch"): return self.span(name, "fetch") if self.enabled else _NULL
+
+    def build(self, name="build"): return self.span(name, "build") if self.enabled else _NULL
+
+    def paint(self, widget):
+        """Flushes pending layout work and repaints ``widget`` synchronously inside a "paint" span."""
+        if not self.enabled: return
+        from PyQt6.QtCore import QCoreApplication
+        with self._span("paint", "paint", None):
+            QCoreApplication.sendPostedEvents()
+            widget.repaint()
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path: return
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+
+tracer = Tracer(os.environ.get("RENTAL_TRACE"))
+
+
+def traced(name=None, cat="handler"):
+    """Wraps a navigation method or signal handler in a span.
+
+    Extra signal arguments (like ``clicked``'s ``checked``) are dropped when the handler does not take them.
+    """
+
+    def decorate(func):
+        code = func.__code__
+        max_args = None if code.co_flags & 0x04 else code.co_argcount
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None: args = args[:max_args]
+            if not tracer.enabled: return func(*args, **kwargs)
+            with tracer.span(span_name, cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Bulk onboarding of customer accounts from a CSV file.
+
+The file needs ``name``, ``email`` and ``password`` columns (any order, any letter case). It is
+read as a stream, passwords are hashed by a pool of worker processes a few chunks ahead of the
+database, and every chunk is written with a single multi-row INSERT (see DBManager.upsert_users).
+"""
+import os
+import csv
+import time
+import hashlib
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+COLUMNS = ("name", "email", "password")
+DUPLICATE = "Email already registered."
+
+
+def hash_password(password):
+    """Hashes the password using SHA256 for secure storage."""
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+
+def _hash_chunk(passwords):
+    return [hash_password(p) for p in passwords]
+
+
+def read_users(fh, invalid):
+    """Yields (line, name, email, password) per CSV row; rows that cannot be imported go to ``invalid``."""
+    reader = csv.DictReader(fh)
+    fields = {(f or "").strip().lower(): f for f in reader.fieldnames or []}
+    missing = [c for c in COLUMNS if c not in fields]
+    if missing: raise ValueError(f"The CSV file is missing the column(s): {', '.join(missing)}.")
+    for row in reader:
+        name, email, password = ((row.get(fields[c]) or "").strip() for c in COLUMNS)
+        if not (name and email and password):
+            invalid.append((reader.line_num, email, "Please fill in all fields."))
+        elif "@" not in email:
+            invalid.append((reader.line_num, email, "Invalid email address."))
+        else:
+            yield reader.line_num, name, email, password
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+
+def import_users(db, path, update_existing=False, chunk_size=1000, workers=None, on_progress=None):
+    """Imports the accounts in the CSV file at ``path`` and returns a report dict.
+
+    Existing emails are reported as duplicates, or get their name and password replaced with ``update_existing``.
+    ``on_progress(report)`` is called after every chunk.
+    """
+    report = {"read": 0, "inserted": 0, "updated": 0, "duplicates": [], "invalid": [], "seconds": 0.0,
+              "rows_per_s": 0.0}
+    started = time.perf_counter()
+
+    def store(chunk, hashes):
+        users = [(name, email, password_hash) for (_, name, email, _), password_hash in zip(chunk, hashes)]
+        inserted, updated, duplicates = db.upsert_users(users, update_existing)
+        lines = {email: line for line, _, email, _ in chunk}
+        report["read"] += len(chunk)
+        report["inserted"] += inserted
+        report["updated"] += updated
+        report["duplicates"] += [(lines[email], email, DUPLICATE) for email in duplicates]
+        report["seconds"] = time.perf_counter() - started
+        report["rows_per_s"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+        if on_progress: on_progress(report)
+
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        chunks = _chunks(read_users(fh, report["invalid"]), chunk_size)
+        first = next(chunks, None)
+        if first is None: return report
+        if len(first) < chunk_size or workers == 1:
+            # A single chunk is not worth starting worker processes for.
+            store(first, _hash_chunk([row[3] for row in first]))
+            for chunk in chunks: store(chunk, _hash_chunk([row[3] for row in chunk]))
+        else:
+            # Spawned, not forked: forking the app would copy its Qt state and database connections into the workers.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                # Keep every worker hashing a chunk ahead while the oldest one is written to the database.
+                in_flight, limit = deque(), (workers or os.cpu_count() or 1) + 1
+                for chunk in itertools.chain([first], chunks):
+                    in_flight.append((chunk, pool.submit(_hash_chunk, [row[3] for row in chunk])))
+                    if len(in_flight) >= limit:
+                        chunk, hashes = in_flight.popleft()
+                        store(chunk, hashes.result())
+                while in_flight:
+                    chunk, hashes = in_flight.popleft()
+                    store(chunk, hashes.result())
+    return report
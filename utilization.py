@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Fleet utilization: the share of its unit-days each car model spent rented.
+
+A transaction rents one unit for ``duration`` days from its pick-up date (the day of its timestamp for
+bookings saved before the pick-up date was stored). Instead of
+expanding every rental into days, each one adds +1 at its first day and -1 after its last in a
+cars x days array (two ``np.bincount`` calls); a running sum along the days then gives the units
+rented per car per day, and ``np.add.reduceat`` sums those into periods. The cost grows with the
+number of transactions plus cars x days, not with the rented days, so millions of transactions
+take a second or two.
+
+The capacity of a car is its current number of units times the days of the range, since the units
+table has no history. A car matches its transactions by model name (and branch, with branch databases).
+"""
+from collections import namedtuple
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# How far before the range the report looks for bookings still running into it; longer rentals that started
+# earlier are only counted from this many days before the range.
+LONGEST_RENTAL_DAYS = 90
+
+# by_car, by_category and by_period are DataFrames with rented_days, capacity_days and utilization
+# (rented / capacity); by_car also has category and units, and rented is the cars x periods rented-days table.
+UtilizationReport = namedtuple("UtilizationReport", "by_car by_category by_period rented start end unmatched")
+
+
+def car_label(name, branch=None):
+    return f"{name} ({branch})" if branch else name
+
+
+def rented_unit_days(txns, labels, start, days):
+    """Returns the units of each car (``labels`` order) rented on each of ``days`` days from ``start``.
+
+    The result is a len(labels) x days int array; also returns how many transactions matched no car.
+    """
+    width = days + 1  # one extra column takes the -1 of rentals that run past the range
+    starts = txns.columns["start_date"]
+    stamps = np.where(np.isnat(starts), txns.columns["timestamp"].astype("datetime64[D]"), starts)
+    first = (stamps - np.datetime64(start, "D")).astype(np.int64)
+    last = first + txns.columns["duration"]
+
+    # Cars are matched per distinct (model, branch) pair of codes, not per transaction.
+    model, branch = txns.columns["car_model"].astype(np.int64), txns.columns["branch"].astype(np.int64)
+    pair = model * (len(txns.values["branch"]) + 1) + branch + 1
+    pairs, inverse = np.unique(pair, return_inverse=True)
+    rows = {label: row for row, label in enumerate(labels)}
+    models, branches = txns.values["car_model"] + [None], txns.values["branch"] + [None]
+    pair_row = np.array([rows.get(car_label(models[p // (len(branches))], branches[p % len(branches) - 1]), -1)
+                         for p in pairs.tolist()], dtype=np.int64)
+    row = pair_row[inverse.reshape(-1)] if len(pairs) else np.empty(0, np.int64)
+
+    matched = row >= 0
+    keep = matched & ~np.isnat(stamps) & (last > first) & (last > 0) & (first < days)
+    row, first, last = row[keep], np.clip(first[keep], 0, days), np.clip(last[keep], 0, days)
+    size = len(labels) * width
+    change = np.bincount(row * width + first, minlength=size) - np.bincount(row * width + last, minlength=size)
+    rented = np.cumsum(change.reshape(len(labels), width), axis=1)[:, :days]
+    return rented, int((~matched).sum())
+
+
+def utilization_report(txns, cars, start, end, period="M"):
+    """Builds the utilization of ``cars`` from ``start`` to ``end`` (dates, both included) per "D", "W" or "M".
+
+    ``cars`` are dicts with name, category, units and optionally branch; ``txns`` is a TransactionBatch.
+    """
+    days = (end - start).days + 1
+    if days <= 0: raise ValueError("The end date is before the start date.")
+    labels = [car_label(car['name'], car.get('branch')) for car in cars]
+    units = np.array([int(car['units'] or 0) for car in cars], dtype=np.int64)
+    rented, unmatched = rented_unit_days(txns, labels, start, days)
+
+    dates = pd.period_range(start, periods=days, freq="D")
+    periods = dates.asfreq(period)
+    bounds = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    period_index = periods[bounds]
+    by_period_rented = np.add.reduceat(rented, bounds, axis=1) if len(cars) else np.zeros((0, len(bounds)), np.int64)
+    period_days = np.diff(np.r_[bounds, days])
+
+    by_car = pd.DataFrame({"category": [car.get('category') or "Other" for car in cars], "units": units,
+                           "rented_days": rented.sum(axis=1), "capacity_days": units * days},
+                          index=pd.Index(labels, name="car"))
+    by_category = by_car.groupby("category")[["units", "rented_days", "capacity_days"]].sum()
+    by_period = pd.DataFrame({"rented_days": by_period_rented.sum(axis=0), "capacity_days": units.sum() * period_days},
+                             index=pd.Index(period_index, name="period"))
+    for frame in (by_car, by_category, by_period):
+        frame["utilization"] = frame["rented_days"] / frame["capacity_days"].where(frame["capacity_days"] > 0)
+    rented_table = pd.DataFrame(by_period_rented, index=by_car.index, columns=period_index)
+    return UtilizationReport(by_car, by_category, by_period, rented_table, start, end, unmatched)
+
+
+def fetch_utilization_report(db, start, end, period="M", include_archive=False):
+    """Reads the fleet and the transactions from ``db`` (a DBManager or BranchDBManager) and reports on them.
+
+    Set ``include_archive`` for ranges older than the archive age (see DBManager.archive)."""
+    names = {row['id']: row['name'] for row in db.get_all_categories()}
+    units = {car['id']: car['total_units'] for car in db.get_all_cars_data(only_available=False)}
+    cars = [dict(car, category=names.get(car['category_id'], "Other"), units=units.get(car['id'], 0))
+            for car in db.get_pricing()["cars"]]
+    txns = db.get_transactions_between(start - datetime.timedelta(days=LONGEST_RENTAL_DAYS),
+                                       end + datetime.timedelta(days=1), include_archive)
+    return utilization_report(txns, cars, start, end, period)